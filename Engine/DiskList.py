@@ -1,6 +1,14 @@
 import struct
 
+import numpy as np
+
 class DiskList:
+    # New files start with a header: magic, version and the numpy dtype string of the items (type and byte order).
+    # Files without it (written by older versions) are read as native items of type.
+    magic = b'ENNDLIST'
+    version = 1
+    headerSize = 16
+
     #Picklers
     def __getinitargs__(self):
         return self._args
@@ -14,6 +22,7 @@ class DiskList:
     def __init__(self, file, type=('f',4), buffersize=128, chunker=131072, readonly=False, overwrite=False):
         #Buffer size in elements!
         #chunker: Buffer size for operand operations in items (default 1mb where item size is 8)
+        #type: one of the tuples below or a numpy dtype (e.g. '>f8'), the header of an existing file overrides it
         import io
         import os
         self._args = (file, type, buffersize, chunker, readonly, False)
@@ -26,39 +35,107 @@ class DiskList:
             'overwrite': False
         }
         try:
+            # The size of the items comes from numpy, type[1] is not always right (e.g. 'i')
+            self._dtype = np.dtype(type[0]) if isinstance(type, tuple) else np.dtype(type)
+            self._offset = 0
+            if os.path.isfile(file) and not overwrite:
+                dtype = self._readHeader(file)
+                if dtype is not None:
+                    (self._dtype, self._offset) = (dtype, self.headerSize)
             if readonly:
                 self._file = io.FileIO(file, 'rb')
-                self._buffer = io.BufferedReader(self._file, buffersize * type[1])
+                self._buffer = io.BufferedReader(self._file, buffersize * self._dtype.itemsize)
             elif overwrite:
                 self._file = io.FileIO(file, 'wb+')
-                self._buffer = io.BufferedRandom(self._file, buffersize * type[1])
+                self._buffer = io.BufferedRandom(self._file, buffersize * self._dtype.itemsize)
             else:
                 self._file = io.FileIO(file, 'ab+')
-                self._buffer = io.BufferedRandom(self._file, buffersize*type[1])
-            self._itemsize = type[1]
-            self._type = type[0]
-            self._items = int(os.path.getsize(file)/type[1])
+                self._buffer = io.BufferedRandom(self._file, buffersize * self._dtype.itemsize)
+            if not readonly and os.path.getsize(file) == 0:
+                self._writeHeader()
+            self._type = self._dtype.char
+            self._itemsize = self._dtype.itemsize
+            self._items = int((os.path.getsize(file) - self._offset) // self._itemsize)
             self._chunker = chunker
+            self._map = None
         except Exception:
             import traceback
             traceback.print_exc()
             print('Error while opening file: %s' % file)
             raise Exception('Error...')
 
+    def _writeHeader(self):
+        code = self._dtype.str.encode('ascii')
+        if len(code) > self.headerSize - len(self.magic) - 1:
+            raise ValueError('Unsupported type: %s' % self._dtype)
+        self._buffer.write(self.magic + struct.pack('B', self.version) +
+                           code.ljust(self.headerSize - len(self.magic) - 1, b'\0'))
+        self._buffer.flush()
+        self._offset = self.headerSize
+
+    @classmethod
+    def _readHeader(cls, file):
+        # The dtype of the header, None for a file without header
+        with open(file, 'rb') as f:
+            header = f.read(cls.headerSize)
+        if not len(header) == cls.headerSize or not header.startswith(cls.magic):
+            return None
+        if struct.unpack('B', header[len(cls.magic):len(cls.magic) + 1])[0] > cls.version:
+            raise IOError('Written by a newer version: %s' % file)
+        return np.dtype(header[len(cls.magic) + 1:].rstrip(b'\0').decode('ascii'))
+
     def append(self, data):
-        self._buffer.seek(0,2)
-        if isinstance(data,list):
-            self._buffer.write(struct.pack(str(len(data))+self._type[0], *data))
-        else:
-            self._buffer.write(struct.pack(self._type[0], data))
-        self._items += 1
+        # One value or a list of values
+        self.extend(np.asarray(data, dtype=self._dtype))
+
+    def extend(self, data):
+        """
+        Appends all items of data with one write of their bytes
+        :param data: numpy array (any shape, flattened in C order) or sequence, converted to the type of the list
+        """
+        array = np.ascontiguousarray(data, dtype=self._dtype).reshape(-1)
+        self._buffer.write(array.tobytes())
+        self._items += len(array)
 
     def __getitem__(self, item):
+        # An index gives the value, a slice a view (nothing is copied or read before it is used)
+        return self.asarray()[item]
+
+    def __len__(self):
+        return self._items
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            for value in chunk.tolist():
+                yield value
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.asarray()
+        return array if dtype is None else array.astype(dtype)
+
+    def asarray(self):
+        """
+        :return: read only numpy.memmap of all items, slices of it only read their part of the file
+        """
+        self._buffer.flush()
+        if not self._items:
+            return np.zeros(0, dtype=self._dtype)
+        if self._map is None or not len(self._map) == self._items:
+            self._map = np.memmap(self._dict['file'], dtype=self._dtype, mode='r', offset=self._offset,
+                                  shape=(self._items,))
+        return self._map
+
+    def chunks(self, size=None):
+        """
+        Iterates over the items in views of size items (default: chunker)
+        """
+        size = self._chunker if size is None else size
+        array = self.asarray()
+        for start in range(0, len(array), size):
+            yield array[start:start + size]
+
+    def flush(self):
         self._buffer.flush()
-        self._buffer.seek(item*self._itemsize)
-        bytes = self._buffer.read(self._itemsize)
-        item  = struct.unpack(self._type, bytes)
-        return item
 
     def getitemcount(self):
         return self._items
@@ -66,9 +143,11 @@ class DiskList:
     def getsizebytes(self):
         return self._itemsize*self._items
 
+    def getdtype(self):
+        return self._dtype
+
     def getList(self):
-        self._buffer.seek(0)
-        return list(struct.unpack(str(self._items) + self._type, self._buffer.read()))
+        return self.asarray().tolist()
 
 
 
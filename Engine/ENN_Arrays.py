@@ -0,0 +1,903 @@
+'''
+Author: Erwin Diepgrond
+Copyright 2016 under GNU license
+e.j.diepgrond@gmail.com
+
+	This file is part of NeuroNet.
+
+	NeuroNet is free software: you can redistribute it and/or modify
+	it under the terms of the GNU General Public License as published by
+	the Free Software Foundation, either version 3 of the License,
+	or any later version.
+
+	NeuroNet is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License
+	along with NeuroNet.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import copy
+import numbers
+import numpy as np
+try:
+    import scipy.sparse as sparse
+except ImportError:
+    sparse = None  # SparseScatter falls back to numpy.bincount
+
+import Engine.ENN_Models as models
+from Engine.ENN_Noise import NoiseSource
+
+##########################################
+#### Array engine storage             ####
+##########################################
+# Used by Network(engine='array')
+# Every neuron function gets one population. All variables of a population are stored
+# in one numpy array per variable (structure of arrays) instead of one dict per neuron.
+# Synapses are stored the same way, one projection per (synapse function, source population,
+# destination population). Scripts still see dicts through NeuronView and SynapseView objects.
+
+
+def _isNumber(value):
+    return isinstance(value, numbers.Number) and not isinstance(value, complex)
+
+
+def _broadcast(value, size):
+    # Read only column of one value (stride 0), same as numpy.broadcast_to but cheaper to make
+    # value: a number or a broadcast column (its value is reused)
+    buffer = value.base if isinstance(value, np.ndarray) else np.full(1, value, dtype=np.float64)
+    column = np.ndarray((size,), np.float64, buffer, 0, (0,))
+    column.flags.writeable = False
+    return column
+
+
+def _idArray(ids):
+    # One dimensional array of ids, an object array if the ids are not all numbers or strings (e.g. tuples)
+    try:
+        array = np.array(ids)
+    except ValueError:
+        array = None
+    if array is None or not array.ndim == 1:
+        array = np.empty(len(ids), dtype=object)
+        for (i, id) in enumerate(ids):
+            array[i] = id
+    return array
+
+
+class IdMap(object):
+    """
+    Maps external ids (any hashable: networkx nodes, ids given to addNeuron, gaps after deletions)
+    to dense indices 0 .. n - 1 (the array index in the columns) and back.
+    Removing ids compacts the indices, the external ids stay the same.
+    If all ids are integers, a lookup table translates arrays of ids in one numpy operation.
+    """
+
+    def __init__(self):
+        self.ids = []      # index -> external id
+        self._index = {}   # external id -> index
+        self._table = None # numpy array, integer id -> index (-1: unknown). False: ids are not (dense) integers
+        self._idArray = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, id):
+        return id in self._index
+
+    def __getitem__(self, id):
+        return self._index[id]
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def get(self, id, default=None):
+        return self._index.get(id, default)
+
+    def __getstate__(self):
+        return (self.ids,)
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.add(state[0])
+
+    def add(self, ids):
+        """
+        Appends ids
+        :return: their indices
+        """
+        size = len(self.ids)
+        self._index.update(zip(ids, range(size, size + len(ids))))
+        self.ids.extend(ids)
+        self._changed()
+        return np.arange(size, size + len(ids))
+
+    def remove(self, ids):
+        """
+        Removes ids and compacts the indices of the others
+        :return: boolean array, True for the (old) indices that are kept
+        """
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[self.indices(ids)] = False
+        self.ids = [id for (id, kept) in zip(self.ids, keep) if kept]
+        self._index = dict((id, i) for (i, id) in enumerate(self.ids))
+        self._changed()
+        return keep
+
+    def _changed(self):
+        self._table = None
+        self._idArray = None
+
+    def _lookupTable(self):
+        if self._table is None:
+            self._table = False
+            ids = _idArray(self.ids)
+            if len(ids) and ids.dtype.kind in 'iu' and ids.min() >= 0 and ids.max() < 4 * len(ids) + 1024:
+                self._table = np.full(int(ids.max()) + 1, -1, dtype=np.intp)
+                self._table[ids] = np.arange(len(ids))
+        return self._table
+
+    def indices(self, ids, missing=None):
+        """
+        Vectorized translation of external ids
+        :param ids: sequence or numpy array of external ids
+        :param missing: index returned for unknown ids. None: raise a KeyError
+        :return: numpy array with the indices
+        """
+        table = self._lookupTable()
+        array = ids if isinstance(ids, np.ndarray) else _idArray(ids)
+        if table is not False and array.dtype.kind in 'iu':
+            found = np.full(len(array), -1, dtype=np.intp)
+            inside = (array >= 0) & (array < len(table))
+            found[inside] = table[array[inside]]
+        else:
+            found = np.array([self._index.get(id, -1) for id in ids], dtype=np.intp)
+        if (found < 0).any():
+            if missing is None:
+                raise KeyError(next(id for (id, i) in zip(ids, found) if i < 0))
+            found[found < 0] = missing
+        return found
+
+    def externalIds(self, indices):
+        """
+        :return: numpy array with the external ids of the indices
+        """
+        if self._idArray is None:
+            self._idArray = _idArray(self.ids)
+        return self._idArray[indices]
+
+
+class _ColumnStore(object):
+    """
+    Base of NeuronPopulation and SynapseProjection.
+    Maps external ids to array indices and stores every property in its own column (numpy array).
+    If the store has a vectorized kernel, numbers are stored as float64 and everything else (lists, strings)
+    in object columns. The kernel does not change these objects, so they are shared with the template
+    instead of copied. Without a kernel all columns are object columns (deep copied), so the dict based
+    update functions see exactly the values (ints stay ints) they would see in the dict engine.
+    Parameters the kernel only reads (sharedKeys) are stored once while all elements have the same value,
+    as a read only broadcast column. The first element with another value turns it into a normal column.
+    Topology changes between simulation steps are cheap: a column is a view of the first rows of a larger
+    buffer that doubles when it is full (amortized O(1) per added element), and removed elements are only
+    marked (tombstones) until the columns are used as a whole (step, column, ids), which compacts them once.
+    """
+    # Keys the network sets itself, these are never stored in the columns
+    reservedKeys = ()
+
+    def __init__(self):
+        self.index = IdMap()  # external id <-> array index
+        self.state = {}  # property name -> numpy array
+        self.version = 0 # Incremented on every add / remove
+        self.numeric = True
+        self.sharedKeys = () # read only parameters of the kernel
+        self.shared = {}     # property name -> value of a broadcast column
+        self._buffers = {}   # property name -> (array with spare capacity, the column: a view of its first rows)
+        self._dead = set()   # removed ids, their rows stay in the columns until _compact()
+
+    def __len__(self):
+        self._compact()
+        return len(self.index)
+
+    @property
+    def ids(self):
+        # external ids in array order
+        self._compact()
+        return self.index.ids
+
+    def __getstate__(self):
+        # Broadcast columns are rebuilt instead of pickled as full arrays, spare capacity is not pickled
+        self._compact()
+        state = self.__dict__.copy()
+        state['state'] = dict((key, column) for (key, column) in self.state.items() if not self._isShared(key))
+        state['_buffers'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for (key, value) in self.shared.items():
+            self.state[key] = _broadcast(value, len(self.index))
+
+    def _newColumn(self, value, size):
+        if self.numeric and _isNumber(value):
+            return np.full(size, np.nan, dtype=np.float64)
+        return np.full(size, None, dtype=object)
+
+    def _isShared(self, key):
+        if key not in self.shared:
+            return False
+        if self.state[key].flags.writeable:
+            del self.shared[key] # Replaced by the kernel
+            return False
+        return True
+
+    def _unshare(self, key):
+        # Copy on write: a full column of its own
+        del self.shared[key]
+        self.state[key] = np.array(self.state[key])
+
+    def _rows(self, value, n):
+        # n new values of a property all elements get
+        if self.numeric and _isNumber(value):
+            return np.full(n, value, dtype=np.float64)
+        rows = np.empty(n, dtype=object)
+        for i in range(n):
+            rows[i] = value if self.numeric else copy.deepcopy(value)
+        return rows
+
+    def _columnRows(self, values, n):
+        # n new values of a property given per element
+        if not len(values) == n:
+            raise ValueError('(%s) Expected %i values, got %i' % (type(self).__name__, n, len(values)))
+        if self.numeric and isinstance(values, np.ndarray) and values.dtype.kind in 'biuf':
+            return values.astype(np.float64)
+        values = list(values)
+        if self.numeric and all(_isNumber(value) for value in values):
+            return np.array(values, dtype=np.float64)
+        return self._objectRows(values)
+
+    @staticmethod
+    def _objectRows(values):
+        rows = np.empty(len(values), dtype=object)
+        for (i, value) in enumerate(values):
+            rows[i] = value
+        return rows
+
+    @staticmethod
+    def _filler(dtype, n):
+        if dtype == object:
+            return np.full(n, None, dtype=object)
+        return np.full(n, np.nan, dtype=np.float64)
+
+    def _append(self, key, column, rows):
+        # column + rows, written into the spare capacity of the buffer of the column if it still has room
+        size = len(column)
+        end = size + len(rows)
+        dtype = np.promote_types(column.dtype, rows.dtype)
+        (buffer, view) = self._buffers.get(key, (None, None))
+        if view is not column or len(buffer) < end or not buffer.dtype == dtype:
+            # Kernels may have replaced the column by a new array, copied once into a new buffer
+            buffer = np.empty(max(2 * size, end, 16), dtype=dtype)
+            buffer[:size] = column
+        buffer[size:end] = rows
+        column = buffer[:end]
+        self._buffers[key] = (buffer, column)
+        return column
+
+    def _compact(self):
+        """
+        Removes the rows of the removed elements (tombstones), one array operation per property
+        :return: boolean array, True for the (old) array indices that are kept. None if nothing was removed
+        """
+        if not self._dead:
+            return None
+        keep = self.index.remove(list(self._dead))
+        self._dead = set()
+        size = int(keep.sum())
+        for (key, column) in list(self.state.items()):
+            if self._isShared(key):
+                self.state[key] = _broadcast(column, size)
+                continue
+            kept = column[keep]
+            (buffer, view) = self._buffers.get(key, (None, None))
+            if view is column:
+                # Keep the capacity
+                buffer[:size] = kept
+                kept = buffer[:size]
+                self._buffers[key] = (buffer, kept)
+            self.state[key] = kept
+        return keep
+
+    def indices(self, ids):
+        """
+        :param ids: external ids of elements
+        :return: numpy array with their array indices (the rows in the columns)
+        """
+        self._compact()
+        return self.index.indices(ids)
+
+    def add(self, id, properties):
+        """
+        Appends an element
+        :param id: external id of the element
+        :param properties: dict with the element properties (copied, not referenced)
+        :return: array index of the element
+        """
+        return int(_ColumnStore.addMany(self, [id], properties)[0])
+
+    def addMany(self, ids, properties, columns=None):
+        """
+        Appends elements, one array operation per property
+        :param ids: external ids of the elements
+        :param properties: dict with the properties of all elements (copied, not referenced)
+        :param columns: dict property -> sequence (or numpy array) with one value per element.
+                        These override properties
+        :return: array indices of the elements
+        """
+        columns = columns if columns is not None else {}
+        if self._dead and not self._dead.isdisjoint(ids):
+            self._compact() # An id is used again
+        n = len(ids)
+        size = len(self.index)
+        rows = {}  # property -> the n new values
+        for (key, value) in properties.items():
+            if key in self.reservedKeys or key in columns:
+                continue
+            if key in self.sharedKeys and self.numeric and _isNumber(value):
+                if size == 0 and key not in self.state:
+                    self.shared[key] = value
+                    self.state[key] = _broadcast(value, 0)
+                if self._isShared(key) and value == self.shared[key]:
+                    continue
+            rows[key] = self._rows(value, n)
+        for (key, values) in columns.items():
+            if key not in self.reservedKeys:
+                rows[key] = self._columnRows(values, n)
+        for (key, row) in rows.items():
+            if key not in self.state:
+                self.state[key] = self._filler(row.dtype, size)
+            elif self._isShared(key):
+                self._unshare(key)
+        for (key, column) in self.state.items():
+            if key in rows:
+                row = rows[key]
+            elif self._isShared(key):
+                if key in properties:
+                    self.state[key] = _broadcast(column, size + n)
+                    continue
+                self._unshare(key)
+                column = self.state[key]
+                row = self._filler(column.dtype, n)
+            else:
+                row = self._filler(column.dtype, n)
+            self.state[key] = self._append(key, column, row)
+        self.version += 1
+        return self.index.add(ids)
+
+    def remove(self, id):
+        """
+        Removes an element
+        :param id: external id of the element
+        :return: dict with the values of the removed element
+        """
+        removed = self.toDict(id)
+        self.removeMany([id])
+        return removed
+
+    def removeMany(self, ids):
+        """
+        Removes elements. Only marks them, the rows are removed by the next _compact()
+        :param ids: external ids of the elements
+        """
+        for id in ids:
+            self._row(id)  # KeyError for unknown ids
+        self._dead.update(ids)
+        self.version += 1
+
+    def _row(self, id):
+        if self._dead and id in self._dead:
+            raise KeyError(id)
+        return self.index[id]
+
+    def _getReserved(self, id, key):
+        raise KeyError(key)
+
+    def get(self, id, key):
+        if key in self.reservedKeys:
+            self._row(id)
+            return self._getReserved(id, key)
+        return self.state[key][self._row(id)]
+
+    def set(self, id, key, value):
+        if key in self.reservedKeys:
+            raise KeyError('(%s) %s is set by the network' % (type(self).__name__, key))
+        if key in self.state and self._isShared(key):
+            if value == self.shared[key]:
+                return
+            self._unshare(key)
+        row = self._row(id)
+        if key not in self.state:
+            self.state[key] = self._newColumn(value, len(self.index))
+        elif not _isNumber(value) and not self.state[key].dtype == object:
+            self.state[key] = self.state[key].astype(object)
+        self.state[key][row] = value
+
+    def setMany(self, ids, key, values):
+        """
+        Sets a property of elements, one array operation
+        :param ids: external ids of the elements
+        :param values: one value for all elements, or a sequence (numpy array) with one value per element
+        """
+        if key in self.reservedKeys:
+            raise KeyError('(%s) %s is set by the network' % (type(self).__name__, key))
+        indices = self.indices(ids)
+        if np.ndim(values) == 0:
+            if key in self.state and self._isShared(key) and values == self.shared[key]:
+                return
+            rows = self._rows(values, len(indices))
+        else:
+            rows = self._columnRows(values, len(indices))
+        if key in self.state and self._isShared(key):
+            self._unshare(key)
+        if key not in self.state:
+            self.state[key] = self._filler(rows.dtype, len(self.ids))
+        elif rows.dtype == object and not self.state[key].dtype == object:
+            self.state[key] = self.state[key].astype(object)
+        self.state[key][indices] = rows
+
+    def column(self, key):
+        """
+        :return: numpy array with the values of key of all elements (array order), None if there is no key
+        """
+        self._compact()
+        if key == 'id':
+            return np.array(self.ids)
+        if key in self.reservedKeys:
+            return self._objectRows([self._getReserved(id, key) for id in self.ids])
+        return self.state.get(key, None)
+
+    def keys(self):
+        return list(self.state.keys()) + list(self.reservedKeys)
+
+    def toDict(self, id):
+        return dict((key, self.get(id, key)) for key in self.keys())
+
+
+class NeuronPopulation(_ColumnStore):
+    """
+    Stores all neurons that share an update function as arrays.
+    If a vectorized version of the update function is registered in ENN_Models.vectorizedModels,
+    one step updates the whole population at once. Otherwise the update function is
+    called per neuron on a NeuronView (slow, but every model keeps working).
+    """
+    reservedKeys = ('fun', 'id', 'dt', 'noise', 'integrator', 'rateTable')
+
+    def __init__(self, neuronFun, dt, noise=None, integrator='euler', rateTable=None, backend='numpy'):
+        """
+        :param neuronFun: the (dict based) neuron update function of this population
+        :param dt: the simulation time step in ms
+        :param noise: the ENN_Noise.NoiseSource of the network
+        :param integrator: name of the integrator in ENN_Integrators.integrators
+        :param rateTable: ENN_Models.RateTable used by the Hodgkin & Huxley models, None: analytic rates
+        :param backend: 'numpy' or 'numba': use the compiled kernel of ENN_Jit.jitModels if there is one
+        """
+        _ColumnStore.__init__(self)
+        self.fun = neuronFun
+        # ENN_Equations.EquationModel neuron functions bring their own kernel
+        self.kernel = models.vectorizedModels.get(neuronFun, getattr(neuronFun, 'kernel', None))
+        if backend == 'numba':
+            import Engine.ENN_Jit as jit  # only imported (with numba) for this backend
+            self.kernel = jit.jitModels.get(neuronFun, self.kernel)
+        self.numeric = self.kernel is not None
+        if self.numeric:
+            self.sharedKeys = models.sharedParameters.get(neuronFun, getattr(neuronFun, 'parameters', ()))
+        self.dt = dt
+        self.noise = noise if noise is not None else NoiseSource()
+        self.integrator = integrator
+        self.rateTable = rateTable
+
+    def _getReserved(self, id, key):
+        if key == 'fun':
+            return self.fun
+        elif key == 'dt':
+            return self.dt
+        elif key == 'noise':
+            return self.noise
+        elif key == 'integrator':
+            return self.integrator
+        elif key == 'rateTable':
+            return self.rateTable
+        return id
+
+    def step(self):
+        """
+        Updates all neurons of this population for one time step
+        """
+        if len(self.ids) == 0:
+            return
+        if self.kernel is not None:
+            self.kernel(self, self.dt)
+        else:
+            for id in self.ids:
+                self.fun(NeuronView(self, id))
+
+
+class SynapseProjection(_ColumnStore):
+    """
+    Stores all synapses with the same synapse function between two populations as arrays.
+    If a vectorized version of the synapse function is registered in ENN_Models.vectorizedSynapses,
+    one step updates the whole projection at once. The kernel may store derived data (sparse matrices)
+    in self.cache, which is cleared whenever a synapse, the source or the destination population changes.
+    Otherwise the synapse function is called per synapse on views (slow, but every model keeps working).
+    """
+    reservedKeys = ('fun', 'id', '_source', '_destin', 'noise')
+
+    def __init__(self, synapseFun, source, destination, dt, delayLine=None, noise=None, backend='numpy'):
+        """
+        :param synapseFun: the (dict based) synapse update function of this projection
+        :param source: NeuronPopulation of the source neurons
+        :param destination: NeuronPopulation of the destination neurons
+        :param dt: the simulation time step in ms
+        :param delayLine: the DelayLine of the network
+        :param noise: the ENN_Noise.NoiseSource of the network
+        :param backend: 'numpy' or 'numba': use the compiled kernel of ENN_Jit.jitSynapses if there is one
+        """
+        _ColumnStore.__init__(self)
+        self.fun = synapseFun
+        self.kernel = models.vectorizedSynapses.get(synapseFun, None)
+        if backend == 'numba':
+            import Engine.ENN_Jit as jit
+            self.kernel = jit.jitSynapses.get(synapseFun, self.kernel)
+        self.numeric = self.kernel is not None
+        if self.numeric:
+            self.sharedKeys = models.sharedParameters.get(synapseFun, ())
+        self.dt = dt
+        self.source = source
+        self.destination = destination
+        self.delayLine = delayLine
+        self.noise = noise if noise is not None else NoiseSource()
+        self.sourceIds = []
+        self.destinationIds = []
+        self.sourceIndex = np.zeros(0, dtype=np.intp)      # index in source population, per synapse
+        self.destinationIndex = np.zeros(0, dtype=np.intp) # index in destination population, per synapse
+        self.cache = {}   # derived data of the kernel, rebuilt on changes
+        self.buffers = {} # state of the kernel that survives rebuilds (delay line columns)
+        self._builtVersions = None
+        self._views = []
+
+    def add(self, id, sourceId, destinationId, properties):
+        index = _ColumnStore.add(self, id, properties)
+        self.sourceIds.append(sourceId)
+        self.destinationIds.append(destinationId)
+        return index
+
+    def addMany(self, ids, sourceIds, destinationIds, properties, columns=None):
+        """
+        Appends synapses, see _ColumnStore.addMany
+        :param sourceIds: source neuron id per synapse
+        :param destinationIds: destination neuron id per synapse
+        """
+        indices = _ColumnStore.addMany(self, ids, properties, columns)
+        self.sourceIds.extend(sourceIds)
+        self.destinationIds.extend(destinationIds)
+        return indices
+
+    def _compact(self):
+        keep = _ColumnStore._compact(self)
+        if keep is not None:
+            self.sourceIds = [i for (i, kept) in zip(self.sourceIds, keep) if kept]
+            self.destinationIds = [i for (i, kept) in zip(self.destinationIds, keep) if kept]
+        return keep
+
+    def set(self, id, key, value):
+        _ColumnStore.set(self, id, key, value)
+        if self.kernel is not None:
+            self.cache = {}
+
+    def setMany(self, ids, key, values):
+        _ColumnStore.setMany(self, ids, key, values)
+        if self.kernel is not None:
+            self.cache = {}
+
+    def column(self, key):
+        if key == '_source':
+            return np.array(self.sourceIds)
+        elif key == '_destin':
+            return np.array(self.destinationIds)
+        return _ColumnStore.column(self, key)
+
+    def _getReserved(self, id, key):
+        if key == 'fun':
+            return self.fun
+        elif key == 'id':
+            return id
+        elif key == 'noise':
+            return self.noise
+        elif key == '_source':
+            return self.sourceIds[self.index[id]]
+        return self.destinationIds[self.index[id]]
+
+    def _ready(self):
+        # Compacts this projection and its populations, True if the sparse structures have to be rebuilt
+        self._compact()
+        self.source._compact()
+        self.destination._compact()
+        return not self._builtVersions == (self.version, self.source.version, self.destination.version)
+
+    def build(self):
+        """
+        Translates the neuron ids to population indices and clears the kernel cache.
+        Called automatically by step() after synapses or neurons have been added or removed,
+        once for all changes since the last step.
+        """
+        self._ready()
+        self.sourceIndex = self.source.index.indices(self.sourceIds)
+        self.destinationIndex = self.destination.index.indices(self.destinationIds)
+        self.cache = {}
+        if self.kernel is None:
+            self._views = [(SynapseView(self, id), NeuronView(self.source, s), NeuronView(self.destination, d))
+                           for (id, s, d) in zip(self.ids, self.sourceIds, self.destinationIds)]
+        self._builtVersions = (self.version, self.source.version, self.destination.version)
+
+    def step(self):
+        """
+        Updates all synapses of this projection for one time step
+        """
+        if self._ready():
+            self.build()
+        if len(self.ids) == 0:
+            return
+        if self.kernel is not None:
+            self.kernel(self, self.dt)
+        else:
+            for (synapse, source, destination) in self._views:
+                self.fun(synapse, source, destination)
+
+
+class DelayLine(object):
+    """
+    Network wide circular buffer for delayed synaptic values.
+    buffer[slot, column]: a column belongs to one consumer (a dict synapse or one destination neuron of a
+    SynapseProjection). Values are added to the slot `delay` steps ahead of the pointer and read from the slot
+    at the pointer. advance() clears the current slot and moves the pointer, once per simulation step.
+    """
+
+    def __init__(self):
+        self.buffer = np.zeros((1, 0))
+        self.slots = 1
+        self.pointer = 0
+        self._used = 0   # Columns in use or freed, the rest of buffer is spare capacity
+        self._free = []  # Released columns
+
+    def allocate(self, width):
+        """
+        :param width: number of columns
+        :return: array with the allocated column indices
+        """
+        columns = []
+        while self._free and len(columns) < width:
+            columns.append(self._free.pop())
+        need = width - len(columns)
+        if self._used + need > self.buffer.shape[1]:
+            # Double the capacity, amortized O(1) per column
+            capacity = max(2 * self.buffer.shape[1], self._used + need, 16)
+            grown = np.zeros((self.slots, capacity))
+            grown[:, :self._used] = self.buffer[:, :self._used]
+            self.buffer = grown
+        columns.extend(range(self._used, self._used + need))
+        self._used += need
+        return np.array(columns, dtype=np.intp)
+
+    def release(self, columns):
+        """
+        Clears the columns and makes them available for allocate()
+        """
+        self.buffer[:, columns] = 0
+        self._free.extend(int(c) for c in columns)
+
+    def move(self, source, destination):
+        """
+        Moves the pending values of the source columns to the destination columns
+        """
+        self.buffer[:, destination] = self.buffer[:, source]
+        self.buffer[:, source] = 0
+
+    def ensureSlots(self, slots):
+        """
+        Grows the ring to at least slots slots, pending values keep their time of arrival
+        """
+        if slots <= self.slots:
+            return
+        ahead = self.pointer + np.arange(self.slots)
+        grown = np.zeros((slots, self.buffer.shape[1]))
+        grown[ahead % slots] = self.buffer[ahead % self.slots]
+        self.buffer = grown
+        self.slots = slots
+
+    def add(self, delay, columns, values):
+        """
+        Adds values to the columns, to be read delay steps from now (delay 0: this step)
+        """
+        self.buffer[(self.pointer + delay) % self.slots, columns] += values
+
+    def read(self, columns):
+        return self.buffer[self.pointer % self.slots, columns]
+
+    def addOne(self, delay, column, value):
+        """
+        add() for one column (int), plain integer indexing: a dict engine synapse calls it every step
+        """
+        self.buffer[(self.pointer + delay) % self.slots, column] += value
+
+    def readOne(self, column):
+        """
+        read() for one column (int), returns a float
+        """
+        return self.buffer.item(self.pointer % self.slots, column)
+
+    def advance(self):
+        self.buffer[self.pointer % self.slots, :] = 0
+        self.pointer += 1
+
+
+class SpikeQueue(object):
+    """
+    Calendar queue for spike events: a ring of buckets, one per arrival step.
+    A bucket holds (destination index, value, synapse row) arrays that are delivered when their step is due,
+    so the cost depends on the number of events instead of the number of synapses.
+    The synapse rows let remap() drop the events of deleted synapses, like the dict engine drops the
+    pending values with the synapse dict.
+    Usage per step: pop(), push() new events, advance()
+    """
+
+    def __init__(self, horizon=1):
+        self.buckets = [[] for _ in range(horizon)]
+        self.step = 0
+
+    def ensureHorizon(self, horizon):
+        """
+        Grows the ring to at least horizon buckets (the longest delay), events keep their arrival step
+        """
+        old = len(self.buckets)
+        if horizon <= old:
+            return
+        buckets = [[] for _ in range(horizon)]
+        for k in range(old):
+            buckets[(self.step + k) % horizon] = self.buckets[(self.step + k) % old]
+        self.buckets = buckets
+
+    def push(self, delay, destinations, values, synapses):
+        """
+        Queues values for the destinations, delivered delay steps from now (1 <= delay <= horizon)
+        :param synapses: the row of the synapse of every value
+        """
+        self.buckets[(self.step + delay) % len(self.buckets)].append((destinations, values, synapses))
+
+    def pop(self):
+        """
+        :return: (destinations, values) arrays due this step or None
+        """
+        i = self.step % len(self.buckets)
+        bucket = self.buckets[i]
+        if not bucket:
+            return None
+        self.buckets[i] = []
+        if len(bucket) == 1:
+            return bucket[0][:2]
+        return (np.concatenate([d for (d, v, s) in bucket]), np.concatenate([v for (d, v, s) in bucket]))
+
+    def advance(self):
+        self.step += 1
+
+    def remap(self, mapping, synapses):
+        """
+        Translates the queued destination indices and synapse rows, mapping[old index] = new index and
+        synapses[old row] = new row (-1: dropped)
+        """
+        for bucket in self.buckets:
+            for (k, (destinations, values, rows)) in enumerate(bucket):
+                new = mapping[destinations]
+                newRows = synapses[rows]
+                keep = (new >= 0) & (newRows >= 0)
+                bucket[k] = (new[keep], values[keep], newRows[keep])
+
+
+class SparseScatter(object):
+    """
+    Sums weighted values of source elements into destination elements:
+        result[row] = sum(data * vector[col]) for every (row, col, data) entry
+    Uses a scipy.sparse CSR matrix if scipy is installed, numpy.bincount otherwise.
+    """
+
+    def __init__(self, rows, cols, data, shape):
+        self.shape = shape
+        if sparse is not None:
+            self._matrix = sparse.csr_matrix((data, (rows, cols)), shape=shape)
+        else:
+            self._matrix = None
+            self._rows = rows
+            self._cols = cols
+            self._data = data
+
+    def dot(self, vector):
+        if self._matrix is not None:
+            return self._matrix.dot(vector)
+        return np.bincount(self._rows, weights=self._data * vector[self._cols], minlength=self.shape[0])
+
+
+class _View(object):
+    """
+    Dict like access to a single element of a _ColumnStore
+    """
+    __slots__ = ('_store', '_id')
+
+    def __init__(self, store, id):
+        self._store = store
+        self._id = id
+
+    def __getitem__(self, key):
+        try:
+            return self._store.get(self._id, key)
+        except KeyError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        self._store.set(self._id, key, value)
+
+    def __contains__(self, key):
+        return key in self._store.state or key in self._store.reservedKeys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self._store.state) + len(self._store.reservedKeys)
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.toDict())
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self._store.keys()
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def update(self, other):
+        for (key, value) in dict(other).items():
+            self[key] = value
+
+    def toDict(self):
+        """
+        :return: a plain dict copy of the element
+        """
+        return self._store.toDict(self._id)
+
+    def __getstate__(self):
+        return (self._store, self._id)
+
+    def __setstate__(self, state):
+        self._store, self._id = state
+
+
+class NeuronView(_View):
+    """
+    Dict like access to a single neuron inside a NeuronPopulation.
+    network.getNeuronByID(i)['Istim'] = 10 writes directly into the population arrays.
+    """
+    __slots__ = ()
+
+
+class SynapseView(_View):
+    """
+    Dict like access to a single synapse inside a SynapseProjection.
+    """
+    __slots__ = ()
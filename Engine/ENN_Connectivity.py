@@ -0,0 +1,346 @@
+'''
+Author: Erwin Diepgrond
+Copyright 2016 under GNU license
+e.j.diepgrond@gmail.com
+
+	This file is part of NeuroNet.
+
+	NeuroNet is free software: you can redistribute it and/or modify
+	it under the terms of the GNU General Public License as published by
+	the Free Software Foundation, either version 3 of the License,
+	or any later version.
+
+	NeuroNet is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License
+	along with NeuroNet.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import numbers
+import numpy as np
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None  # spatial() uses its own grid index
+
+##########################################
+#### Connectivity generators          ####
+##########################################
+# Random network structures as edge arrays, for Network.connectMany and Network.fromEdges:
+#   (sources, destinations) = erdosRenyi(10000, 0.01, rng=1)
+#   net = Network.fromEdges(sources, destinations, neuronFun, neuronDict, synapseFun, synapseDict, dt)
+# Neurons are numbered 0 .. n - 1. The work is proportional to the number of edges, not to n * n
+# (geometric skipping over the candidate pairs, sampling without replacement per neuron).
+# rng: a numpy.random.Generator, an int seed or None (random)
+
+# Elements per temporary array when sampling per neuron
+_chunkElements = 1 << 22
+
+
+def _rng(rng):
+    if isinstance(rng, np.random.Generator):
+        return rng
+    return np.random.default_rng(rng)
+
+
+def _pairs(rows, columns, p, rng, diagonal=True):
+    """
+    Every pair (row, column) with probability p, by geometric skipping: the distance to the next
+    chosen pair is geometrically distributed, so only the chosen pairs are drawn.
+    :param diagonal: False: pairs with row == column are not candidates (square only)
+    :return: (rows, columns) int64 arrays, sorted by row
+    """
+    width = columns if diagonal else columns - 1
+    total = rows * width
+    if p <= 0 or total <= 0:
+        positions = np.zeros(0, dtype=np.int64)
+    elif p >= 1:
+        positions = np.arange(total, dtype=np.int64)
+    else:
+        expected = total * p
+        chunk = int(expected + 5 * np.sqrt(expected)) + 16
+        parts = []
+        last = -1
+        while True:
+            steps = last + np.cumsum(rng.geometric(p, size=chunk))
+            if steps[-1] >= total:
+                parts.append(steps[steps < total])
+                break
+            parts.append(steps)
+            last = steps[-1]
+            chunk = max(16, chunk // 4)  # Only the tail is left
+        positions = np.concatenate(parts)
+    (r, c) = np.divmod(positions, width)
+    if not diagonal:
+        c += c >= r
+    return (r, c)
+
+
+def _distinct(rows, population, k, rng):
+    """
+    :return: (rows, k) int64 array, every row k different values of range(population) (random order)
+    """
+    if k > population:
+        raise ValueError('(Connectivity) Can not choose %i of %i neurons' % (k, population))
+    result = np.empty((rows, k), dtype=np.int64)
+    step = max(1, _chunkElements // max(1, population if 2 * k > population else 2 * k))
+    for start in range(0, rows, step):
+        stop = min(rows, start + step)
+        result[start:stop] = _distinctRows(stop - start, population, k, rng)
+    return result
+
+
+def _distinctRows(rows, population, k, rng):
+    if k == 0:
+        return np.zeros((rows, 0), dtype=np.int64)
+    if 2 * k > population:
+        # Choose the ones to leave out
+        excluded = _distinctRows(rows, population, population - k, rng)
+        keep = np.ones((rows, population), dtype=bool)
+        keep[np.arange(rows)[:, None], excluded] = False
+        chosen = np.nonzero(keep)[1].reshape(rows, k)
+        return np.take_along_axis(chosen, rng.random((rows, k)).argsort(axis=1), axis=1)
+    # Draw 2k with replacement, drop the duplicates and keep k random ones of the rest.
+    # Rows with less than k different values (rare) are drawn again.
+    result = np.empty((rows, k), dtype=np.int64)
+    todo = np.arange(rows)
+    while len(todo):
+        draws = rng.integers(0, population, size=(len(todo), 2 * k))
+        draws.sort(axis=1)
+        duplicate = np.zeros(draws.shape, dtype=bool)
+        duplicate[:, 1:] = draws[:, 1:] == draws[:, :-1]
+        keys = rng.random(draws.shape)
+        keys[duplicate] = 2.0
+        pick = np.argpartition(keys, k - 1, axis=1)[:, :k]
+        done = (~duplicate).sum(axis=1) >= k
+        result[todo[done]] = np.take_along_axis(draws, pick, axis=1)[done]
+        todo = todo[~done]
+    return result
+
+
+def _fixedDegree(n, k, rng, selfConnections):
+    # (neuron, partner) pairs, k different partners per neuron
+    rng = _rng(rng)
+    partners = _distinct(n, n if selfConnections else n - 1, k, rng)
+    neurons = np.arange(n, dtype=np.int64)
+    if not selfConnections:
+        partners += partners >= neurons[:, None]
+    return (np.repeat(neurons, k), partners.ravel())
+
+
+def erdosRenyi(n, p, rng=None, selfConnections=False):
+    """
+    Every (ordered) pair of neurons is connected with probability p
+    :param n: number of neurons
+    :param p: connection probability
+    :param selfConnections: allow i -> i
+    :return: (sources, destinations) int64 arrays
+    """
+    return _pairs(n, n, p, _rng(rng), diagonal=selfConnections)
+
+
+def fixedInDegree(n, k, rng=None, selfConnections=False):
+    """
+    Every neuron receives synapses from exactly k different (random) neurons
+    :param n: number of neurons
+    :param k: in-degree
+    :return: (sources, destinations) int64 arrays
+    """
+    (destinations, sources) = _fixedDegree(n, k, rng, selfConnections)
+    return (sources, destinations)
+
+
+def fixedOutDegree(n, k, rng=None, selfConnections=False):
+    """
+    Every neuron connects to exactly k different (random) neurons
+    :param n: number of neurons
+    :param k: out-degree
+    :return: (sources, destinations) int64 arrays
+    """
+    return _fixedDegree(n, k, rng, selfConnections)
+
+
+def blocks(sizes, p, rng=None, selfConnections=False):
+    """
+    Block (community) structure: neurons are split in consecutive groups, a neuron of group a
+    connects to a neuron of group b with probability p[a][b]
+    :param sizes: number of neurons per group, e.g. (800, 200)
+    :param p: matrix (len(sizes) x len(sizes)) of connection probabilities, or a pair
+              (pIn, pOut): the probability within the groups and between them
+    :return: (sources, destinations) int64 arrays
+    """
+    rng = _rng(rng)
+    count = len(sizes)
+    if np.ndim(p) == 1 and len(p) == 2:
+        (pIn, pOut) = p
+        p = np.full((count, count), pOut, dtype=np.float64)
+        np.fill_diagonal(p, pIn)
+    p = np.asarray(p, dtype=np.float64)
+    if not p.shape == (count, count):
+        raise ValueError('(Connectivity) Expected %i x %i probabilities, got %s' % (count, count, p.shape))
+    offsets = np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+    sources = []
+    destinations = []
+    for a in range(count):
+        for b in range(count):
+            (r, c) = _pairs(int(sizes[a]), int(sizes[b]), p[a, b], rng, diagonal=selfConnections or not a == b)
+            sources.append(r + offsets[a])
+            destinations.append(c + offsets[b])
+    return (np.concatenate(sources), np.concatenate(destinations))
+
+
+def _weights(weight, rng, size):
+    if isinstance(weight, numbers.Number):
+        return np.full(size, weight, dtype=np.float64)
+    return np.asarray(weight(rng, size), dtype=np.float64)
+
+
+def excitatoryInhibitory(n, p, fractionExcitatory=0.8, excitatoryWeight=1.0, inhibitoryWeight=1.0, rng=None,
+                         selfConnections=False):
+    """
+    Random network of excitatory neurons (ids 0 .. nE - 1) and inhibitory neurons (nE .. n - 1),
+    every pair is connected with probability p
+    :param n: number of neurons
+    :param p: connection probability, or a 2 x 2 matrix [[EE, EI], [IE, II]] (source class, destination class)
+    :param fractionExcitatory: fraction of excitatory neurons, nE = floor(n * fractionExcitatory)
+    :param excitatoryWeight: weight of the excitatory synapses, a number or fun(rng, size) -> weights
+                             e.g. lambda rng, size: np.abs(rng.normal(0, 10, size))
+    :param inhibitoryWeight: weight of the inhibitory synapses, same as excitatoryWeight
+    :return: (sources, destinations, weights, excitatory) with excitatory: True for synapses from
+             an excitatory neuron
+    """
+    rng = _rng(rng)
+    excitatoryCount = int(np.floor(n * fractionExcitatory))
+    if np.ndim(p) == 0:
+        p = np.full((2, 2), p, dtype=np.float64)
+    (sources, destinations) = blocks((excitatoryCount, n - excitatoryCount), p, rng, selfConnections)
+    excitatory = sources < excitatoryCount
+    weights = np.empty(len(sources), dtype=np.float64)
+    weights[excitatory] = _weights(excitatoryWeight, rng, int(excitatory.sum()))
+    weights[~excitatory] = _weights(inhibitoryWeight, rng, int((~excitatory).sum()))
+    return (sources, destinations, weights, excitatory)
+
+
+##########################################
+#### Spatial connectivity             ####
+##########################################
+# Neurons get a position and connect with a probability that depends on their distance:
+#   pos = positions(5000, rng=1)
+#   (sources, destinations, distances) = spatial(pos, gaussian(0.5, 0.05), cutoff=0.15, rng=1)
+# Only pairs closer than the cutoff are examined, found with a KD-tree (scipy) or a grid of cutoff sized cells.
+# positions() uses the coordinates of python27Ca2VideoMaker.renderCa2Video (-1 .. 1), which accepts the
+# same array as netpos.
+
+
+def positions(n, dim=2, rng=None, extent=1.0):
+    """
+    Uniform random positions
+    :param n: number of neurons
+    :param dim: 2 or 3
+    :param extent: coordinates are between -extent and extent
+    :return: (n, dim) array, row i is the position of neuron i
+    """
+    return _rng(rng).uniform(-extent, extent, size=(n, dim))
+
+
+def gaussian(p, sigma):
+    """
+    :return: probability kernel p * exp(-d^2 / (2 sigma^2)) for spatial()
+    """
+    return lambda distances: p * np.exp(-distances ** 2 / (2.0 * sigma ** 2))
+
+
+def exponential(p, scale):
+    """
+    :return: probability kernel p * exp(-d / scale) for spatial()
+    """
+    return lambda distances: p * np.exp(-distances / scale)
+
+
+def spatial(positions, probability, cutoff, rng=None, selfConnections=False, index='auto'):
+    """
+    Distance dependent connectivity: neuron i connects to neuron j with probability(distance(i, j)),
+    pairs further apart than cutoff are never connected
+    :param positions: (n, dim) array, row i is the position of neuron i (see positions())
+    :param probability: a number (the same for every pair within cutoff) or fun(distances) -> probabilities
+                        e.g. gaussian(0.5, 0.05) or exponential(0.5, 0.05)
+    :param cutoff: maximum distance of a connection
+    :param index: 'kdtree' (scipy), 'grid' or 'auto' (kdtree if scipy is installed).
+                  Both give the same network for the same rng
+    :return: (sources, destinations, distances) arrays
+    """
+    rng = _rng(rng)
+    positions = np.asarray(positions, dtype=np.float64)
+    if index == 'auto':
+        index = 'kdtree' if cKDTree is not None else 'grid'
+    if index == 'kdtree':
+        (i, j) = _treePairs(positions, cutoff)
+    elif index == 'grid':
+        (i, j) = _gridPairs(positions, cutoff)
+    else:
+        raise ValueError('(Connectivity) Unknown index: %s' % index)
+    if selfConnections:
+        everyone = np.arange(len(positions), dtype=np.int64)
+        (i, j) = (np.concatenate((i, everyone)), np.concatenate((j, everyone)))
+    # Same order for every index, so the same rng draws the same network
+    order = np.argsort(i * len(positions) + j)
+    (i, j) = (i[order], j[order])
+    distances = np.sqrt(((positions[i] - positions[j]) ** 2).sum(axis=1))
+    if isinstance(probability, numbers.Number):
+        chance = np.full(len(i), probability, dtype=np.float64)
+    else:
+        chance = np.asarray(probability(distances), dtype=np.float64)
+    keep = rng.random(len(i)) < chance
+    return (i[keep], j[keep], distances[keep])
+
+
+def _treePairs(positions, cutoff):
+    # Ordered pairs i != j within cutoff
+    pairs = cKDTree(positions).query_pairs(cutoff, output_type='ndarray').astype(np.int64)
+    return (np.concatenate((pairs[:, 0], pairs[:, 1])), np.concatenate((pairs[:, 1], pairs[:, 0])))
+
+
+def _gridPairs(positions, cutoff):
+    """
+    Ordered pairs i != j within cutoff. The neurons are sorted into cells of cutoff x cutoff,
+    the partners of a neuron can only be in its own or a neighbouring cell.
+    """
+    (n, dim) = positions.shape
+    if n == 0:
+        return (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    cells = np.floor((positions - positions.min(axis=0)) / cutoff).astype(np.int64)
+    shape = cells.max(axis=0) + 1
+    keys = np.ravel_multi_index(cells.T, shape)
+    # Work on the neurons sorted by cell, the neurons of a cell are then next to each other in memory
+    order = np.argsort(keys, kind='stable')
+    (keys, cells, points) = (keys[order], cells[order], positions[order])
+    if np.prod(shape) <= 8 * n + 1024:
+        # First neuron and number of neurons per cell
+        cellCounts = np.bincount(keys, minlength=int(np.prod(shape)))
+        cellStarts = np.cumsum(cellCounts) - cellCounts
+    else:
+        cellCounts = None  # Mostly empty cells, look them up in keys
+    sources = []
+    destinations = []
+    for offset in np.ndindex(*([3] * dim)):
+        neighbour = cells + (np.array(offset) - 1)
+        inside = np.all((neighbour >= 0) & (neighbour < shape), axis=1)
+        members = np.nonzero(inside)[0]
+        neighbourKeys = np.ravel_multi_index(neighbour[members].T, shape)
+        if cellCounts is not None:
+            (start, counts) = (cellStarts[neighbourKeys], cellCounts[neighbourKeys])
+        else:
+            start = np.searchsorted(keys, neighbourKeys, side='left')
+            counts = np.searchsorted(keys, neighbourKeys, side='right') - start
+        i = np.repeat(members, counts)
+        j = np.repeat(start - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        squared = np.zeros(len(i))
+        for axis in range(dim):
+            squared += (points[i, axis] - points[j, axis]) ** 2
+        close = (squared <= cutoff ** 2) & ~(i == j)
+        sources.append(order[i[close]])
+        destinations.append(order[j[close]])
+    return (np.concatenate(sources), np.concatenate(destinations))
@@ -0,0 +1,389 @@
+'''
+Author: Erwin Diepgrond
+Copyright 2016 under GNU license
+e.j.diepgrond@gmail.com
+
+	This file is part of NeuroNet.
+
+	NeuroNet is free software: you can redistribute it and/or modify
+	it under the terms of the GNU General Public License as published by
+	the Free Software Foundation, either version 3 of the License,
+	or any later version.
+
+	NeuroNet is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License
+	along with NeuroNet.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import __future__
+import ast
+import hashlib
+import marshal
+import os
+import re
+import sys
+import numpy
+
+from Engine.ENN_Integrators import IntegratorModel, integrators
+
+##########################################
+#### Equation models                  ####
+##########################################
+# A neuron model written as equations instead of an update function:
+#
+#   izhikevich = EquationModel('''
+#       dv/dt = 0.04 * v * v + 5 * v + 140 + I - u
+#       du/dt = a * (b * v - u)
+#   ''', threshold='v >= 30', reset='v = c; u = u_pre + d', clear=['I'], order='simultaneous')
+#
+#   network = Network(izhikevich, neuronDict, ...)
+#
+# The model is the neuron function of the dict engine and has a vectorized kernel for the array engine,
+# both generated as python source. The compiled code is cached on disk (see cacheDirectory).
+#
+# Equations, one per line (or separated by ';'), '#' starts a comment:
+#   dX/dt = expression   differential equation of state variable X
+#   X = expression       assignment. X is stored in the neuron when it is a key of defaults,
+#                        otherwise it is an intermediate value of the step
+# Expressions are python. Names are neuron properties, intermediate values, dt, noise (the NoiseSource of the
+# network), the numpy functions in _namespace or the given functions.
+# threshold and reset use stored values only, X_pre is the value of state variable X at the start of the step.
+
+# Directory of the compiled equations. None: no disk cache
+cacheDirectory = os.environ.get('ENN_CACHE', os.path.join(os.path.expanduser('~'), '.NeuronNet', 'equations'))
+
+# Change when the generated code changes, invalidates the disk cache
+_codeVersion = 2
+
+# Compiled code by cache key, so every model is compiled (or loaded) once per process
+_codeCache = {}
+
+_differential = re.compile(r'^d([A-Za-z_]\w*)\s*/\s*dt\s*=(.+)$')
+_assignment = re.compile(r'^([A-Za-z_]\w*)\s*=(?!=)(.+)$')
+
+# Functions the equations may use
+_namespace = {
+    'exp': numpy.exp, 'log': numpy.log, 'sqrt': numpy.sqrt, 'sin': numpy.sin, 'cos': numpy.cos,
+    'tanh': numpy.tanh, 'abs': numpy.absolute, 'minimum': numpy.minimum, 'maximum': numpy.maximum,
+    'clip': numpy.clip, 'where': numpy.where, 'pi': numpy.pi
+}
+
+
+def _column(value, size):
+    # The array kernel stores full columns, also when an expression gives a scalar
+    if isinstance(value, numpy.ndarray) and value.shape == (size,):
+        return value
+    return numpy.full(size, value, dtype=numpy.float64)
+
+
+def _statements(text):
+    if text is None:
+        return []
+    if not isinstance(text, str):
+        text = '\n'.join(text)
+    lines = []
+    for line in text.splitlines():
+        for statement in line.split('#')[0].split(';'):
+            if statement.strip():
+                lines.append(statement.strip())
+    return lines
+
+
+def _names(expression):
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError:
+        raise ValueError('(EquationModel) Invalid expression: %s' % expression)
+    return set(node.id for node in ast.walk(tree) if isinstance(node, ast.Name))
+
+
+class EquationModel(object):
+    """
+    Neuron model from equations. Use it as the neuron function of a Network (both engines).
+    self.kernel is its vectorized kernel, self.integratorModel describes it for the integrators
+    other than 'euler' (see ENN_Integrators).
+    """
+
+    def __init__(self, equations, threshold=None, reset=None, clear=(), order='sequential', defaults=None,
+                 functions=None, gates=None, name='equationModel', lazy=False):
+        """
+        :param equations: string with the equations, see the top of this file
+        :param threshold: expression, the reset is applied where it is true
+        :param reset: assignments (string) applied where threshold is true
+        :param clear: properties set to 0 at the end of a step (inputs the synapses add to, e.g. ['I'])
+        :param order: 'sequential': every line sees the values of the lines above it in the same step
+                      (HodgkinAndHuxleyNeuron). 'simultaneous': all differential equations use the values
+                      at the start of the step (neuronIzh)
+        :param defaults: neuron dict with the default properties, for Network(neuronDict=model.defaults)
+        :param functions: dict name -> function the equations may call
+        :param gates: dict state variable -> (alpha expression, beta expression), used by 'rushlarsen'
+        :param name: shown in the generated code and errors
+        :param lazy: compile on first use instead of now (models defined at import, nothing is compiled or
+                     written to the cache directory until a network uses them). Errors in the equations
+                     are then raised on first use
+        """
+        if order not in ('sequential', 'simultaneous'):
+            raise ValueError('(EquationModel) Unknown order: %s' % order)
+        self._arguments = (equations, threshold, reset, tuple(clear), order, defaults, functions, gates, name,
+                           lazy)
+        self.name = name
+        self.defaults = dict(defaults) if defaults is not None else {}
+        self.functions = dict(functions) if functions is not None else {}
+        self.kernel = _EquationKernel(self)
+        self._step = None  # set by _build
+        if not lazy:
+            self._build()
+
+    def _build(self):
+        (equations, threshold, reset, clear, order, _, _, gates, _, _) = self._arguments
+        namespace = dict(_namespace)
+        namespace.update(self.functions)
+        namespace.update({'integrators': integrators, 'random': numpy.random, '_column': _column})
+        code = self._compile(equations, threshold, reset, clear, order, gates, set(namespace))
+        exec(code, namespace)
+        gateFunctions = dict((variable, namespace['_gate_' + variable]) for variable in namespace['_gates'])
+        self._variables = namespace['_variables']
+        self._parameters = namespace['_parameters']
+        self._integratorModel = IntegratorModel(self._variables, namespace['_derivatives'], gates=gateFunctions)
+        namespace['_model'] = self._integratorModel
+        self._arrayStep = namespace['_arrayStep']
+        self._step = namespace['_step']
+        return self
+
+    def _built(self):
+        return self if self._step is not None else self._build()
+
+    @property
+    def variables(self):
+        return self._built()._variables
+
+    @property
+    def parameters(self):
+        # only read, shared by the array engine (see ENN_Arrays)
+        return self._built()._parameters
+
+    @property
+    def integratorModel(self):
+        return self._built()._integratorModel
+
+    def __call__(self, neuronDict):
+        """
+        The neuron function for the dict engine
+        """
+        if self._step is None:
+            self._build()
+        return self._step(neuronDict)
+
+    def __reduce__(self):
+        # Rebuilt from the equations (from the code cache) e.g. in a Pool process, lazy models stay lazy
+        return (_rebuild, self._arguments)
+
+    def __repr__(self):
+        return '<EquationModel %s>' % self.name
+
+    ################ Compiling ################
+    def _cacheKey(self, equations, threshold, reset, clear, order, gates, namespace):
+        key = repr((_codeVersion, sys.version, _statements(equations), _statements(threshold), _statements(reset),
+                    clear, order, sorted(self.defaults.keys()), sorted(namespace),
+                    sorted(gates.items()) if gates else None, self.name))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _compile(self, equations, threshold, reset, clear, order, gates, namespace):
+        key = self._cacheKey(equations, threshold, reset, clear, order, gates, namespace)
+        if key in _codeCache:
+            return _codeCache[key]
+        path = os.path.join(cacheDirectory, key + '.marshal') if cacheDirectory is not None else None
+        code = None
+        if path is not None and os.path.isfile(path):
+            try:
+                with open(path, 'rb') as f:
+                    code = marshal.loads(f.read())
+            except (IOError, OSError, ValueError, EOFError, TypeError):
+                code = None
+        if code is None:
+            source = self._generate(equations, threshold, reset, clear, order, gates, namespace)
+            code = compile(source, '<EquationModel %s>' % self.name, 'exec',
+                           __future__.division.compiler_flag, True)
+            if path is not None:
+                try:
+                    if not os.path.isdir(cacheDirectory):
+                        os.makedirs(cacheDirectory)
+                    temporary = '%s.%i' % (path, os.getpid())
+                    with open(temporary, 'wb') as f:
+                        f.write(marshal.dumps(code))
+                    os.rename(temporary, path)
+                except (IOError, OSError):
+                    pass  # Read only or shared by another process, only slower next time
+        _codeCache[key] = code
+        return code
+
+    def _generate(self, equations, threshold, reset, clear, order, gates, namespace):
+        """
+        :return: python source defining _step (dict engine), _arrayStep (array engine), _derivatives and
+                 _gate_X (integrators), _variables and _gates
+        """
+        lines = []  # (kind, name, expression), kind: 'd' differential or '=' assignment
+        for statement in _statements(equations):
+            match = _differential.match(statement) or _assignment.match(statement)
+            if match is None:
+                raise ValueError('(EquationModel %s) Can not parse: %s' % (self.name, statement))
+            lines.append(('d' if match.re is _differential else '=', match.group(1), match.group(2).strip()))
+        resets = []
+        for statement in _statements(reset):
+            match = _assignment.match(statement)
+            if match is None:
+                raise ValueError('(EquationModel %s) Can not parse reset: %s' % (self.name, statement))
+            resets.append((match.group(1), match.group(2).strip()))
+        gates = dict(gates) if gates is not None else {}
+
+        variables = [name for (kind, name, _) in lines if kind == 'd']
+        assigned = set(name for (kind, name, _) in lines if kind == '=')
+        stored = set(variables) | set(name for name in assigned if name in self.defaults) | \
+                 set(name for (name, _) in resets)
+        intermediates = assigned - stored
+        special = set(['dt', 'noise'])
+        pre = set(name + '_pre' for name in variables)
+        for name in gates:
+            if name not in variables:
+                raise ValueError('(EquationModel %s) Gate %s is not a state variable' % (self.name, name))
+
+        used = set()
+        for (_, _, expression) in lines:
+            used |= _names(expression)
+        after = _names(threshold) if threshold is not None else set()
+        for (_, expression) in resets:
+            after |= _names(expression)
+        if after & intermediates:
+            raise ValueError('(EquationModel %s) threshold and reset can not use intermediate values: %s' %
+                             (self.name, ', '.join(sorted(after & intermediates))))
+        for (alpha, beta) in gates.values():
+            used |= _names(alpha) | _names(beta)
+        used |= after
+        loaded = sorted((used | set(variables)) - intermediates - special - pre - set(namespace))
+        loadedAfter = sorted(stored)
+        if self.defaults:
+            unknown = [name for name in loaded if name not in self.defaults]
+            if unknown:
+                raise ValueError('(EquationModel %s) Unknown names: %s' % (self.name, ', '.join(unknown)))
+        extras = sorted(name for name in assigned if name in stored)
+
+        def load(names, indent):
+            return ['%s%s = _d[%r]' % (indent, name, name) for name in names]
+
+        def store(names, indent, array):
+            if array:
+                return ['%s_d[%r] = _column(%s, _n)' % (indent, name, name) for name in names]
+            return ['%s_d[%r] = %s' % (indent, name, name) for name in names]
+
+        def euler(indent):
+            code = []
+            for (kind, name, expression) in lines:
+                if kind == '=':
+                    code.append('%s%s = %s' % (indent, name, expression))
+                elif order == 'sequential':
+                    code.append('%s%s = %s + dt * (%s)' % (indent, name, name, expression))
+                else:
+                    code.append('%s_d%s_dt = %s' % (indent, name, expression))
+            if order == 'simultaneous':
+                code += ['%s%s = %s + dt * _d%s_dt' % (indent, name, name, name) for name in variables]
+            return code
+
+        def step(array):
+            code = []
+            if array:
+                code += ['def _arrayStep(_population, dt):',
+                         '    _d = _population.state',
+                         '    _n = len(_population.ids)',
+                         '    _integrator = _population.integrator']
+                code += ['    noise = _population.noise'] if 'noise' in used else []
+            else:
+                code += ['def _step(_d):',
+                         '    dt = _d[\'dt\']',
+                         '    _integrator = _d.get(\'integrator\', \'euler\')']
+                code += ['    noise = _d.get(\'noise\', random)'] if 'noise' in used else []
+            code += load(loaded, '    ')
+            code += ['    %s_pre = %s' % (name, name) for name in variables if name + '_pre' in after]
+            if variables:
+                code += ['    if _integrator == \'euler\':']
+                code += euler('        ')
+                code += store(sorted(set(variables) | set(extras)), '        ', array)
+                code += ['    else:',
+                         '        integrators[_integrator](_model, _d, dt)']
+                code += load(loadedAfter, '        ')
+            else:
+                # Nothing to integrate
+                code += euler('    ')
+                code += store(sorted(extras), '    ', array)
+            if threshold is not None:
+                if array:
+                    code += ['    _fired = %s' % threshold,
+                             '    if numpy_any(_fired):']
+                    for (name, expression) in resets:
+                        code += ['        %s = where(_fired, %s, %s)' % (name, expression, name)]
+                    code += store(sorted(set(name for (name, _) in resets)), '        ', array)
+                else:
+                    code += ['    if %s:' % threshold]
+                    code += ['        %s = %s' % (name, expression) for (name, expression) in resets]
+                    code += store(sorted(set(name for (name, _) in resets)), '        ', array)
+            for name in clear:
+                code += ['    _d[%r][:] = 0' % name] if array else ['    _d[%r] = 0' % name]
+            code += ['    return _d', '']
+            return code
+
+        def values(indent):
+            # The state variables come from the integrator, everything else from the neuron
+            code = ['%snoise = _d.get(\'noise\', random)' % indent] if 'noise' in used else []
+            code += load([name for name in loaded if name not in variables], indent)
+            code += ['%s(%s,) = _values' % (indent, ', '.join(variables))] if variables else []
+            return code
+
+        source = ['# Generated by ENN_Equations from %s' % self.name,
+                  'from numpy import any as numpy_any',
+                  '_variables = %r' % (tuple(variables),),
+                  '_gates = %r' % (tuple(sorted(gates)),),
+                  '_parameters = %r' % (tuple(name for name in loaded if name not in stored and name not in clear),),
+                  '']
+        source += step(False)
+        source += step(True)
+        source += ['def _derivatives(_d, _values):']
+        source += values('    ')
+        for (kind, name, expression) in lines:
+            if kind == '=':
+                source += ['    %s = %s' % (name, expression)]
+            else:
+                source += ['    _d%s_dt = %s' % (name, expression)]
+        source += ['    return ([%s], {%s})' % (', '.join('_d%s_dt' % name for name in variables),
+                                               ', '.join('%r: %s' % (name, name) for name in extras)), '']
+        for (name, (alpha, beta)) in sorted(gates.items()):
+            source += ['def _gate_%s(_d, _values):' % name]
+            source += values('    ')
+            source += ['    %s = %s' % (n, expression) for (kind, n, expression) in lines if kind == '=']
+            source += ['    return (%s, %s)' % (alpha, beta), '']
+        return '\n'.join(source) + '\n'
+
+
+def _rebuild(*arguments):
+    return EquationModel(*arguments)
+
+
+class _EquationKernel(object):
+    """
+    The vectorized kernel of an EquationModel, kernel(population, dt) like the ones in ENN_Models.vectorizedModels
+    """
+    __slots__ = ('model',)
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, population, dt):
+        return self.model._built()._arrayStep(population, dt)
+
+    def __getstate__(self):
+        return self.model
+
+    def __setstate__(self, model):
+        self.model = model
@@ -0,0 +1,133 @@
+'''
+Author: Erwin Diepgrond
+Copyright 2016 under GNU license
+e.j.diepgrond@gmail.com
+
+	This file is part of NeuroNet.
+
+	NeuroNet is free software: you can redistribute it and/or modify
+	it under the terms of the GNU General Public License as published by
+	the Free Software Foundation, either version 3 of the License,
+	or any later version.
+
+	NeuroNet is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License
+	along with NeuroNet.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import numpy
+from numpy import exp
+
+##########################################
+#### Integrators                      ####
+##########################################
+# Network(integrator='...') selects one of these for the models that describe themselves
+# with an IntegratorModel (see ENN_Models). 'euler' is handled by the models themselves,
+# so existing results do not change.
+# The integrators only use arithmetic on the values, so the same code works on a neuron dict (floats)
+# and on the state of a NeuronPopulation (numpy arrays).
+# ENN_Models raises on every floating point error, the integrators ignore underflow (rates going to 0 at large dt).
+
+
+class IntegratorModel(object):
+    """
+    Describes the differential equations of a neuron model
+    """
+
+    def __init__(self, variables, derivatives, gates=None):
+        """
+        :param variables: names of the integrated variables, e.g. ('Vm', 'm', 'n', 'h')
+        :param derivatives: fun(d, values) -> (derivatives, extra)
+                            d: the neuron dict (or population state), values: list in the order of variables,
+                            derivatives: list in the order of variables,
+                            extra: dict of values to store in d (e.g. currents), only used for the start values
+        :param gates: dict variable -> fun(d, values) -> (alpha, beta)
+                      for gating variables with dx/dt = alpha * (1 - x) - beta * x (used by rushlarsen)
+        """
+        self.variables = variables
+        self.derivatives = derivatives
+        self.gates = gates if gates is not None else {}
+
+
+def _store(model, d, values, extra):
+    for (name, value) in zip(model.variables, values):
+        d[name] = value
+    for (name, value) in extra.items():
+        d[name] = value
+
+
+def forwardEuler(model, d, dt):
+    with numpy.errstate(under='ignore'):
+        _forwardEuler(model, d, dt)
+
+def _forwardEuler(model, d, dt):
+    y = [d[name] for name in model.variables]
+    (k, extra) = model.derivatives(d, y)
+    _store(model, d, [yi + dt * ki for (yi, ki) in zip(y, k)], extra)
+
+
+def rk2(model, d, dt):
+    """
+    Heun's method (second order Runge-Kutta)
+    """
+    with numpy.errstate(under='ignore'):
+        _rk2(model, d, dt)
+
+def _rk2(model, d, dt):
+    y = [d[name] for name in model.variables]
+    (k1, extra) = model.derivatives(d, y)
+    (k2, _) = model.derivatives(d, [yi + dt * ki for (yi, ki) in zip(y, k1)])
+    _store(model, d, [yi + (dt / 2.0) * (a + b) for (yi, a, b) in zip(y, k1, k2)], extra)
+
+
+def rk4(model, d, dt):
+    """
+    Classic fourth order Runge-Kutta
+    """
+    with numpy.errstate(under='ignore'):
+        _rk4(model, d, dt)
+
+def _rk4(model, d, dt):
+    y = [d[name] for name in model.variables]
+    (k1, extra) = model.derivatives(d, y)
+    (k2, _) = model.derivatives(d, [yi + (dt / 2.0) * ki for (yi, ki) in zip(y, k1)])
+    (k3, _) = model.derivatives(d, [yi + (dt / 2.0) * ki for (yi, ki) in zip(y, k2)])
+    (k4, _) = model.derivatives(d, [yi + dt * ki for (yi, ki) in zip(y, k3)])
+    _store(model, d, [yi + (dt / 6.0) * (a + 2 * b + 2 * c + e) for (yi, a, b, c, e) in zip(y, k1, k2, k3, k4)],
+           extra)
+
+
+def rushLarsen(model, d, dt):
+    """
+    Rush-Larsen: the gating variables are updated with the exact solution for constant rates
+        x = x_inf + (x - x_inf) * exp(-dt * (alpha + beta)),  x_inf = alpha / (alpha + beta)
+    which is stable for large dt. The other variables use forward Euler.
+    """
+    with numpy.errstate(under='ignore'):
+        _rushLarsen(model, d, dt)
+
+def _rushLarsen(model, d, dt):
+    y = [d[name] for name in model.variables]
+    (k, extra) = model.derivatives(d, y)
+    values = []
+    for (name, yi, ki) in zip(model.variables, y, k):
+        if name in model.gates:
+            (alpha, beta) = model.gates[name](d, y)
+            rate = alpha + beta
+            inf = alpha / rate
+            values.append(inf + (yi - inf) * exp(-dt * rate))
+        else:
+            values.append(yi + dt * ki)
+    _store(model, d, values, extra)
+
+
+integrators = {
+    'euler': forwardEuler,
+    'rk2': rk2,
+    'rk4': rk4,
+    'rushlarsen': rushLarsen
+}
@@ -0,0 +1,257 @@
+'''
+Author: Erwin Diepgrond
+Copyright 2016 under GNU license
+e.j.diepgrond@gmail.com
+
+	This file is part of NeuroNet.
+
+	NeuroNet is free software: you can redistribute it and/or modify
+	it under the terms of the GNU General Public License as published by
+	the Free Software Foundation, either version 3 of the License,
+	or any later version.
+
+	NeuroNet is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License
+	along with NeuroNet.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import numpy as np
+try:
+    import numba
+except ImportError:
+    numba = None  # Network(backend='numba') falls back to the numpy kernels
+
+import Engine.ENN_Models as models
+
+##########################################
+#### JIT backend                      ####
+##########################################
+# Used by Network(engine='array', backend='numba'). Kernels with the same signature as the ones in
+# ENN_Models.vectorizedModels / vectorizedSynapses, but with one compiled loop over the neurons or synapses
+# instead of a chain of numpy operations (no temporary arrays, per element logic is cheap).
+# Settings the compiled loops do not cover (other integrators, rate tables) use the numpy kernel.
+
+# Network backends
+backends = ('numpy', 'numba', 'auto')
+
+
+def available():
+    """
+    :return: True if numba is installed
+    """
+    return numba is not None
+
+
+def resolveBackend(backend):
+    """
+    :param backend: 'numpy', 'numba' or 'auto' (numba if installed)
+    :return: the backend that will be used
+    """
+    if backend not in backends:
+        raise ValueError('(Network) Unknown backend: %s' % backend)
+    if backend == 'numpy' or (backend == 'auto' and not available()):
+        return 'numpy'
+    if not available():
+        print('(Network  ) Warning: numba not found, using the numpy backend')
+        return 'numpy'
+    return 'numba'
+
+
+if numba is not None:
+    _jit = numba.njit(cache=True)
+
+    @_jit
+    def _izhikevichLoop(dt, v, u, I, a, b, c, d):
+        for k in range(v.shape[0]):
+            vk = v[k]
+            uk = u[k]
+            vNew = vk + dt * (0.04 * vk * vk + 5 * vk + 140 + I[k] - uk)
+            uNew = uk + dt * (a[k] * (b[k] * vk - uk))
+            if vNew >= 30:
+                vNew = c[k]
+                uNew = uk + d[k]
+            v[k] = vNew
+            u[k] = uNew
+            I[k] = 0.0
+
+    @_jit
+    def _hodgkinAndHuxleyLoop(dt, Vm, m, n, h, I, Istim, Imax, Eq, gK, gNa, gl, EK, ENa, El, Cm, IK, INa, Il):
+        for k in range(Vm.shape[0]):
+            i = min(I[k], Imax[k])
+            V = Vm[k] - Eq[k]
+            ik = gK[k] * (n[k] ** 4) * (V - EK[k])
+            ina = gNa[k] * (m[k] ** 3) * h[k] * (V - ENa[k])
+            il = gl[k] * (V - El[k])
+            vm = Vm[k] + dt * (1 / Cm[k]) * ((i + Istim[k]) - ik - ina - il)
+            x = vm - Eq[k]  # Vm + Eq of the rate functions (ENN_Models.alpha_n etc.)
+            alphaN = (0.01 * (-x + 10)) / (np.exp((-x + 10) / 10) - 1)
+            alphaM = (0.1 * (-x + 25)) / (np.exp((-x + 25) / 10) - 1)
+            alphaH = 0.07 * np.exp(-x / 20)
+            betaN = 0.125 * np.exp(-x / 80)
+            betaM = 4 * np.exp(-x / 18)
+            betaH = 1 / (np.exp((-x + 30) / 10) + 1)
+            m[k] = m[k] + dt * (alphaM * (1 - m[k]) - betaM * m[k])
+            n[k] = n[k] + dt * (alphaN * (1 - n[k]) - betaN * n[k])
+            h[k] = h[k] + dt * (alphaH * (1 - h[k]) - betaH * h[k])
+            Vm[k] = vm
+            IK[k] = ik
+            INa[k] = ina
+            Il[k] = il
+            I[k] = 0.0
+
+    @_jit
+    def _thresholdLoop(V, scale, triggerSource, threshold, refractory, rp, i2, start, destination, w, delay,
+                       ring, history, slot, I):
+        # Deliver the values due this step
+        for j in range(I.shape[0]):
+            I[j] += ring[slot, j]
+            ring[slot, j] = 0.0
+        horizon = ring.shape[0]
+        for t in range(triggerSource.shape[0]):
+            v = V[triggerSource[t]]
+            fire = v > threshold[t]
+            if refractory:
+                if fire and i2[t] <= 0:
+                    i2[t] = rp[t]
+                else:
+                    fire = False
+                    if i2[t] > 0:
+                        i2[t] -= 1
+            if fire:
+                value = v * scale
+                history[slot, t] = value
+                for s in range(start[t], start[t + 1]):
+                    ring[(slot + delay[s]) % horizon, destination[s]] += value * w[s]
+            else:
+                history[slot, t] = 0.0
+
+
+def _column(state, key):
+    # The loops write in place and need float64 columns
+    column = state[key]
+    if not column.dtype == np.float64:
+        column = state[key] = column.astype(np.float64)
+    return column
+
+
+def neuronIzhJit(population, dt):
+    if not population.integrator == 'euler':
+        return models.vectorizedModels[models.neuronIzh](population, dt)
+    d = population.state
+    _izhikevichLoop(dt, *[_column(d, key) for key in ('v', 'u', 'I', 'a', 'b', 'c', 'd')])
+    return d
+
+
+def HodgkinAndHuxleyNeuronJit(population, dt):
+    if not population.integrator == 'euler' or population.rateTable is not None:
+        return models.HodgkinAndHuxleyNeuronVectorized(population, dt)
+    d = population.state
+    _hodgkinAndHuxleyLoop(dt, *[_column(d, key) for key in ('Vm', 'm', 'n', 'h', 'I', 'Istim', 'Imax', 'Eq', 'gK',
+                                                             'gNa', 'gl', 'EK', 'ENa', 'El', 'Cm', 'IK', 'INa',
+                                                             'Il')])
+    return d
+
+
+def erwinSynapseJit(projection, dt):
+    _thresholdSynapseJit(projection, 'v', 1.0, False)
+
+
+def erwinHandHsynapseJit(projection, dt):
+    _thresholdSynapseJit(projection, 'Vm', 1.0 / dt, True)
+
+
+def _thresholdSynapseJit(projection, var, scale, refractory):
+    '''
+    Same as ENN_Models._thresholdSynapseVectorized (and the same cache), but the pending values are kept
+    in a dense ring (arrival step x destination neuron) filled by one compiled loop over the fired triggers.
+    The values of the fired triggers of the last steps (history) are kept too, so the pending values of
+    deleted synapses can be removed from the ring
+    '''
+    cache = projection.cache
+    buffers = projection.buffers
+    if not cache:
+        models._buildThresholdSynapseCache(projection, refractory)
+        _buildRing(projection)
+    ring = buffers['ring']
+    rp = cache['rp'] if refractory else cache['threshold']
+    i2 = buffers['i2'] if refractory else cache['threshold']
+    _thresholdLoop(_column(projection.source.state, var), scale, cache['triggerSource'], cache['threshold'],
+                   refractory, rp, i2, cache['start'], cache['destination'], cache['w'], cache['delay'],
+                   ring, buffers['history'], buffers['slot'], _column(projection.destination.state, 'I'))
+    buffers['slot'] = (buffers['slot'] + 1) % ring.shape[0]
+
+
+def _triggerKeys(projection):
+    # Triggers by source neuron id, they survive rebuilds
+    cache = projection.cache
+    if 'triggerKeys' in projection.buffers and 'rp' in cache:
+        return projection.buffers['triggerKeys']
+    sourceIds = projection.source.ids
+    return [(sourceIds[int(s)], t) for (s, t) in zip(cache['triggerSource'], cache['threshold'])]
+
+
+def _dropRemoved(projection):
+    # Subtracts the pending values of the deleted synapses from the ring (the dict engine drops them with
+    # the synapse dict): a trigger that fired a steps ago still has to deliver to the synapses with delay >= a
+    buffers = projection.buffers
+    (synapseIds, trigger, delay, w, destination) = buffers['ringSynapses']
+    removed = np.nonzero(projection.index.indices(synapseIds, missing=-1) < 0)[0]
+    if not len(removed):
+        return
+    (ring, history, slot) = (buffers['ring'], buffers['history'], buffers['slot'])
+    horizon = ring.shape[0]
+    for age in range(1, horizon):
+        pending = removed[delay[removed] >= age]
+        if not len(pending):
+            continue
+        values = history[(slot - age) % horizon, trigger[pending]] * w[pending]
+        np.subtract.at(ring, ((slot - age + delay[pending]) % horizon, destination[pending]), values)
+
+
+def _buildRing(projection):
+    # Pending values follow the destination neuron ids, the history follows the triggers
+    buffers = projection.buffers
+    cache = projection.cache
+    horizon = int(cache['delay'].max()) + 1 if len(cache['delay']) else 1
+    ids = projection.destination.ids
+    keys = _triggerKeys(projection)
+    ring = np.zeros((max(horizon, buffers['ring'].shape[0] if 'ring' in buffers else 0), len(ids)))
+    history = np.zeros((ring.shape[0], len(keys)))
+    if 'ring' in buffers:
+        _dropRemoved(projection)
+        old = buffers['ring']
+        # Keep the arrival steps: row k of the new ring is k steps after the current slot
+        # (and row k of the history is the step k - old size)
+        rows = (buffers['slot'] + np.arange(old.shape[0])) % old.shape[0]
+        mapping = projection.destination.index.indices(buffers['ringIds'], missing=-1)
+        previous = np.nonzero(mapping >= 0)[0]
+        if len(previous):
+            ring[:old.shape[0], mapping[previous]] = old[rows][:, previous]
+        positions = dict((key, k) for (k, key) in enumerate(keys))
+        mapping = np.array([positions.get(key, -1) for key in buffers['historyKeys']], dtype=np.intp)
+        previous = np.nonzero(mapping >= 0)[0]
+        if len(previous):
+            history[ring.shape[0] - old.shape[0]:, mapping[previous]] = buffers['history'][rows][:, previous]
+    trigger = np.repeat(np.arange(len(cache['start']) - 1), np.diff(cache['start']))
+    synapseIds = projection.ids
+    buffers['ring'] = ring
+    buffers['ringIds'] = list(ids)
+    buffers['history'] = history
+    buffers['historyKeys'] = keys
+    buffers['ringSynapses'] = ([synapseIds[k] for k in cache['row']], trigger, cache['delay'],
+                               cache['w'], cache['destination'])
+    buffers['slot'] = 0
+
+
+# dict function -> compiled kernel, empty without numba
+jitModels = {}
+jitSynapses = {}
+if numba is not None:
+    jitModels[models.neuronIzh] = neuronIzhJit
+    jitModels[models.HodgkinAndHuxleyNeuron] = HodgkinAndHuxleyNeuronJit
+    jitSynapses[models.erwinSynapse] = erwinSynapseJit
+    jitSynapses[models.erwinHandHsynapse] = erwinHandHsynapseJit
@@ -21,6 +21,8 @@ e.j.diepgrond@gmail.com
 
 import numpy
 from numpy import exp
+from Engine.ENN_Integrators import IntegratorModel, integrators
+from Engine.ENN_Equations import EquationModel
 numpy.seterr(all='raise')
 ##########################################
 #### Simple neuron & synapse          ####
@@ -42,8 +44,12 @@ def neuronIzh(neuronDict):
     b = neuronDict['b']
     c = neuronDict['c']
     d = neuronDict['d']
-    neuronDict['v'] = v + dt * dvdt(v, u, I)
-    neuronDict['u'] = u + dt * dudt(v, u, a, b)
+    integrator = neuronDict.get('integrator', 'euler') # Set by the network
+    if integrator == 'euler':
+        neuronDict['v'] = v + dt * dvdt(v, u, I)
+        neuronDict['u'] = u + dt * dudt(v, u, a, b)
+    else:
+        integrators[integrator](izhikevichModel.integratorModel, neuronDict, dt)
     if neuronDict['v'] >= 30:
         neuronDict['v'] = c
         neuronDict['u'] = u + d
@@ -51,7 +57,8 @@ def neuronIzh(neuronDict):
     return neuronDict
 
 def neuronGauss(neuronDict):
-    neuronDict['Vm'] = numpy.random.normal(neuronDict['mean'], neuronDict['mu'])
+    # 'noise' is the NoiseSource of the network (set by Network.addNeuron)
+    neuronDict['Vm'] = neuronDict.get('noise', numpy.random).normal(neuronDict['mean'], neuronDict['mu'])
     return neuronDict
 
 ################ Synapse ################
@@ -105,6 +112,125 @@ def beta_h(Vm, Eq) : return 1/( exp((-(Vm+Eq)+30)/10)+1)
 def delta_n(Vm, n, Eq): return alpha_n(Vm, Eq) * (1 - n) - beta_n(Vm, Eq) * n
 def delta_m(Vm, m, Eq): return alpha_m(Vm, Eq) * (1 - m) - beta_m(Vm, Eq) * m
 def delta_h(Vm, h, Eq): return alpha_h(Vm, Eq) * (1 - h) - beta_h(Vm, Eq) * h
+def _analyticRates(V): return (alpha_n(V, 0), alpha_m(V, 0), alpha_h(V, 0), beta_n(V, 0), beta_m(V, 0), beta_h(V, 0))
+
+################ Rate tables ################
+# All six rates only depend on Vm + Eq, so one table over Vm + Eq serves every Eq.
+# Network(rateTable=True) replaces the exp calls of the rates by a linear interpolation in such a table.
+def _ratio(u):
+    # u / (exp(u) - 1), with its limit 1 - u/2 at the singular point u = 0
+    u = numpy.asarray(u, dtype=float)
+    small = numpy.abs(u) < 1e-6
+    safe = numpy.where(small, 1.0, u)
+    return numpy.where(small, 1 - u / 2, safe / numpy.expm1(safe))
+
+def _safeRates(V):
+    # Same as _analyticRates, but also defined at Vm + Eq = 10 (alpha_n) and 25 (alpha_m)
+    return numpy.array([0.1 * _ratio((-V + 10) / 10.0), _ratio((-V + 25) / 10.0), 0.07 * exp(-V / 20),
+                        0.125 * exp(-V / 80), 4 * exp(-V / 18), 1 / (exp((-V + 30) / 10.0) + 1)])
+
+class RateTable(object):
+    """
+    alpha_n, alpha_m, alpha_h, beta_n, beta_m and beta_h tabulated on a grid over V = Vm + Eq.
+    Values of V outside the grid are calculated with the analytic functions.
+    """
+
+    def __init__(self, vMin=-100.0, vMax=150.0, step=0.01, maxError=1e-6):
+        """
+        :param vMin: lowest V of the grid (mV)
+        :param vMax: highest V of the grid (mV)
+        :param step: grid step (mV), halved until the interpolation error is below maxError
+        :param maxError: allowed error of a rate r: |table - analytic| <= maxError * (1 + |r|)
+        """
+        self._arguments = (vMin, vMax, step, maxError)
+        while True:
+            grid = vMin + step * numpy.arange(int(numpy.ceil((vMax - vMin) / step)) + 1)
+            table = _safeRates(grid)
+            # Linear interpolation is least accurate halfway between grid points
+            exact = _safeRates(grid[:-1] + step / 2)
+            error = numpy.abs((table[:, :-1] + table[:, 1:]) / 2 - exact) / (1 + numpy.abs(exact))
+            if error.max() <= maxError:
+                break
+            if step < 1e-6:
+                raise ValueError('(RateTable) maxError %g can not be reached' % maxError)
+            step /= 2.0
+        self.vMin = vMin
+        self.step = step
+        self.error = error.max()
+        # Value and slope per grid interval, one array per rate
+        self.values = [numpy.ascontiguousarray(rate[:-1]) for rate in table]
+        self.slopes = [numpy.diff(rate) for rate in table]
+        # Same per grid interval as tuples for the dict engine, indexing lists is faster for floats
+        self._rows = list(zip(zip(*[v.tolist() for v in self.values]), zip(*[s.tolist() for s in self.slopes])))
+        self._last = len(grid) - 1
+
+    def __reduce__(self):
+        # Send the arguments (e.g. to a Pool process), the table is rebuilt once per process
+        return (getRateTable, self._arguments)
+
+    def rates(self, V):
+        """
+        :param V: Vm + Eq, a float or a numpy array
+        :return: (alpha_n, alpha_m, alpha_h, beta_n, beta_m, beta_h)
+        """
+        pos = (V - self.vMin) / self.step
+        if numpy.ndim(V) == 0:
+            if not 0 <= pos < self._last:
+                return tuple(_safeRates(V).tolist())
+            i = int(pos)
+            f = pos - i
+            (values, slopes) = self._rows[i]
+            return tuple(v + f * s for (v, s) in zip(values, slopes))
+        inside = (pos >= 0) & (pos < self._last)
+        if inside.all():
+            i = pos.astype(numpy.intp)
+        else:
+            i = numpy.where(inside, pos, 0).astype(numpy.intp)
+        f = pos - i
+        rates = [v.take(i) + f * s.take(i) for (v, s) in zip(self.values, self.slopes)]
+        if not inside.all():
+            outside = _safeRates(V[~inside])
+            for (rate, exact) in zip(rates, outside):
+                rate[~inside] = exact
+        return rates
+
+_rateTables = {}
+def getRateTable(vMin=-100.0, vMax=150.0, step=0.01, maxError=1e-6):
+    """
+    Returns the RateTable with these settings, built once and shared by all networks
+    """
+    key = (vMin, vMax, step, maxError)
+    if key not in _rateTables:
+        _rateTables[key] = RateTable(vMin, vMax, step, maxError)
+    return _rateTables[key]
+
+# Description for the integrators other than 'euler' (see ENN_Integrators)
+def _HodgkinAndHuxleyIntegratorModel(rates):
+    def derivatives(d, values):
+        (Vm, m, n, h) = values
+        V = Vm + -d['Eq']
+        (an, am, ah, bn, bm, bh) = rates(V)
+        IK = d['gK'] * (n**4) * (V - d['EK'])
+        INa = d['gNa'] * (m**3) * h * (V - d['ENa'])
+        Il = d['gl'] * (V - d['El'])
+        dVm = (1/d['Cm']) * ((d['I'] + d['Istim']) - IK - INa - Il)
+        return ([dVm, am * (1 - m) - bm * m, an * (1 - n) - bn * n, ah * (1 - h) - bh * h],
+                {'IK': IK, 'INa': INa, 'Il': Il})
+    def gate(a, b):
+        def alphaBeta(d, values):
+            r = rates(values[0] + -d['Eq'])
+            return (r[a], r[b])
+        return alphaBeta
+    return IntegratorModel(('Vm', 'm', 'n', 'h'), derivatives,
+                           gates={'m': gate(1, 4), 'n': gate(0, 3), 'h': gate(2, 5)})
+HodgkinAndHuxleyIntegratorModel = _HodgkinAndHuxleyIntegratorModel(_analyticRates)
+_tabulatedIntegratorModels = {}
+def _integratorModelFor(rateTable):
+    if rateTable is None:
+        return HodgkinAndHuxleyIntegratorModel
+    if rateTable not in _tabulatedIntegratorModels:
+        _tabulatedIntegratorModels[rateTable] = _HodgkinAndHuxleyIntegratorModel(rateTable.rates)
+    return _tabulatedIntegratorModels[rateTable]
 def HodgkinAndHuxleyNeuron(neuronDict):
     """
     This function will simulate a neuron with the hogdkin & huxley formula.
@@ -120,6 +246,12 @@ def HodgkinAndHuxleyNeuron(neuronDict):
     #Lets go!
     d = neuronDict
     if d['I'] > d['Imax']: d['I'] = d['Imax']
+    table = d.get('rateTable', None) # Set by the network
+    integrator = d.get('integrator', 'euler') # Set by the network
+    if not integrator == 'euler':
+        integrators[integrator](_integratorModelFor(table), d, d['dt'])
+        d['I'] = 0
+        return d
     # Calculating currents
     #IK = gK n^4 (Vm - EK)
     d['IK'] =  d['gK']  * (d['n']**4) * ((d['Vm']+Eq) - d['EK'])
@@ -132,15 +264,98 @@ def HodgkinAndHuxleyNeuron(neuronDict):
     d['Vm'] += d['dt'] * (1/d['Cm']) * ( (d['I'] + d['Istim']) - d['IK'] - d['INa'] - d['Il'] )
 
     # Calculate reaction of le ion channels
-    d['m'] += d['dt'] *  delta_m(d['Vm'],d['m'], Eq)
-    d['n'] += d['dt'] *  delta_n(d['Vm'],d['n'], Eq)
-    d['h'] += d['dt'] *  delta_h(d['Vm'],d['h'], Eq)
+    if table is None:
+        d['m'] += d['dt'] *  delta_m(d['Vm'],d['m'], Eq)
+        d['n'] += d['dt'] *  delta_n(d['Vm'],d['n'], Eq)
+        d['h'] += d['dt'] *  delta_h(d['Vm'],d['h'], Eq)
+    else:
+        (an, am, ah, bn, bm, bh) = table.rates(d['Vm'] + Eq)
+        d['m'] += d['dt'] * (am * (1 - d['m']) - bm * d['m'])
+        d['n'] += d['dt'] * (an * (1 - d['n']) - bn * d['n'])
+        d['h'] += d['dt'] * (ah * (1 - d['h']) - bh * d['h'])
     #We processed the input, rest it
     d['I'] = 0
     #Return the d!
     return d
 
 
+################ Equation models ################
+# The models above written as equations (see ENN_Equations). These can be used as neuron function
+# directly, e.g. Network(hodgkinAndHuxleyModel, hodgkinAndHuxleyModel.defaults, ...)
+# They are compiled on first use (lazy), importing the engine does not compile or write the equation cache.
+izhikevichModel = EquationModel('''
+    dv/dt = 0.04 * v * v + 5 * v + 140 + I - u
+    du/dt = a * (b * v - u)
+''', threshold='v >= 30', reset='v = c; u = u_pre + d', clear=['I'], order='simultaneous',
+    defaults={'v': -65, 'u': 0, 'I': 0, 'a': 0.02, 'b': 0.2, 'c': -65, 'd': 8}, name='izhikevich', lazy=True)
+
+gaussModel = EquationModel('Vm = noise.normal(mean, mu)', defaults={'Vm': 0, 'mean': 0, 'mu': 1}, name='gauss',
+                           lazy=True)
+
+# Does not use Network(rateTable=...), HodgkinAndHuxleyNeuron does
+hodgkinAndHuxleyModel = EquationModel('''
+    I = minimum(I, Imax)
+    V = Vm - Eq
+    IK = gK * (n**4) * (V - EK)
+    INa = gNa * (m**3) * h * (V - ENa)
+    Il = gl * (V - El)
+    dVm/dt = (1/Cm) * ((I + Istim) - IK - INa - Il)
+    dm/dt = delta_m(Vm, m, -Eq)
+    dn/dt = delta_n(Vm, n, -Eq)
+    dh/dt = delta_h(Vm, h, -Eq)
+''', clear=['I'], defaults=default_Hodgkin_Huxley_neuron_dict,
+    functions={'delta_m': delta_m, 'delta_n': delta_n, 'delta_h': delta_h,
+               'alpha_m': alpha_m, 'alpha_n': alpha_n, 'alpha_h': alpha_h,
+               'beta_m': beta_m, 'beta_n': beta_n, 'beta_h': beta_h},
+    gates={'m': ('alpha_m(Vm, -Eq)', 'beta_m(Vm, -Eq)'), 'n': ('alpha_n(Vm, -Eq)', 'beta_n(Vm, -Eq)'),
+           'h': ('alpha_h(Vm, -Eq)', 'beta_h(Vm, -Eq)')}, name='hodgkinAndHuxley', lazy=True)
+
+
+################ Vectorized neurons ################
+# Used by Network(engine='array'). Same formulas as the dict versions above,
+# but every value in population.state is a numpy array holding the whole population.
+def HodgkinAndHuxleyNeuronVectorized(population, dt):
+    """
+    Vectorized HodgkinAndHuxleyNeuron, updates all neurons of a population in one call
+    :param population: ENN_Arrays.NeuronPopulation, population.state has one numpy array per neuron property
+    :param dt: the simulation time step in ms
+    :return: changed population.state
+    """
+    d = population.state
+    Eq = -d['Eq']
+    d['I'] = numpy.minimum(d['I'], d['Imax'])
+    if not population.integrator == 'euler':
+        integrators[population.integrator](_integratorModelFor(population.rateTable), d, dt)
+        d['I'][:] = 0
+        return d
+    V = d['Vm'] + Eq
+    d['IK'] = d['gK'] * (d['n']**4) * (V - d['EK'])
+    d['INa'] = d['gNa'] * (d['m']**3) * d['h'] * (V - d['ENa'])
+    d['Il'] = d['gl'] * (V - d['El'])
+
+    d['Vm'] = d['Vm'] + dt * (1/d['Cm']) * ((d['I'] + d['Istim']) - d['IK'] - d['INa'] - d['Il'])
+
+    if population.rateTable is None:
+        d['m'] = d['m'] + dt * delta_m(d['Vm'], d['m'], Eq)
+        d['n'] = d['n'] + dt * delta_n(d['Vm'], d['n'], Eq)
+        d['h'] = d['h'] + dt * delta_h(d['Vm'], d['h'], Eq)
+    else:
+        (an, am, ah, bn, bm, bh) = population.rateTable.rates(d['Vm'] + Eq)
+        d['m'] = d['m'] + dt * (am * (1 - d['m']) - bm * d['m'])
+        d['n'] = d['n'] + dt * (an * (1 - d['n']) - bn * d['n'])
+        d['h'] = d['h'] + dt * (ah * (1 - d['h']) - bh * d['h'])
+    d['I'][:] = 0
+    return d
+
+# dict neuron function -> vectorized neuron function
+# neuronIzh and neuronGauss use the kernels generated from their equation models (see below)
+vectorizedModels = {
+    neuronIzh: izhikevichModel.kernel,
+    neuronGauss: gaussModel.kernel,
+    HodgkinAndHuxleyNeuron: HodgkinAndHuxleyNeuronVectorized
+}
+
+
 ################ Synapses ###############
 
 ############### Hodgkin huxley type synapse simple ###################
@@ -157,6 +372,10 @@ def transferFunction(x, turnpoint=0, max=1, steepness=10):
     :return: value between 0 and max
     note: over/underflow values are +- 710 and -710 respectively
     '''
+    if isinstance(x, numpy.ndarray):
+        # exp overflows to inf, which results in exactly 0 (same as the scalar fallback below)
+        with numpy.errstate(over='ignore'):
+            return max/(1 + exp(-steepness * (x - turnpoint)))
     try:
         return max/(1 + exp(-steepness * (x - turnpoint)))
     except Exception:
@@ -168,11 +387,12 @@ def transferFunction(x, turnpoint=0, max=1, steepness=10):
 
 def HodgkinAndHuxleyAxonSynapseSimple_Dictwrapper(
         # Changed gl to 0, leakage results in overflow errors in the neurons! (they have leakage them selves!)
-        dt,wi=0, we=0, gl=0, El=-70, Ee=1.5, Ei=-70,
+        dt=None,wi=0, we=0, gl=0, El=-70, Ee=1.5, Ei=-70,
         VmTurn = 25, steepness = 5, sd=0.4, delay=1
 ):
     '''
     See HodgkinAndHuxleyAxonSynapseSimple
+    dt is no longer used (the network converts delay to time steps), it is kept for older scripts.
     '''
     return {
         'wi':wi,
@@ -184,11 +404,17 @@ def HodgkinAndHuxleyAxonSynapseSimple_Dictwrapper(
         'VmTurn':VmTurn,
         'steepness':steepness,
         'sd':sd,
-        'delay':delay,
-        'delayvector': [(0,0) for i in range(0,int(numpy.floor(float(delay)/float(dt))))],
-        'delayindex': 0
+        'delay':delay
     }
 
+def delaySteps(delay, dt):
+    '''
+    Number of time steps a synapse delays its values (used by the network for synapses with a 'delay' in ms).
+    The old per synapse delay vector had floor(delay/dt) slots and was read one slot after it was written,
+    which delays the values by one step less than the number of slots. This is kept for equal results.
+    '''
+    return max(int(numpy.floor(float(delay)/float(dt))) - 1, 0)
+
 def HodgkinAndHuxleyAxonSynapseSimple(synapseDict, source, dest):
     '''
 
@@ -208,6 +434,9 @@ def HodgkinAndHuxleyAxonSynapseSimple(synapseDict, source, dest):
         steepness: Response curve of the excitory and inhibitory conductivity (default: 10)
 
         sd: Standard deviation applied after weight
+
+        delay: delay of the gate values in ms
+        delayline, delaycolumns, delaysteps: set by Network.connect (shared ENN_Arrays.DelayLine)
     :param source:
     :param dest:
     :return:
@@ -218,18 +447,111 @@ def HodgkinAndHuxleyAxonSynapseSimple(synapseDict, source, dest):
     gate_value = transferFunction(source['Vm'], synapseDict['VmTurn'], max=1, steepness=synapseDict['steepness'])
     gi = gate_value * synapseDict['wi']
     ge = gate_value * synapseDict['we']
-    synapseDict['delayvector'][synapseDict['delayindex']] = (gi, ge)
 
     # Retrieve delayed gate values (spike propagation delay)
     # Use the up-to-date destination Vm
-    synapseDict['delayindex'] = (synapseDict['delayindex']+1) % len(synapseDict['delayvector'])
-    (gi, ge) = synapseDict['delayvector'][synapseDict['delayindex']]
-    gi += numpy.abs(numpy.random.normal(0,synapseDict['sd']))
-    ge += numpy.abs(numpy.random.normal(0,synapseDict['sd']))
+    line = synapseDict['delayline']
+    (columnI, columnE) = synapseDict['delaycolumns']
+    delay = synapseDict['delaysteps']
+    line.addOne(delay, columnI, gi)
+    line.addOne(delay, columnE, ge)
+    gi = line.readOne(columnI)
+    ge = line.readOne(columnE)
+    noise = synapseDict.get('noise', numpy.random) # NoiseSource of the network (set by Network.connect)
+    gi += numpy.abs(noise.normal(0,synapseDict['sd']))
+    ge += numpy.abs(noise.normal(0,synapseDict['sd']))
     dest['I'] -= source['dt'] * (synapseDict['gl'] * (V-synapseDict['El']) + gi * (V-synapseDict['Ei']) + ge * (V-synapseDict['Ee']))
     return [synapseDict, source, dest]
 
 
+def HodgkinAndHuxleyAxonSynapseSimpleVectorized(projection, dt):
+    '''
+    Vectorized HodgkinAndHuxleyAxonSynapseSimple, updates all synapses of a SynapseProjection in one call.
+    The gate value is calculated once per source neuron (per VmTurn/steepness pair). The conductances
+    of all synapses are summed per destination neuron with one sparse matrix product per delay and
+    added to the network DelayLine (4 columns per destination neuron: gi, gi*Ei, ge, ge*Ee):
+        I -= dt * sum(g * (V - E)) = dt * (V * sum(g) - sum(g * E))
+    :param projection: ENN_Arrays.SynapseProjection
+    :param dt: the simulation time step in ms
+    '''
+    S = projection.state
+    cache = projection.cache
+    dst = projection.destinationIndex
+    source = projection.source.state
+    dest = projection.destination.state
+    line = projection.delayLine
+    if not cache:
+        _buildHodgkinAndHuxleyAxonSynapseSimpleCache(projection, dt)
+    nDest = cache['nDest']
+    columns = projection.buffers['columns']
+
+    for group in cache['groups']:
+        gate = transferFunction(source['Vm'], group['VmTurn'], max=1, steepness=group['steepness'])
+        for (delay, W) in group['delays']:
+            line.add(delay, columns, W.dot(gate))
+    (Gi, GiEi, Ge, GeEe) = line.read(columns).reshape(4, nDest)
+
+    # Noise per synapse
+    if cache['noise']:
+        ni = numpy.abs(projection.noise.normal(0, S['sd']))
+        ne = numpy.abs(projection.noise.normal(0, S['sd']))
+        Gi = Gi + numpy.bincount(dst, weights=ni, minlength=nDest)
+        GiEi = GiEi + numpy.bincount(dst, weights=ni * S['Ei'], minlength=nDest)
+        Ge = Ge + numpy.bincount(dst, weights=ne, minlength=nDest)
+        GeEe = GeEe + numpy.bincount(dst, weights=ne * S['Ee'], minlength=nDest)
+
+    V = dest['Vm']
+    dest['I'] -= dt * (V * (cache['Gl'] + Gi + Ge) - (cache['GlEl'] + GiEi + GeEe))
+
+def _buildHodgkinAndHuxleyAxonSynapseSimpleCache(projection, dt):
+    '''
+    Builds the sparse matrices used by HodgkinAndHuxleyAxonSynapseSimpleVectorized
+    One group per unique (VmTurn, steepness) pair, within a group one matrix per delay.
+    A matrix has 4 rows per destination neuron (gi, gi*Ei, ge, ge*Ee) and one column per source neuron.
+    '''
+    from Engine.ENN_Arrays import SparseScatter
+    S = projection.state
+    cache = projection.cache
+    src = projection.sourceIndex
+    dst = projection.destinationIndex
+    line = projection.delayLine
+    nSource = len(projection.source)
+    nDest = len(projection.destination)
+    cache['nDest'] = nDest
+    cache['Gl'] = numpy.bincount(dst, weights=S['gl'], minlength=nDest)
+    cache['GlEl'] = numpy.bincount(dst, weights=S['gl'] * S['El'], minlength=nDest)
+    cache['noise'] = bool(numpy.any(S['sd'] != 0))
+
+    # Delay line columns, pending values follow the destination neuron ids
+    if projection.buffers.get('destinationIds') == projection.destination.ids:
+        columns = projection.buffers['columns']
+    else:
+        columns = line.allocate(4 * nDest)
+    if 'columns' in projection.buffers and columns is not projection.buffers['columns']:
+        mapping = projection.destination.index.indices(projection.buffers['destinationIds'], missing=-1)
+        previous = numpy.nonzero(mapping >= 0)[0]
+        oldColumns = projection.buffers['columns'].reshape(4, -1)
+        if len(previous):
+            line.move(oldColumns[:, previous].ravel(), columns.reshape(4, -1)[:, mapping[previous]].ravel())
+        line.release(projection.buffers['columns'])
+    projection.buffers['columns'] = columns
+    projection.buffers['destinationIds'] = list(projection.destination.ids)
+
+    delays = numpy.array([delaySteps(d, dt) for d in S['delay']], dtype=numpy.intp)
+    line.ensureSlots(int(delays.max()) + 1)
+    rows = numpy.concatenate((dst, dst + nDest, dst + 2 * nDest, dst + 3 * nDest))
+    cols = numpy.concatenate((src, src, src, src))
+    data = numpy.concatenate((S['wi'], S['wi'] * S['Ei'], S['we'], S['we'] * S['Ee']))
+    cache['groups'] = []
+    gateParameters = numpy.stack((S['VmTurn'], S['steepness']), axis=1)
+    for (VmTurn, steepness) in numpy.unique(gateParameters, axis=0):
+        inGroup = (S['VmTurn'] == VmTurn) & (S['steepness'] == steepness)
+        group = {'VmTurn': VmTurn, 'steepness': steepness, 'delays': []}
+        for delay in numpy.unique(delays[inGroup]):
+            sel = numpy.tile(inGroup & (delays == delay), 4)
+            group['delays'].append((int(delay), SparseScatter(rows[sel], cols[sel], data[sel], (4 * nDest, nSource))))
+        cache['groups'].append(group)
+
 ###############
 def erwinHandHsynapse(synapseDict, source, dest):
     #I,i,w,source,dest = Synapse
@@ -245,4 +567,124 @@ def erwinHandHsynapse(synapseDict, source, dest):
 
     synapseDict['i'] = divmod(synapseDict['i'] + 1, len(synapseDict['I']))[1]
     return [synapseDict, source, dest]
-# TODO: Compartment hodgkin huxley adaptation
\ No newline at end of file
+
+
+################ Event driven threshold synapses ################
+# Vectorized erwinSynapse and erwinHandHsynapse. Instead of rotating a list per synapse every step,
+# threshold crossings are detected once per trigger (source neuron with its threshold and refractory settings)
+# and pushed into a SpikeQueue, keyed by the step they arrive (len(synapseDict['I']) steps later).
+# Only the length of the 'I' list is used, the per synapse 'I', 'i' and 'i2' values are not updated.
+def erwinSynapseVectorized(projection, dt):
+    _thresholdSynapseVectorized(projection, 'v', 1.0, False)
+
+def erwinHandHsynapseVectorized(projection, dt):
+    _thresholdSynapseVectorized(projection, 'Vm', 1.0/dt, True)
+
+def _thresholdSynapseVectorized(projection, var, scale, refractory):
+    '''
+    :param projection: ENN_Arrays.SynapseProjection
+    :param var: source variable compared to the threshold
+    :param scale: a spike delivers source[var] * w * scale
+    :param refractory: use the 'rp' refractory period (in steps) and the 'i2' counter
+    '''
+    cache = projection.cache
+    buffers = projection.buffers
+    if not cache:
+        _buildThresholdSynapseCache(projection, refractory)
+    queue = buffers['queue']
+    dest = projection.destination.state
+
+    # Deliver the events that are due
+    events = queue.pop()
+    if events is not None:
+        numpy.add.at(dest['I'], events[0], events[1])
+
+    # Detect threshold crossings once per trigger
+    V = projection.source.state[var][cache['triggerSource']]
+    fire = V > cache['threshold']
+    if refractory:
+        i2 = buffers['i2']
+        fire &= i2 <= 0
+        i2[:] = numpy.where(fire, cache['rp'], numpy.where(i2 > 0, i2 - 1, i2))
+    fired = numpy.flatnonzero(fire)
+    if len(fired):
+        # Synapses are sorted by trigger, expand the fired triggers to their synapses
+        starts = cache['start'][fired]
+        counts = cache['start'][fired + 1] - starts
+        first = numpy.cumsum(counts) - counts
+        synapses = numpy.repeat(starts - first, counts) + numpy.arange(counts.sum())
+        values = numpy.repeat(V[fired] * scale, counts) * cache['w'][synapses]
+        delays = cache['delay'][synapses]
+        for delay in numpy.unique(delays):
+            sel = delays == delay
+            queue.push(int(delay), cache['destination'][synapses[sel]], values[sel], cache['row'][synapses[sel]])
+    queue.advance()
+
+def _buildThresholdSynapseCache(projection, refractory):
+    '''
+    Sorts the synapses by trigger and keeps the trigger state (refractory counters) and queued events
+    of surviving neurons when the projection is rebuilt.
+    '''
+    from Engine.ENN_Arrays import SpikeQueue
+    S = projection.state
+    cache = projection.cache
+    buffers = projection.buffers
+    src = projection.sourceIndex
+    delays = numpy.array([len(I) for I in S['I']], dtype=numpy.intp)
+
+    # Triggers: unique (source, threshold, rp, initial i2)
+    if refractory:
+        keys = numpy.stack((src, S['threshold'], S['rp'], S['i2']), axis=1)
+    else:
+        keys = numpy.stack((src, S['threshold']), axis=1)
+    (triggers, trigger) = numpy.unique(keys, axis=0, return_inverse=True)
+    trigger = trigger.ravel()
+    order = numpy.lexsort((delays, trigger))
+    cache['triggerSource'] = triggers[:, 0].astype(numpy.intp)
+    cache['threshold'] = triggers[:, 1]
+    cache['start'] = numpy.searchsorted(trigger[order], numpy.arange(len(triggers) + 1))
+    cache['destination'] = projection.destinationIndex[order]
+    cache['row'] = order  # row of the synapse in the projection
+    cache['w'] = S['w'][order]
+    cache['delay'] = delays[order]
+
+    if refractory:
+        # Refractory counters follow the source neuron ids
+        counters = buffers.get('counters', {})
+        if 'triggerKeys' in buffers:
+            counters.update(zip(buffers['triggerKeys'], buffers['i2']))
+        sourceIds = projection.source.ids
+        triggerKeys = [(sourceIds[int(t[0])], t[1], t[2], t[3]) for t in triggers]
+        cache['rp'] = triggers[:, 2]
+        buffers['i2'] = numpy.array([counters.get(k, k[3]) for k in triggerKeys], dtype=numpy.float64)
+        buffers['triggerKeys'] = triggerKeys
+        buffers['counters'] = counters
+
+    # Queued events follow the destination neuron ids, the events of deleted synapses are dropped
+    if 'queue' not in buffers:
+        buffers['queue'] = SpikeQueue()
+    elif not buffers['destinationIds'] == projection.destination.ids or not buffers['synapseIds'] == projection.ids:
+        mapping = projection.destination.index.indices(buffers['destinationIds'], missing=-1)
+        buffers['queue'].remap(mapping, projection.index.indices(buffers['synapseIds'], missing=-1))
+    buffers['destinationIds'] = list(projection.destination.ids)
+    buffers['synapseIds'] = list(projection.ids)
+    buffers['queue'].ensureHorizon(int(delays.max()) + 1)
+
+# dict synapse function -> vectorized synapse function
+vectorizedSynapses = {
+    HodgkinAndHuxleyAxonSynapseSimple: HodgkinAndHuxleyAxonSynapseSimpleVectorized,
+    erwinSynapse: erwinSynapseVectorized,
+    erwinHandHsynapse: erwinHandHsynapseVectorized
+}
+
+# Properties the vectorized kernels only read. The array engine stores these once per population or projection
+# while every element has the same value (see ENN_Arrays._ColumnStore). EquationModels list their own.
+sharedParameters = {
+    neuronIzh: ('a', 'b', 'c', 'd'),
+    neuronGauss: ('mean', 'mu'),
+    HodgkinAndHuxleyNeuron: ('Eq', 'gNa', 'gK', 'gl', 'ENa', 'EK', 'El', 'Cm', 'Imax', 'Istim'),
+    HodgkinAndHuxleyAxonSynapseSimple: ('gl', 'El', 'Ei', 'Ee', 'wi', 'we', 'VmTurn', 'steepness', 'sd', 'delay'),
+    erwinSynapse: ('w', 'threshold'),
+    erwinHandHsynapse: ('w', 'threshold', 'rp')
+}
+# TODO: Compartment hodgkin huxley adaptation
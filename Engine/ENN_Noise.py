@@ -0,0 +1,110 @@
+'''
+Author: Erwin Diepgrond
+Copyright 2016 under GNU license
+e.j.diepgrond@gmail.com
+
+	This file is part of NeuroNet.
+
+	NeuroNet is free software: you can redistribute it and/or modify
+	it under the terms of the GNU General Public License as published by
+	the Free Software Foundation, either version 3 of the License,
+	or any later version.
+
+	NeuroNet is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License
+	along with NeuroNet.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import numpy as np
+
+##########################################
+#### Noise                            ####
+##########################################
+# Every network owns one NoiseSource. The models get it as the 'noise' entry of their dict
+# (or population / projection) and use it like numpy.random: noise.normal(loc, scale, size)
+# A NoiseSource travels with its network into a Pool process, so pooled and serial runs
+# draw the same numbers.
+
+# Types of loc and scale that take the scalar path of NoiseSource.normal (numpy floats are floats)
+_scalars = (int, float)
+
+
+class NoiseSource(object):
+    """
+    Gaussian noise from one numpy.random.Generator stream, drawn in large blocks.
+    Drawing one scalar from a pre drawn block is much cheaper than one numpy.random.normal call.
+    """
+
+    def __init__(self, seed=None, blockSize=65536):
+        """
+        :param seed: None (random), an int or a numpy.random.SeedSequence
+        :param blockSize: number of standard normal values drawn at once
+        """
+        self._blockSize = blockSize
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """
+        Restarts the stream, pre drawn values are discarded
+        :param seed: None (random), an int or a numpy.random.SeedSequence
+        """
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self._generator = np.random.Generator(np.random.PCG64(seed))
+        self._block = np.zeros(0)
+        self._list = []  # The block as floats, made by the first scalar draw of a block
+        self._position = 0
+
+    def __getstate__(self):
+        # Pickled with its network (Pool processes), the list is made again from the block
+        state = self.__dict__.copy()
+        state['_list'] = []
+        return state
+
+    def _next(self):
+        # One value as a float (the dict engine draws one per synapse per step): indexing a list is much
+        # cheaper than slicing the block
+        if self._position >= len(self._block):
+            self._refill()
+        if not self._list:
+            self._list = self._block.tolist()
+        value = self._list[self._position]
+        self._position += 1
+        return value
+
+    def _refill(self):
+        self._block = self._generator.standard_normal(self._blockSize)
+        self._list = []
+        self._position = 0
+
+    def standardNormal(self, size=None):
+        """
+        :param size: None (returns a float), an int or a shape
+        :return: standard normal value(s)
+        """
+        if size is None:
+            return self._next()
+        n = int(np.prod(size))
+        if n > self._blockSize:
+            values = self._generator.standard_normal(n)
+        else:
+            if self._position + n > len(self._block):
+                self._refill()
+            values = self._block[self._position:self._position + n]
+            self._position += n
+        return values.reshape(size)
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        """
+        Same use as numpy.random.normal, loc and scale may be arrays
+        """
+        if size is None:
+            if isinstance(loc, _scalars) and isinstance(scale, _scalars):
+                return loc + scale * self._next()
+            if np.ndim(loc) > 0 or np.ndim(scale) > 0:
+                size = np.broadcast(loc, scale).shape
+        return loc + scale * self.standardNormal(size)
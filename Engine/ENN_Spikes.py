@@ -0,0 +1,268 @@
+'''
+Author: Erwin Diepgrond
+Copyright 2016 under GNU license
+e.j.diepgrond@gmail.com
+
+	This file is part of NeuroNet.
+
+	NeuroNet is free software: you can redistribute it and/or modify
+	it under the terms of the GNU General Public License as published by
+	the Free Software Foundation, either version 3 of the License,
+	or any later version.
+
+	NeuroNet is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License
+	along with NeuroNet.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import numpy as np
+
+##########################################
+#### Spike extraction                 ####
+##########################################
+# Spike times from recorded traces, all neurons at once: data is a (time x neurons) array, a numpy.memmap
+# or anything else with .shape and row slicing (data[a:b]). It is read in chunks of time, so only a chunk
+# and the (few) peaks are in memory:
+#   trains = peaks(recorder['Vm'].array(), thres=0.1, minDist=100, times=recorder.timeline)
+# The peaks are the same as peakutils.indexes(trace, thres, min_dist) (used by Recorder.getSpikeEventtimes
+# before) gives per trace: a sample higher than the sample before it and the first different sample after it
+# (the middle of a flat top), above thres * (max - min) + min of the neuron. Of peaks at most minDist samples
+# apart the highest is kept. nan (steps in which a neuron did not exist) is ignored.
+
+# Elements per chunk
+_chunkElements = 1 << 22
+
+
+class _Columns(object):
+    # Some columns of an array like, read per row slice (a memmap is not read completely)
+
+    def __init__(self, data, columns):
+        self.data = data
+        self.columns = np.asarray(columns, dtype=np.int64)
+        self.shape = (data.shape[0], len(self.columns))
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            (rows, column) = key
+            return self.data[rows, self.columns[column]]
+        return np.asarray(self.data[key])[:, self.columns]
+
+
+def selectColumns(data, columns):
+    """
+    :param data: (time x neurons) array like
+    :param columns: positions of the columns to keep
+    :return: data[:, columns], for a memmap (or other array like) a view that reads it in row slices
+    """
+    if isinstance(data, np.ndarray) and not isinstance(data, np.memmap):
+        return data[:, columns]
+    return _Columns(data, columns)
+
+
+def _chunks(data, chunk):
+    rows = data.shape[0]
+    if chunk is None:
+        chunk = max(1, _chunkElements // max(1, data.shape[1]))
+    for start in range(0, rows, chunk):
+        yield (start, min(start + chunk, rows))
+
+
+def thresholds(data, thres=0.1, chunk=None):
+    """
+    :param data: (time x neurons) array like
+    :param thres: fraction of the range of each neuron
+    :param chunk: rows per chunk, None: about 4M elements
+    :return: numpy array with thres * (max - min) + min per neuron (column), nan for a column without values
+    """
+    low = np.full(data.shape[1], np.inf)
+    high = np.full(data.shape[1], -np.inf)
+    for (start, end) in _chunks(data, chunk):
+        block = np.asarray(data[start:end], dtype=np.float64)
+        # fmin / fmax ignore nan
+        low = np.fmin(low, np.fmin.reduce(block, axis=0))
+        high = np.fmax(high, np.fmax.reduce(block, axis=0))
+    # A column that is nan everywhere (neuron did not exist) keeps inf / -inf: nan threshold, no peaks
+    empty = low > high
+    (low[empty], high[empty]) = (np.nan, np.nan)
+    return thres * (high - low) + low
+
+
+def candidates(data, threshold, chunk=None):
+    """
+    Local maxima above the threshold, before minDist is applied
+    :param data: (time x neurons) array like
+    :param threshold: one value, or one per neuron (column)
+    :param chunk: rows per chunk, None: about 4M elements
+    :return: (rows, columns, heights) numpy arrays
+    """
+    (rows, columns) = ([], [])
+    total = data.shape[0]
+    threshold = np.asarray(threshold, dtype=np.float64)
+    for (start, end) in _chunks(data, chunk):
+        # One row before the chunk and one after it, samples start .. end - 1 are the candidates
+        first = max(start - 1, 0)
+        block = np.asarray(data[first:min(end + 1, total)], dtype=np.float64)
+        if len(block) < 3:
+            continue
+        dy = np.diff(block, axis=0)
+        with np.errstate(invalid='ignore'):
+            rise = (dy[:-1] > 0) & (block[1:-1] > threshold)  # row i: sample first + 1 + i
+            (k, column) = np.nonzero(rise & (dy[1:] < 0))
+            (flatK, flatColumn) = np.nonzero(rise & (dy[1:] == 0))
+        rows.append(k + first + 1)
+        columns.append(column)
+        for (k, column) in zip(flatK.tolist(), flatColumn.tolist()):
+            top = _flatTop(data, k + first + 1, column)
+            if top is not None:
+                rows.append(np.array([top]))
+                columns.append(np.array([column]))
+    rows = np.concatenate(rows).astype(np.int64) if rows else np.zeros(0, dtype=np.int64)
+    columns = np.concatenate(columns).astype(np.int64) if columns else np.zeros(0, dtype=np.int64)
+    if not len(rows):
+        return (rows, columns, np.zeros(0))
+    return (rows, columns, _values(data, rows, columns))
+
+
+def _flatTop(data, start, column, step=256):
+    # A flat top from start: its middle if it ends with a fall (same as peakutils), else None
+    value = data[start, column]
+    end = start
+    while end + 1 < data.shape[0]:
+        following = np.asarray(data[end + 1:end + 1 + step, column], dtype=np.float64)
+        different = np.nonzero(~(following == value))[0]
+        if len(different):
+            end += int(different[0])
+            return start + (end - start) // 2 if following[different[0]] < value else None
+        end += len(following)
+    return None
+
+
+def _values(data, rows, columns):
+    # data[rows, columns] for array likes that only support row slices
+    if isinstance(data, np.ndarray):
+        return np.asarray(data[rows, columns], dtype=np.float64)
+    return np.array([data[row:row + 1][0, column] for (row, column) in zip(rows, columns)], dtype=np.float64)
+
+
+def _minDistance(rows, heights, minDist):
+    # peakutils: from high to low, a peak removes the other peaks within minDist samples
+    # (rows are in order, the default argsort breaks ties the same way)
+    removed = np.zeros(len(rows), dtype=bool)
+    for k in np.argsort(heights)[::-1]:
+        if not removed[k]:
+            removed |= np.abs(rows - rows[k]) <= minDist
+            removed[k] = False
+    return ~removed
+
+
+def peaks(data, thres=0.1, minDist=100, threshold=None, times=None, dt=1.0, neuronIds=None, chunk=None):
+    """
+    Spike times of all neurons (columns) of data
+    :param data: (time x neurons) array, numpy.memmap or other array like with .shape and data[a:b]
+    :param thres: relative threshold, fraction of the range of each neuron (see thresholds())
+    :param minDist: minimum distance between two peaks in samples
+    :param threshold: absolute threshold (one value or one per neuron), overrides thres
+    :param times: time of every row (e.g. Recorder.timeline), None: row * dt
+    :param neuronIds: the neuron id of every column, None: 0 .. n - 1
+    :param chunk: rows per chunk, None: about 4M elements
+    :return: SpikeTrains
+    """
+    if threshold is None:
+        threshold = thresholds(data, thres, chunk)
+    (rows, columns, heights) = candidates(data, threshold, chunk)
+    order = np.lexsort((rows, columns))
+    (rows, columns, heights) = (rows[order], columns[order], heights[order])
+    if minDist > 1 and len(rows) > 1:
+        # Only the neurons with peaks close together need the (sequential) rule
+        close = (np.diff(columns) == 0) & (np.diff(rows) <= minDist)
+        if close.any():
+            keep = np.ones(len(rows), dtype=bool)
+            starts = np.searchsorted(columns, np.arange(data.shape[1] + 1))
+            for column in np.unique(columns[1:][close]):
+                (a, b) = (starts[column], starts[column + 1])
+                keep[a:b] = _minDistance(rows[a:b], heights[a:b], minDist)
+            (rows, columns) = (rows[keep], columns[keep])
+    if times is None:
+        values = rows * dt
+    else:
+        values = np.asarray(times, dtype=np.float64)[rows]
+    starts = np.searchsorted(columns, np.arange(data.shape[1] + 1))
+    neuronIds = list(range(data.shape[1])) if neuronIds is None else neuronIds
+    return SpikeTrains(neuronIds, starts, values)
+
+
+class SpikeTrains(object):
+    """
+    Spike times of many neurons in two arrays (ragged): the times of neuron k are times[starts[k]:starts[k + 1]]
+    Dict like: trains[neuronId] is a numpy array with the times, like the dict of Recorder.getSpikeEventtimes
+    """
+
+    def __init__(self, neuronIds, starts, times):
+        """
+        :param neuronIds: the neuron ids
+        :param starts: numpy array, len(neuronIds) + 1 offsets in times
+        :param times: numpy array with the spike times of all neurons
+        """
+        self.neuronIds = list(neuronIds)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.times = np.asarray(times, dtype=np.float64)
+        self._positions = dict((nid, k) for (k, nid) in enumerate(self.neuronIds))
+
+    @classmethod
+    def fromDict(cls, spikes, neuronIds=None):
+        """
+        :param spikes: dict neuron id -> spike times
+        :param neuronIds: order of the neurons, None: spikes.keys()
+        """
+        neuronIds = list(spikes.keys()) if neuronIds is None else list(neuronIds)
+        counts = [len(spikes[nid]) for nid in neuronIds]
+        starts = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        times = np.concatenate([np.asarray(spikes[nid], dtype=np.float64) for nid in neuronIds]) \
+            if neuronIds else np.zeros(0)
+        return cls(neuronIds, starts, times)
+
+    def __getitem__(self, neuronId):
+        k = self._positions[neuronId]
+        return self.times[self.starts[k]:self.starts[k + 1]]
+
+    def __contains__(self, neuronId):
+        return neuronId in self._positions
+
+    def __iter__(self):
+        return iter(self.neuronIds)
+
+    def __len__(self):
+        return len(self.neuronIds)
+
+    def keys(self):
+        return list(self.neuronIds)
+
+    def values(self):
+        return [self[nid] for nid in self.neuronIds]
+
+    def items(self):
+        return [(nid, self[nid]) for nid in self.neuronIds]
+
+    def counts(self):
+        """
+        :return: numpy array with the number of spikes per neuron (order of neuronIds)
+        """
+        return np.diff(self.starts)
+
+    def toDict(self):
+        return dict(self.items())
+
+    def save(self, file):
+        """
+        Saves the trains to file + '.npz' (three arrays, no per neuron files)
+        """
+        np.savez(file + '.npz', neuronIds=np.array(self.neuronIds), starts=self.starts, times=self.times)
+
+    @classmethod
+    def load(cls, file):
+        with np.load(file + '.npz', allow_pickle=True) as data:
+            return cls(data['neuronIds'].tolist(), data['starts'], data['times'])
@@ -19,19 +19,25 @@ e.j.diepgrond@gmail.com
 	along with NeuroNet.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
+import bisect
 import copy
+import numbers
 import sys
+import types
 import numpy as np
-try:
-    import peakutils as pu
-except ImportError:
-    print('Warning: Peakutils not found. Recorder.getSpikeEventtimes not working!')
 
 from multiprocessing import Pool
 
-from time import clock
+from time import perf_counter as clock  # time.clock was removed in Python 3.8
 
 import pickle
+import struct
+
+import Engine.ENN_Arrays as arrays
+import Engine.ENN_Models as models
+import Engine.ENN_Spikes as spikes
+from Engine.ENN_Noise import NoiseSource
+from Engine.ENN_Integrators import integrators
 
 
 class Simulator:
@@ -43,14 +49,18 @@ class Simulator:
         Gives a nice interface
     """
 
-    def __init__(self, ignoreWarnings=False):
+    def __init__(self, ignoreWarnings=False, seed=None):
         """
 
         Initializes basic simulator class
         :param ignoreWarnings: Suppresses warnings when changing settings after a simulation has ran *UNUSED*
+        :param seed: int, seeds the noise of every added network that has no seed of its own.
+                     The stream of a network is derived from (seed, network id), so results are the same
+                     with or without a poolSize
         :return: self
         """
         self._ignoreWarnings = ignoreWarnings
+        self._seed = seed
         self._networks = {}
         self._networkIDCounter = 0  # Static maybe?
         self._recorderIDCounter = 0
@@ -65,22 +75,25 @@ class Simulator:
         """
         # Create network
         network._id = self._networkIDCounter
+        if self._seed is not None and network._seed is None:
+            network._noise.seed(np.random.SeedSequence(self._seed, spawn_key=(network._id,)))
         self._networks[self._networkIDCounter] = network
         self._networkIDCounter += 1
         return network._id
 
-    def createNetwork(self, G, neuronFun, synapseFun, neuronDict, synapseDict, dt, verbose=False):
+    def createNetwork(self, G, neuronFun, synapseFun, neuronDict, synapseDict, dt, verbose=False, engine='dict'):
         """
         createNetworks call Network(neuronFun,synapseFun,dt,G) for you
         :param G: networkx network or None (empty network)
         :param neuronFun: neuron class derived from the BaseNeuron class in Neurons.py
         :param synapseFun: synapse class derived from the baseSynapse class in Synapses.py
         :param dt: the simulation time step in ms
+        :param engine: 'dict' or 'array', see Network
         :return: network id generated by this class
         """
         network = Network(neuronFun=neuronFun, synapseFun=synapseFun,
                           neuronDict=neuronDict, synapseDict=synapseDict,
-                          networkx=G, dt=dt, verbose=verbose
+                          networkx=G, dt=dt, verbose=verbose, engine=engine
                           )
         return self.addNetwork(network)
 
@@ -140,7 +153,8 @@ class Simulator:
             if sys.version_info < (3,0)and not poolSize is None:
                 print('(Simulator) Multiprocessing disabled on 2.7')
             for (id, i) in self._networks.items():
-                print('(Simulator) Starting simulation of network %i' % id)
+                print('(Simulator) Starting simulation of network %i (%s engine, %s backend)' %
+                      (id, i._engine, i._backend))
                 i.simulate(duration_ms, self._recorders)
         elif network is None and not poolSize is None:
 
@@ -153,6 +167,7 @@ class Simulator:
             processes = {}
             print('(Simulator) Simulating...')
             for (id, net) in self._networks.items():
+                print('(Simulator) Network %i: %s engine, %s backend' % (id, net._engine, net._backend))
                 processes[id] = pool.apply_async(self._asyncfun, (net, duration_ms, self._recorders))
             del self._networks
             del self._recorders
@@ -168,23 +183,258 @@ class Simulator:
             pool.join()
 
         elif network in self._networks.keys():
-            print('(Simulator) Starting simulation of network %i' % network)
+            print('(Simulator) Starting simulation of network %i (%s engine, %s backend)' %
+                  (network, self._networks[network]._engine, self._networks[network]._backend))
             self._networks[network].simulate(duration_ms, self._recorders)
         print('(Simulator) Done. (%.5f seconds)' % (clock() - t))
 
 
+# Network backends, see ENN_Jit
+_backends = ('numpy', 'numba', 'auto')
+
+
+def _resolveBackend(backend):
+    # ENN_Jit (and numba, seconds to import) is only imported when the numba backend may be used
+    if backend == 'numpy':
+        return 'numpy'
+    import Engine.ENN_Jit as jit
+    return jit.resolveBackend(backend)
+
+
+def _isShareable(value):
+    # Values that can not be changed in place can be shared by all elements of a template
+    return isinstance(value, (numbers.Number, str, bytes, tuple, frozenset, type(None), type, types.FunctionType,
+                              types.BuiltinFunctionType))
+
+
+class SharedDict(dict):
+    """
+    Neuron or synapse dict of the dict engine. It holds only the values of its own element (state, overrides and
+    mutable values like lists), every other key is read from the shared dict of its template, which is stored
+    once for all elements made from that template. Writing a key stores it in the element only (copy on write),
+    so scripts and models use it like a normal dict.
+    The shared dict does not change, so the first read of a shared key stores it in the element: the models read
+    their parameters every step, after the first step these are plain dict reads.
+    """
+
+    def __init__(self, shared, own=None):
+        dict.__init__(self, own or {})
+        self.shared = shared
+
+    def __missing__(self, key):
+        value = self.shared[key]
+        dict.__setitem__(self, key, value)
+        return value
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.shared
+
+    def get(self, key, default=None):
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        if key in self.shared:
+            return self.__missing__(key)
+        return default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def keys(self):
+        return list(self.shared.keys()) + [key for key in dict.keys(self) if key not in self.shared]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def toDict(self):
+        return dict(self.items())
+
+    def copy(self):
+        return SharedDict(self.shared, self._own())
+
+    def __eq__(self, other):
+        return self.toDict() == (other.toDict() if isinstance(other, SharedDict) else other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.toDict())
+
+    def _own(self):
+        # The values of the element itself, without the shared values stored by __missing__
+        shared = self.shared
+        return dict((key, value) for (key, value) in dict.items(self) if key not in shared or
+                    value is not shared[key])
+
+    def __reduce__(self):
+        # Pickles the shared dict once (pickle memo) instead of once per element
+        return (SharedDict, (self.shared, self._own()))
+
+
+class _IndexedDict(SharedDict):
+    """
+    SharedDict of an element whose kind has indexed keys (Network.addIndex). Writing an indexed key counts up
+    its version, so the cached index columns of the key are gathered again by the next query.
+    Only elements with indexed keys pay for the python level __setitem__.
+    """
+
+    def __init__(self, shared, own=None, indexed=None):
+        SharedDict.__init__(self, shared, own)
+        self.indexed = indexed  # key -> version, shared with the network
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        if key in self.indexed:
+            self.indexed[key] += 1
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        if key in self.indexed:
+            self.indexed[key] += 1
+
+    def update(self, *args, **kwargs):
+        for (key, value) in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __reduce__(self):
+        return (_IndexedDict, (self.shared, self._own(), self.indexed))
+
+
+def _idList(values):
+    # Plain python values (ints instead of numpy.int64 etc.)
+    return values.tolist() if isinstance(values, np.ndarray) else list(values)
+
+
+def _select(values, index):
+    if isinstance(values, np.ndarray):
+        return values[index]
+    return [values[k] for k in index]
+
+
+def _columns(dicts):
+    """
+    :param dicts: list of attribute dicts (e.g. networkx node data)
+    :return: dict key -> list of values, None if not all dicts have the same keys
+    """
+    if not dicts:
+        return {}
+    keys = set(dicts[0].keys())
+    if not all(set(d.keys()) == keys for d in dicts):
+        return None
+    return dict((key, [d[key] for d in dicts]) for key in keys)
+
+
+class _DictGroup(object):
+    """
+    The neurons (or synapses) of the dict engine with the same update function, the counterpart of a
+    NeuronPopulation / SynapseProjection for Network.findNeurons and findConnections.
+    Columns of indexed keys (Network.addIndex) are kept until the key is written (its version changes),
+    other columns are gathered from the dicts per query.
+    Like in the array engine, elements without the key have nan (numbers) or None for it.
+    """
+
+    def __init__(self, ids, dicts, indexed):
+        self.ids = ids
+        self.dicts = dicts
+        self.indexed = indexed  # indexed key -> version, shared with the network
+        self.columns = {}       # indexed key -> (version, column)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def column(self, key):
+        if key in self.columns and self.columns[key][0] == self.indexed.get(key, None):
+            return self.columns[key][1]
+        values = [d.get(key, None) for d in self.dicts]
+        present = [value for value in values if value is not None]
+        if not present:
+            return None
+        if all(isinstance(value, numbers.Number) for value in present):
+            # Missing values are nan, like in the columns of the array engine
+            column = np.array([np.nan if value is None else value for value in values])
+        else:
+            column = np.empty(len(values), dtype=object)
+            for (i, value) in enumerate(values):
+                column[i] = value
+        if key in self.indexed:
+            self.columns[key] = (self.indexed[key], column)
+        return column
+
+
+class _Columns(object):
+    """
+    columns[key]: numpy array with the values of key of a group of neurons or synapses
+    (the argument of the where function of Network.findNeurons / findConnections)
+    """
+
+    def __init__(self, group):
+        self._group = group
+
+    def __getitem__(self, key):
+        column = self._group.column(key)
+        if column is None:
+            raise KeyError(key)
+        return column
+
+
+def _matches(group, where, equal):
+    # Boolean array of the elements of group that match, None if a key is missing
+    mask = np.ones(len(group), dtype=bool)
+    try:
+        for (key, value) in equal.items():
+            column = _Columns(group)[key]
+            mask &= np.broadcast_to(np.asarray(column == value, dtype=bool), mask.shape)
+        if where is not None:
+            mask &= np.broadcast_to(np.asarray(where(_Columns(group)), dtype=bool), mask.shape)
+    except KeyError:
+        return None
+    return mask
+
+
 class Network:
     _suppressChangeWarnings = False
+    _maxTemplates = 256 # Shared dicts kept per network (dict engine), see _shared()
 
     def __init__(self, neuronFun, neuronDict, synapseFun, synapseDict, dt, networkx=None, verbose=False, etaInterval=30,
-                 debugVerbose=False, progressCallback=None):
+                 debugVerbose=False, progressCallback=None, engine='dict', seed=None, integrator='euler',
+                 rateTable=None, backend='numpy'):
         """
         Generates a network based on the parameters
         :param neuronFun: the neuron Update function with the form of: dict = fun(dict)
+                          or an ENN_Equations.EquationModel (e.g. ENN_Models.hodgkinAndHuxleyModel)
         :param synapseFun: the synapse Update function with the form of:
                             synapseDict, sourceDict, destinationDict = fun(synapseDict, sourceDict, destinationDict)
         :param dt: the simulation time step in ms
         :param networkx: a network from the networkx package. If None, initializes empty network
+        :param engine: 'dict': every neuron is a dict updated by neuronFun (default)
+                       'array': neurons are stored per neuron function in numpy arrays (see ENN_Arrays)
+                                and updated all at once if a vectorized model exists in ENN_Models.vectorizedModels.
+                                Synapses are stored per synapse function in the same way and use the sparse
+                                kernels of ENN_Models.vectorizedSynapses when available.
+                                getNeuronByID and getConnectionByID return dict like views on the arrays.
+        :param seed: int, seed of the noise of this network (see ENN_Noise). None: seeded by the
+                     Simulator seed when added to a Simulator, random otherwise
+        :param integrator: 'euler' (default), 'rk2', 'rk4' or 'rushlarsen' (see ENN_Integrators), used by the
+                           neuron models that support it. A dict {neuronFun: integrator} selects one per model.
+        :param rateTable: True: the Hodgkin & Huxley models interpolate their alpha/beta rates in the shared
+                          ENN_Models.getRateTable() instead of calculating them. An ENN_Models.RateTable
+                          (e.g. getRateTable(step=..., maxError=...)) sets the grid and error bound. None: analytic
+        :param backend: array engine kernels: 'numpy' (default), 'numba' (compiled kernels of ENN_Jit where
+                        available, numpy otherwise) or 'auto' (numba if installed). Falls back to 'numpy'
+                        if numba is not installed
         """
         # Network id, set by simulator
         self._id = None
@@ -200,6 +450,37 @@ class Network:
         # Data dicts
         self._neurons = {}
         self._synapses = {}
+        self._outgoing = {}  # neuron id -> set of synapse ids (only neurons with synapses)
+        self._incoming = {}
+        self._structureVersion = 0  # Incremented when neurons or synapses are added or deleted
+        self._indexed = {'neurons': {}, 'synapses': {}}  # Indexed key -> version, see addIndex
+        self._groups = {}  # 'neurons' / 'synapses' -> (structure version, [_DictGroup]), dict engine only
+        self._recordingPlans = {}  # id(recorder) -> (structure version, plan), see _recordingPlan
+
+        # Engine
+        if engine not in ('dict', 'array'):
+            raise ValueError('(Network) Unknown engine: %s' % engine)
+        self._engine = engine
+        self._populations = {}  # neuronFun -> NeuronPopulation (array engine only)
+        self._projections = {}  # (synapseFun, source neuronFun, destination neuronFun) -> SynapseProjection
+        self._delayLine = arrays.DelayLine()  # Shared by all synapses with a 'delay'
+        self._templates = {}  # (id(template dict), function) -> (template, copy, shared dict, mutable keys)
+        if backend not in _backends:
+            raise ValueError('(Network) Unknown backend: %s' % backend)
+        self._backend = _resolveBackend(backend) if engine == 'array' else 'python'  # dict engine: plain python
+
+        # Integration method(s)
+        for name in (integrator.values() if isinstance(integrator, dict) else [integrator]):
+            if name not in integrators:
+                raise ValueError('(Network) Unknown integrator: %s' % name)
+        self._integrator = integrator
+        if rateTable is True:
+            rateTable = models.getRateTable()
+        self._rateTable = rateTable or None
+
+        # Noise, shared by all models as their 'noise' entry
+        self._seed = seed
+        self._noise = NoiseSource(seed)
 
         # Id counters
         self._neuronCounter = 0
@@ -211,9 +492,10 @@ class Network:
         self._neuronDict = neuronDict
         self._synapseDict = synapseDict
 
-        # Time
+        # Time, kept as a step counter: self._time = self._step * dt
+        self._step = 0
         self._time = 0
-        self._timeline = []
+        self._timeline = Timeline()
 
         # Data gathering / recording
         self._recorders = []
@@ -230,19 +512,84 @@ class Network:
                 print('(Network  ) Creating network with %i nodes and %i connections...' % (
                     networkx.number_of_nodes(), networkx.number_of_edges()))
             if verbose: start = clock()
-            for (i, data) in networkx.nodes_iter(data=True):
-                n = copy.copy(neuronDict)
-                n.update(data)
-                self.addNeuron(neuronFun=neuronFun, neuronDict=n, id=i)
+            nodes = list(networkx.nodes(data=True))
+            columns = _columns([data for (i, data) in nodes])
+            if columns is None:  # Not every node has the same attributes
+                for (i, data) in nodes:
+                    self.addNeuron(neuronFun=neuronFun, neuronDict=neuronDict, id=i, settingsDict=data)
+            else:
+                self.addNeurons(ids=[i for (i, data) in nodes], settings=columns)
 
-            for (i, j, data) in networkx.edges_iter(data=True):
-                self.connect(i, j, data, synapseFun, synapseDict)
+            edges = list(networkx.edges(data=True))
+            columns = _columns([data for (i, j, data) in edges])
+            if columns is None:
+                for (i, j, data) in edges:
+                    self.connect(i, j, data, synapseFun, synapseDict)
+            else:
+                self.connectMany([i for (i, j, data) in edges], [j for (i, j, data) in edges], columns)
             if verbose: print('(Network  ) done! (%.2f seconds)' % (clock() - start))
 
-    def addNeuron(self, neuronFun=None, neuronDict=None, id=None, ):
+    @classmethod
+    def fromEdges(cls, sources, destinations, neuronFun, neuronDict, synapseFun, synapseDict, dt, settings=None,
+                  neurons=None, **kwargs):
+        """
+        Generates a network from edge arrays (no networkx needed)
+        :param sources: source neuron id per synapse (numpy array or sequence)
+        :param destinations: destination neuron id per synapse
+        :param settings: dict synapse property -> one value per synapse, e.g. {'w': weights}.
+                         These override those of synapseDict
+        :param neurons: number of neurons (ids 0 .. neurons - 1) or a sequence of neuron ids.
+                        None: 0 .. the highest id in sources and destinations
+        The other parameters are those of Network
+        :return: Network
+        """
+        network = cls(neuronFun, neuronDict, synapseFun, synapseDict, dt, **kwargs)
+        if network._verbose: start = clock()
+        if neurons is None:
+            neurons = int(max(np.max(sources), np.max(destinations))) + 1 if len(sources) else 0
+        if isinstance(neurons, numbers.Integral):
+            network.addNeurons(neurons)
+        else:
+            network.addNeurons(ids=neurons)
+        network.connectMany(sources, destinations, settings)
+        if network._verbose:
+            print('(Network  ) Created network with %i nodes and %i connections (%.2f seconds)' % (
+                len(network._neurons), len(network._synapses), clock() - start))
+        return network
+
+    @classmethod
+    def fromMatrix(cls, matrix, neuronFun, neuronDict, synapseFun, synapseDict, dt, weightKey='w', **kwargs):
+        """
+        Generates a network from an adjacency matrix (no networkx needed)
+        :param matrix: square scipy.sparse matrix or numpy array, one neuron per row.
+                       matrix[i, j] != 0 connects neuron i -> j
+        :param weightKey: synapse property set to matrix[i, j], None: only the structure of matrix is used
+        The other parameters are those of Network
+        Duplicate entries of a sparse matrix are summed first (like scipy's conversions), so every (i, j) is
+        one synapse and entries that sum to 0 give none. The synapses are created in row major order.
+        :return: Network
+        """
+        if not len(matrix.shape) == 2 or not matrix.shape[0] == matrix.shape[1]:
+            raise ValueError('(Network) The adjacency matrix must be square, got shape %s' % (matrix.shape,))
+        if hasattr(matrix, 'tocoo'):  # scipy.sparse
+            matrix = matrix.tocoo(copy=True)  # sum_duplicates works in place
+            matrix.sum_duplicates()
+            nonzero = matrix.data != 0
+            (sources, destinations, values) = (matrix.row[nonzero], matrix.col[nonzero], matrix.data[nonzero])
+        else:
+            matrix = np.asarray(matrix)
+            (sources, destinations) = np.nonzero(matrix)
+            values = matrix[sources, destinations]
+        settings = {weightKey: values} if weightKey is not None else None
+        return cls.fromEdges(sources, destinations, neuronFun, neuronDict, synapseFun, synapseDict, dt, settings,
+                             matrix.shape[0], **kwargs)
+
+    def addNeuron(self, neuronFun=None, neuronDict=None, id=None, settingsDict=None):
         """
         adds a neuron
         :param neuronFun: neuron class derived from the BaseNeuron class in Neurons.py
+        :param settingsDict: a dictionary with values for this neuron only.
+                             These will override those of neuronDict (which stays shared with the other neurons)
         :return: returns the ID of the generated neuron
         """
         if id == None:  # if none: Choose new Unused ID
@@ -262,13 +609,111 @@ class Network:
             neuronFun = self._neuronFun
 
         # Add neuron
-        neuronDict = copy.deepcopy(neuronDict)
-        neuronDict['fun'] = neuronFun
+        if self._engine == 'array':
+            if settingsDict:
+                neuronDict = dict(neuronDict)
+                neuronDict.update(settingsDict)
+            population = self._population(neuronFun)
+            population.add(id, neuronDict)
+            self._neurons[id] = arrays.NeuronView(population, id)
+            self._structureVersion += 1
+            return id
+
+        neuronDict = self._shared(neuronDict, neuronFun, {'fun': neuronFun, 'dt': self._dt, 'noise': self._noise,
+                                                          'integrator': self._integratorFor(neuronFun),
+                                                          'rateTable': self._rateTable}, 'neurons')
+        if settingsDict:
+            neuronDict.update(settingsDict)
         neuronDict['id'] = id
-        neuronDict['dt'] = self._dt
         self._neurons[id] = neuronDict
+        self._structureVersion += 1
         return id
 
+    def addNeurons(self, count=None, neuronFun=None, neuronDict=None, ids=None, settings=None):
+        """
+        adds many neurons at once (array engine: one array operation per property)
+        :param count: number of neurons to add, not needed if ids is given
+        :param ids: ids of the new neurons. None: the next unused ids
+        :param settings: dict neuron property -> one value per neuron (numpy array or sequence).
+                         These override those of neuronDict
+        :return: list with the IDs of the generated neurons
+        """
+        if ids is None:
+            ids = []
+            id = self._neuronCounter
+            while len(ids) < count:
+                if id not in self._neurons:
+                    ids.append(id)
+                id += 1
+            if ids:
+                self._neuronCounter = ids[-1]
+        else:
+            ids = _idList(ids)
+            if not len(set(ids)) == len(ids) or any(id in self._neurons for id in ids):
+                raise IndexError('(Network) Index already exists!')
+        settings = dict((key, _idList(values)) for (key, values) in (settings or {}).items())
+
+        if neuronFun is None and neuronDict is None:
+            neuronFun = self._neuronFun
+            neuronDict = self._neuronDict
+        elif neuronDict is None:
+            raise ValueError('If a new neuron functions is specified, a neuron dictionary must also be specified.')
+        elif neuronFun is None:
+            neuronFun = self._neuronFun
+
+        if self._engine == 'array':
+            population = self._population(neuronFun)
+            population.addMany(ids, neuronDict, settings)
+            self._neurons.update((id, arrays.NeuronView(population, id)) for id in ids)
+            self._structureVersion += 1
+            return ids
+
+        for (k, id) in enumerate(ids):
+            self.addNeuron(neuronFun, neuronDict, id, dict((key, values[k]) for (key, values) in settings.items()))
+        return ids
+
+    def _population(self, neuronFun):
+        """
+        Returns (creates if needed) the NeuronPopulation of neuronFun (array engine only)
+        """
+        if neuronFun not in self._populations:
+            self._populations[neuronFun] = arrays.NeuronPopulation(neuronFun, self._dt, self._noise,
+                                                                   self._integratorFor(neuronFun),
+                                                                   self._rateTable, self._backend)
+        return self._populations[neuronFun]
+
+    def _shared(self, template, fun, networkValues, kind):
+        """
+        Creates the SharedDict of a new element (dict engine).
+        The shared dict holds the values of the template that can not change in place and the values
+        the network sets. It is made once per template and function and remade when the template changed.
+        Mutable values (lists etc.) are deep copied per element, like copy.deepcopy(template) would.
+        :param kind: 'neurons' or 'synapses', elements of a kind with indexed keys are _IndexedDicts
+        :return: SharedDict
+        """
+        key = (id(template), fun)
+        entry = self._templates.get(key, None)
+        try:
+            changed = entry is None or not entry[1] == template
+        except ValueError:  # e.g. numpy arrays in the template
+            changed = True
+        if changed:
+            shared = dict((k, v) for (k, v) in template.items() if _isShareable(v))
+            shared.update(networkValues)
+            mutable = [k for k in template.keys() if k not in shared]
+            if len(self._templates) >= self._maxTemplates:
+                self._templates = {}
+            entry = self._templates[key] = (template, copy.deepcopy(template), shared, mutable)
+        own = dict((k, copy.deepcopy(template[k])) for k in entry[3])
+        if self._indexed[kind]:
+            return _IndexedDict(entry[2], own, self._indexed[kind])
+        return SharedDict(entry[2], own)
+
+    def _integratorFor(self, neuronFun):
+        if isinstance(self._integrator, dict):
+            return self._integrator.get(neuronFun, 'euler')
+        return self._integrator
+
     def connect(self, sourceId, destinationId, settingsDict={}, synapseFun=None, synapseDict=None):
         """
         connects two neurons  (sourceId -> destinationId)
@@ -287,16 +732,114 @@ class Network:
         elif synapseFun is None:
             synapseFun = self._synapseFun
 
-        synapseDict = copy.deepcopy(synapseDict)
+        if self._engine == 'array':
+            properties = dict(synapseDict)
+            properties.update(settingsDict)
+            projection = self._projection(synapseFun, sourceId, destinationId)
+            projection.add(id, sourceId, destinationId, properties)
+            self._synapseCounter += 1
+            self._synapses[id] = arrays.SynapseView(projection, id)
+            self._index(id, sourceId, destinationId)
+            return id
+
+        synapseDict = self._shared(synapseDict, synapseFun, {'fun': synapseFun, 'noise': self._noise,
+                                                             'delayline': self._delayLine}, 'synapses')
         synapseDict.update(settingsDict)
         synapseDict['_source'] = sourceId
         synapseDict['_destin'] = destinationId
         synapseDict['id'] = id
-        synapseDict['fun'] = synapseFun
+        if 'delay' in synapseDict:
+            # Two columns (gi, ge) in the shared delay line
+            synapseDict['delaysteps'] = models.delaySteps(synapseDict['delay'], self._dt)
+            synapseDict['delaycolumns'] = self._delayLine.allocate(2).tolist()  # ints for DelayLine.addOne
+            self._delayLine.ensureSlots(synapseDict['delaysteps'] + 1)
         self._synapseCounter += 1
         self._synapses[id] = synapseDict
+        self._index(id, sourceId, destinationId)
         return id
 
+    def _index(self, id, sourceId, destinationId):
+        # Adjacency indexes, used to find the synapses of a neuron
+        self._structureVersion += 1
+        self._outgoing.setdefault(sourceId, set()).add(id)
+        self._incoming.setdefault(destinationId, set()).add(id)
+
+    def _unindex(self, id, sourceId, destinationId):
+        self._structureVersion += 1
+        self._outgoing[sourceId].discard(id)
+        self._incoming[destinationId].discard(id)
+        if not self._outgoing[sourceId]:
+            del self._outgoing[sourceId]
+        if not self._incoming[destinationId]:
+            del self._incoming[destinationId]
+
+    def connectMany(self, sourceIds, destinationIds, settings=None, synapseFun=None, synapseDict=None):
+        """
+        connects many pairs of neurons at once (sourceIds[k] -> destinationIds[k])
+        array engine: one array operation per property and projection
+        :param sourceIds: source neuron per synapse (numpy array or sequence)
+        :param destinationIds: destination neuron per synapse
+        :param settings: dict synapse property -> one value per synapse (numpy array or sequence).
+                         These override those of synapseDict
+        :return: list with the IDs of the generated synapses
+        """
+        sourceIds = _idList(sourceIds)
+        destinationIds = _idList(destinationIds)
+        if not len(sourceIds) == len(destinationIds):
+            raise ValueError('(Network) Got %i source and %i destination ids' % (len(sourceIds), len(destinationIds)))
+        settings = settings or {}
+        if synapseDict == None and synapseFun == None:
+            synapseDict = self._synapseDict
+            synapseFun = self._synapseFun
+        elif synapseDict == None:
+            raise ValueError('If specifying a new synapse, one must also specify its dict')
+        elif synapseFun is None:
+            synapseFun = self._synapseFun
+        ids = list(range(self._synapseCounter, self._synapseCounter + len(sourceIds)))
+
+        if not self._engine == 'array':
+            settings = dict((key, _idList(values)) for (key, values) in settings.items())
+            for k in range(len(ids)):
+                settingsDict = dict((key, values[k]) for (key, values) in settings.items())
+                self.connect(sourceIds[k], destinationIds[k], settingsDict, synapseFun, synapseDict)
+            return ids
+
+        # One projection per (source, destination) neuron function
+        funs = dict((id, self._neurons[id]['fun']) for id in set(sourceIds) | set(destinationIds))
+        if len(set(funs.values())) <= 1:
+            groups = [(ids, sourceIds, destinationIds, settings)]
+        else:
+            edges = {}
+            for (k, (s, d)) in enumerate(zip(sourceIds, destinationIds)):
+                edges.setdefault((funs[s], funs[d]), []).append(k)
+            groups = [([ids[k] for k in index], [sourceIds[k] for k in index], [destinationIds[k] for k in index],
+                       dict((key, _select(values, index)) for (key, values) in settings.items()))
+                      for index in edges.values()]
+        for (groupIds, sources, destinations, columns) in groups:
+            if not sources:
+                continue
+            projection = self._projection(synapseFun, sources[0], destinations[0])
+            projection.addMany(groupIds, sources, destinations, synapseDict, columns)
+            self._synapses.update((id, arrays.SynapseView(projection, id)) for id in groupIds)
+        self._synapseCounter += len(ids)
+        for (id, s, d) in zip(ids, sourceIds, destinationIds):
+            self._index(id, s, d)
+        return ids
+
+    def _projection(self, synapseFun, sourceId, destinationId):
+        """
+        Returns (creates if needed) the SynapseProjection for synapseFun between
+        the populations of the source and destination neuron (array engine only)
+        """
+        sourceFun = self._neurons[sourceId]['fun']
+        destinationFun = self._neurons[destinationId]['fun']
+        key = (synapseFun, sourceFun, destinationFun)
+        if key not in self._projections:
+            self._projections[key] = arrays.SynapseProjection(synapseFun, self._populations[sourceFun],
+                                                              self._populations[destinationFun], self._dt,
+                                                              self._delayLine, self._noise, self._backend)
+        return self._projections[key]
+
     def getConnectionByID(self, id):
         return self._synapses[id]
 
@@ -306,7 +849,30 @@ class Network:
         :param id: Key specifying synapse
         :return: connection class (if you want it)
         """
-        return self._synapses.pop(id)
+        synapse = self._synapses.pop(id)
+        self._unindex(id, synapse['_source'], synapse['_destin'])
+        if self._engine == 'array':
+            return self._projection(synapse['fun'], synapse['_source'], synapse['_destin']).remove(id)
+        if 'delaycolumns' in synapse:
+            self._delayLine.release(synapse['delaycolumns'])
+        return synapse
+
+    def deleteConnections(self, ids):
+        """
+        Deletes many connections at once (array engine: one array operation per property and projection)
+        :param ids: synapse ids
+        """
+        if not self._engine == 'array':
+            for id in set(ids):
+                self.deleteConnection(id)
+            return
+        projections = {}  # SynapseProjection -> synapse ids
+        for id in set(ids):
+            synapse = self._synapses.pop(id)
+            self._unindex(id, synapse['_source'], synapse['_destin'])
+            projections.setdefault(synapse._store, []).append(id)
+        for (projection, synapseIds) in projections.items():
+            projection.removeMany(synapseIds)
 
     def deleteNeuron(self, id):
         """
@@ -315,17 +881,163 @@ class Network:
         :param id: id of neuron to delete
         :return: returns the neuron class that is deleted
         """
-        ids = []
-        # find connections TODO: Create a function find to find neurons or connections based on dict
-        for (_id, synapse) in self._synapses.items():
-            if synapse['_source'] == id or synapse['_destin'] == id:
-                ids.append(_id)
-        # Delete synapses
-        for _id in ids:
-            self.deleteConnection(_id)
+        # Delete its synapses, O(synapses of this neuron)
+        self.deleteConnections(self.getOutgoing(id) + self.getIncoming(id))
 
+        self._structureVersion += 1
+        if self._engine == 'array':
+            view = self._neurons.pop(id)
+            return self._populations[view['fun']].remove(id)
         return self._neurons.pop(id)
 
+    def deleteNeurons(self, ids):
+        """
+        deletes many neurons (and their synapses) at once, in time linear in the number of neurons and synapses
+        These ids will not return, see deleteNeuron
+        :param ids: ids of the neurons to delete
+        """
+        ids = set(ids)
+        for id in ids:
+            if id not in self._neurons:
+                raise KeyError('(Network) Unknown neuron: %s' % (id,))
+        synapses = set()
+        for id in ids:
+            synapses.update(self._outgoing.get(id, ()))
+            synapses.update(self._incoming.get(id, ()))
+        self.deleteConnections(synapses)
+
+        self._structureVersion += 1
+        if not self._engine == 'array':
+            for id in ids:
+                del self._neurons[id]
+            return
+        populations = {}  # NeuronPopulation -> neuron ids
+        for id in ids:
+            populations.setdefault(self._neurons.pop(id)._store, []).append(id)
+        for (population, neuronIds) in populations.items():
+            population.removeMany(neuronIds)
+
+    def pruneUnconnected(self):
+        """
+        deletes all neurons without synapses
+        :return: list with the ids of the deleted neurons
+        """
+        ids = [id for id in self._neurons if id not in self._outgoing and id not in self._incoming]
+        self.deleteNeurons(ids)
+        return ids
+
+    def getOutgoing(self, id):
+        """
+        :return: list with the ids of the synapses from neuron id
+        """
+        return list(self._outgoing.get(id, ()))
+
+    def getIncoming(self, id):
+        """
+        :return: list with the ids of the synapses to neuron id
+        """
+        return list(self._incoming.get(id, ()))
+
+    def findNeurons(self, where=None, **equal):
+        """
+        Finds neurons by their values, e.g.
+            net.findNeurons(lambda n: n['Istim'] != 0)
+            net.findNeurons(fun=ENN_Models.neuronGauss)
+        :param where: fun(columns) -> boolean array, columns[key] is a numpy array with the values of key.
+                      Evaluated once per neuron model (population), neurons without key do not match
+        :param equal: key=value: only neurons with this value
+        :return: numpy array with the ids of the matching neurons
+        """
+        return self._find('neurons', where, equal)
+
+    def findConnections(self, where=None, **equal):
+        """
+        Finds synapses by their values, e.g. net.findConnections(lambda s: s['wi'] > 5)
+        The source and destination neuron are the keys '_source' and '_destin'
+        :param where: fun(columns) -> boolean array, see findNeurons
+        :param equal: key=value: only synapses with this value
+        :return: numpy array with the ids of the matching synapses
+        """
+        return self._find('synapses', where, equal)
+
+    def setNeurons(self, ids, key, values):
+        """
+        Sets a value of many neurons at once (array engine: one array operation per population), e.g.
+            net.setNeurons(net.findNeurons(fun=ENN_Models.HodgkinAndHuxleyNeuron), 'Istim', 10)
+        :param ids: neuron ids
+        :param values: one value for all neurons, or a sequence (numpy array) with one value per id
+        """
+        self._set('neurons', self._neurons, ids, key, values)
+
+    def setConnections(self, ids, key, values):
+        """
+        Sets a value of many synapses at once, see setNeurons
+        """
+        self._set('synapses', self._synapses, ids, key, values)
+
+    def addIndex(self, key, synapses=False):
+        """
+        Keeps the values of key in a column, so findNeurons / findConnections do not read every dict.
+        Only useful for the dict engine (the array engine always stores columns) and for values the models
+        do not change, such as weights. Writing the key (e.g. getConnectionByID(i)['w'] = x) invalidates the
+        column, changes inside a value (a list) are not seen. The elements of the kind check every write
+        afterwards, which makes the models a bit slower.
+        :param synapses: index a synapse value instead of a neuron value
+        """
+        kind = 'synapses' if synapses else 'neurons'
+        indexed = self._indexed[kind]
+        indexed[key] = indexed.get(key, 0) + 1
+        if not self._engine == 'array':
+            for element in (self._synapses if synapses else self._neurons).values():
+                if type(element) is SharedDict:
+                    # Same object, references held by scripts see the index too
+                    element.__class__ = _IndexedDict
+                    element.indexed = indexed
+
+    def _groupsOf(self, kind):
+        """
+        :return: the NeuronPopulations / SynapseProjections (array engine) or _DictGroups (dict engine) of kind
+        """
+        if self._engine == 'array':
+            return list((self._populations if kind == 'neurons' else self._projections).values())
+        (version, groups) = self._groups.get(kind, (None, None))
+        if not version == self._structureVersion:
+            elements = {}  # update function -> (ids, dicts)
+            for (id, d) in (self._neurons if kind == 'neurons' else self._synapses).items():
+                (ids, dicts) = elements.setdefault(d['fun'], ([], []))
+                ids.append(id)
+                dicts.append(d)
+            groups = [_DictGroup(ids, dicts, self._indexed[kind]) for (ids, dicts) in elements.values()]
+            self._groups[kind] = (self._structureVersion, groups)
+        return groups
+
+    def _find(self, kind, where, equal):
+        found = []
+        for group in self._groupsOf(kind):
+            if len(group) == 0:
+                continue
+            mask = _matches(group, where, equal)
+            if mask is not None:
+                found.extend(np.array(group.ids, dtype=object)[mask].tolist())
+        return np.array(found)
+
+    def _set(self, kind, elements, ids, key, values):
+        ids = _idList(ids)
+        if np.ndim(values) > 0 and not len(values) == len(ids):
+            raise ValueError('(Network) Got %i ids and %i values' % (len(ids), len(values)))
+        if not self._engine == 'array':
+            for (k, id) in enumerate(ids):
+                elements[id][key] = values if np.ndim(values) == 0 else values[k]
+            for group in self._groups.get(kind, (None, []))[1]:
+                group.columns.pop(key, None)
+            return
+        stores = {}  # NeuronPopulation / SynapseProjection -> positions in ids
+        for (k, id) in enumerate(ids):
+            stores.setdefault(elements[id]._store, []).append(k)
+        for (store, positions) in stores.items():
+            storeValues = values if np.ndim(values) == 0 else _select(values, positions)
+            store.setMany([ids[k] for k in positions], key, storeValues)
+
     def getNetworkX(self, weightvar='w'):
         #weight is -1 on error (weightvar not found)
         import networkx as nx
@@ -361,12 +1073,9 @@ class Network:
         return self._neurons[id]
 
     def drange(self, start, stop, step=1):
-        line = []
-        i = start
-        while i < stop:
-            line.append(i)
-            i += step
-        return line
+        # start + i * step instead of repeated additions, no rounding drift
+        count = int(np.ceil((stop - start) / float(step) - 1e-9))
+        return [start + i * step for i in range(max(count, 0))]
 
     def simulate(self, duration, recorders, poolSize=None):
         """
@@ -377,37 +1086,46 @@ class Network:
         Note: poolSize dramatically increases simulation time... bad implementation *Depricated*
         :return: I wont return a value or anything... baka
         """
-        # Generate timeline
-        timeline = self.drange(self._time + self._dt, self._time + duration, self._dt)
+        # Steps self._step + 1 .. self._step + steps, the simulated time ends at self._time + duration
+        steps = int(round(duration / float(self._dt)))
 
         # Set recorders
         self._recorders = []
+        self._recordingPlans = {}
         for (_, recorder) in recorders.items():
+            if not recorder._networkId == self._id:
+                continue  # dt of another network
             recorder['dt'] = self._dt
-            if recorder._networkId == self._id and recorder._withTime:
-                recorder.timeline.append( timeline)
+            if recorder._withTime:
+                recorder._prepare(self._step + 1, steps, self._dt)
                 self._recorders.append(recorder)
 
         # Add to current timeline
-        self._timeline += timeline
+        self._timeline.append(self._step + 1, steps, self._dt)
 
         # Start simulation
-        self.localSim(timeline=timeline)
+        self.localSim(steps)
+        for recorder in self._recorders:
+            recorder.flush()
 
         return 'Baka!'
 
     ##################################### Local operations #####################################
-    def localSim(self, timeline):
+    def localSim(self, steps):
+        """
+        :param steps: number of steps to simulate
+        """
         etaEvery = self._etainterval  # seconds
         sPassed = 0
         stepCounter = 0
-        totalSteps = len(timeline)
+        totalSteps = steps
 
         startTime = clock()
         # loop
-        for time in timeline:
+        for _ in range(steps):
             stepTime = clock()
-            self._time = time
+            self._step += 1
+            self._time = self._step * self._dt
             self._localStep()
             stepCounter += 1
             stepTime = clock() - stepTime
@@ -426,6 +1144,7 @@ class Network:
         if self._debugVerbose: t = clock()
         self._localUpdateNeurons()
         self._localUpdateSynapses()
+        self._delayLine.advance()
         self._updateRecorders()
         if self._debugVerbose:
             print('(Network %i) Total update time: %.5f' % (self._id, clock() - t))
@@ -433,12 +1152,21 @@ class Network:
 
     def _localUpdateNeurons(self):
         if self._debugVerbose: t = clock()
-        for (key, neuron) in self._neurons.items():
-            neuron['fun'](neuron)
+        if self._engine == 'array':
+            for population in self._populations.values():
+                population.step()
+        else:
+            for (key, neuron) in self._neurons.items():
+                neuron['fun'](neuron)
         if self._debugVerbose: print('(Network %i) update neurons total: %.5f' % (self._id, clock() - t))
 
     def _localUpdateSynapses(self):
         if self._debugVerbose: t = clock()
+        if self._engine == 'array':
+            for projection in self._projections.values():
+                projection.step()
+            if self._debugVerbose: print('(Network %i) update synapses total: %.5f' % (self._id, clock() - t))
+            return
         for (key, synapse) in self._synapses.items():
             self._synapses[key], self._neurons[synapse['_source']], self._neurons[synapse['_destin']] = \
                 synapse['fun'](synapse, self._neurons[synapse['_source']], self._neurons[synapse['_destin']])
@@ -447,12 +1175,47 @@ class Network:
     def _updateRecorders(self):
         if self._debugVerbose: t = clock()
         for recorder in self._recorders:
-            for nid in recorder._neuronIds:
-                if nid in self._neurons.keys():
-                    for var in recorder._variables:
-                        recorder[var][nid].append(self._neurons[nid][var])
+            store = recorder._sampled(self._step)
+            if store is None:
+                continue  # Not recorded (decimation, windows)
+            plan = self._recordingPlan(recorder)
+            for var in recorder._variables:
+                groups = []
+                for (population, columns, ids, indices) in plan:
+                    if population is None:
+                        values = [self._neurons[nid][var] for nid in ids]
+                    else:
+                        # One gather per population and variable
+                        column = population.column(var)
+                        if column is None:
+                            raise KeyError(var)
+                        values = column[indices]
+                    groups.append((columns, values))
+                recorder._record(var, groups, store)
         if self._debugVerbose: print('(Network %i) Recorder updates: %.5f' % (self._id, clock() - t))
 
+    def _recordingPlan(self, recorder):
+        """
+        The recorded neurons that exist, per population (array engine) or all at once (dict engine):
+        [(population or None, recorder columns, ids, array indices or None)]
+        Made again after neurons are added or deleted
+        """
+        (version, plan) = self._recordingPlans.get(id(recorder), (None, None))
+        if not version == self._structureVersion:
+            groups = {}
+            for (column, nid) in enumerate(recorder._neuronIds):
+                if nid in self._neurons:
+                    store = self._neurons[nid]._store if self._engine == 'array' else None
+                    group = groups.setdefault(store, ([], []))
+                    group[0].append(column)
+                    group[1].append(nid)
+            plan = []
+            for (store, (columns, ids)) in groups.items():
+                indices = store.indices(ids) if store is not None else None
+                plan.append((store, np.array(columns, dtype=np.intp), ids, indices))
+            self._recordingPlans[id(recorder)] = (self._structureVersion, plan)
+        return plan
+
     def saveState(self, file):
         with open(file + ".pNet", 'wb') as fHandle:
             pickle.dump(self, fHandle)
@@ -463,15 +1226,396 @@ class Network:
             return pickle.load(fHandle)
 
 
+class Timeline(object):
+    """
+    The times of the simulated steps, kept as run segments (first step, number of steps, dt): t = step * dt.
+    Behaves like the flat list of times (len, indexing, slicing, iteration, numpy.asarray, pylab.plot)
+    but uses O(1) memory per simulate() call instead of one float per step.
+    """
+
+    def __init__(self, segments=(), store=None):
+        """
+        :param segments: (start, count, dt) tuples
+        :param store: DiskList of doubles that keeps the segments (3 values per segment), None: memory only
+        """
+        self.segments = []
+        self._store = store
+        self._ends = [0]  # cumulative number of steps at the end of each segment
+        for (start, count, dt) in segments:
+            self._add(int(start), int(count), float(dt))
+        if store is not None:
+            values = store.getList()
+            for k in range(0, len(values) - 2, 3):
+                self._add(int(values[k]), int(values[k + 1]), values[k + 2])
+
+    def _add(self, start, count, dt):
+        if count <= 0:
+            return
+        if self.segments:
+            (lastStart, lastCount, lastDt) = self.segments[-1]
+            if lastDt == dt and lastStart + lastCount == start:
+                # The next run of the same network, one segment
+                self.segments[-1] = (lastStart, lastCount + count, dt)
+                self._ends[-1] += count
+                return
+        self.segments.append((start, count, dt))
+        self._ends.append(self._ends[-1] + count)
+
+    def append(self, start, count, dt):
+        """
+        Adds a run segment
+        :param start: step number of the first step (its time is start * dt)
+        :param count: number of steps
+        :param dt: the time step in ms
+        """
+        if count <= 0:
+            return
+        self._add(start, count, dt)
+        if self._store is not None:
+            self._store.extend(np.array([start, count, dt], dtype=np.float64))
+
+    def flush(self):
+        """
+        Writes the buffered segments to the store
+        """
+        if self._store is not None:
+            self._store.flush()
+
+    def __len__(self):
+        return self._ends[-1]
+
+    def __iter__(self):
+        for (start, count, dt) in self.segments:
+            for step in range(start, start + count):
+                yield step * dt
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.toArray()[item]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError('(Timeline) Index out of range: %i' % item)
+        k = bisect.bisect_right(self._ends, item) - 1
+        (start, count, dt) = self.segments[k]
+        return (start + item - self._ends[k]) * dt
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.toArray()
+        return array if dtype is None else array.astype(dtype)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'Timeline(%r)' % (self.segments,)
+
+    def steps(self):
+        """
+        :return: numpy array with the step numbers
+        """
+        if not self.segments:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.arange(start, start + count, dtype=np.int64)
+                               for (start, count, dt) in self.segments])
+
+    def toArray(self):
+        """
+        :return: numpy array with the times (ms)
+        """
+        if not self.segments:
+            return np.zeros(0)
+        return np.concatenate([np.arange(start, start + count) * dt for (start, count, dt) in self.segments])
+
+    def getList(self):
+        return self.toArray().tolist()
+
+
+def _gather(groups, size):
+    # The values of a recorded step: (row, present), nan / False for the neurons that do not exist
+    row = np.full(size, np.nan)
+    present = np.zeros(size, dtype=bool)
+    for (columns, values) in groups:
+        try:
+            row[columns] = values
+        except (TypeError, ValueError):
+            # Values that are not numbers
+            row = row.astype(object)
+            row[columns] = values
+        present[columns] = True
+    return (row, present)
+
+
+class Traces(object):
+    """
+    The recorded values of one variable (in memory Recorder): one array (steps, recorded neurons)
+    that grows in chunks. traces[neuronId] is a view of the column of the neuron, nan for the steps
+    in which the neuron did not exist, so every trace lines up with Recorder.timeline.
+    Dict like: keys() are the recorded neuron ids.
+    """
+
+    def __init__(self, neuronIds, chunk=1024):
+        """
+        :param neuronIds: the recorded neuron ids, in column order
+        :param chunk: minimum number of rows (steps) added when the array is full
+        """
+        self._neuronIds = list(neuronIds)
+        self._columns = dict((nid, k) for (k, nid) in enumerate(self._neuronIds))
+        self._chunk = chunk
+        self._data = np.zeros((0, len(self._neuronIds)))
+        self._rows = 0
+
+    def __getstate__(self):
+        # Spare rows are not pickled
+        state = self.__dict__.copy()
+        state['_data'] = self._data[:self._rows]
+        return state
+
+    def __getitem__(self, neuronId):
+        return self._data[:self._rows, self._columns[neuronId]]
+
+    def __contains__(self, neuronId):
+        return neuronId in self._columns
+
+    def __iter__(self):
+        return iter(self._neuronIds)
+
+    def __len__(self):
+        return len(self._neuronIds)
+
+    def keys(self):
+        return list(self._neuronIds)
+
+    def values(self):
+        return [self[nid] for nid in self._neuronIds]
+
+    def items(self):
+        return [(nid, self[nid]) for nid in self._neuronIds]
+
+    def array(self):
+        """
+        :return: view (steps, recorded neurons) of all values, columns in the order of keys()
+        """
+        return self._data[:self._rows]
+
+    def reserve(self, rows):
+        """
+        Makes room for rows more steps, the array is copied at most once
+        """
+        if self._rows + rows > len(self._data):
+            size = max(self._rows + rows, len(self._data) + self._chunk)
+            data = np.empty((size, self._data.shape[1]), dtype=self._data.dtype)
+            data[:self._rows] = self._data[:self._rows]
+            self._data = data
+
+    def append(self, row):
+        """
+        Adds the values of a step
+        :param row: numpy array with one value per column (positions in keys())
+        """
+        if self._rows == len(self._data):
+            self.reserve(max(self._rows, self._chunk))  # doubles, amortized O(1) per row
+        if row.dtype == object and not self._data.dtype == object:
+            # Values that are not numbers
+            self._data = self._data.astype(object)
+        self._data[self._rows] = row
+        self._rows += 1
+
+
+class TraceFile(object):
+    """
+    The recorded values of one variable of a disk mode Recorder in one file, instead of a file per neuron:
+    a header (magic, version, the neuron ids) followed by the rows (steps) of all recorded neurons, time major.
+    Rows are collected in memory and written per block of buffersize rows with one write. Every row has the
+    same size, so the offset of row r is header + r * row size: traces[neuronId] and rows(start, stop) read
+    only what they need from a numpy.memmap. Same interface as Traces.
+    """
+    magic = b'ENNTRACE'
+    version = 1
+    dtype = np.dtype('<f8')
+
+    def __init__(self, file, neuronIds=None, buffersize=128, readonly=False, overwrite=False):
+        """
+        :param file: path of the file
+        :param neuronIds: the recorded neuron ids, in column order (None: read from the file)
+        :param buffersize: rows (steps) per written block
+        :param readonly: only read an existing file
+        :param overwrite: start a new file, else new rows are appended to an existing file
+        """
+        import io
+        import os
+        self._args = (file, neuronIds, buffersize, readonly)
+        self._file = file
+        self._handle = None
+        self._map = None
+        exists = os.path.isfile(file) and os.path.getsize(file) > 0
+        if readonly and not exists:
+            raise IOError('No such file: %s' % file)
+        if exists and not overwrite:
+            (fileIds, self._offset) = self._readHeader(file)
+            if neuronIds is not None and not readonly and not list(neuronIds) == fileIds:
+                raise ValueError('(Recorder) %s holds other neurons, use overwrite=True' % file)
+            neuronIds = fileIds
+        elif neuronIds is None:
+            raise ValueError('(Recorder) The neuron ids of a new file are required')
+        self._neuronIds = list(neuronIds)
+        self._columns = dict((nid, k) for (k, nid) in enumerate(self._neuronIds))
+        self._rowBytes = self.dtype.itemsize * len(self._neuronIds)
+        if not readonly:
+            if exists and not overwrite:
+                self._handle = io.FileIO(file, 'r+b')
+            else:
+                self._handle = io.FileIO(file, 'w+b')
+                self._offset = self._writeHeader(self._handle, self._neuronIds)
+        self._rows = (os.path.getsize(file) - self._offset) // self._rowBytes if self._rowBytes else 0
+        if self._handle is not None:
+            # A partly written last row (e.g. a crash) is dropped
+            self._handle.truncate(self._offset + self._rows * self._rowBytes)
+            self._handle.seek(0, 2)
+        self._pending = np.empty((max(1, int(buffersize)), len(self._neuronIds)), dtype=self.dtype)
+        self._count = 0
+
+    def __getstate__(self):
+        self.flush()
+        return self._args
+
+    def __setstate__(self, state):
+        (file, neuronIds, buffersize, readonly) = state
+        self.__init__(file, neuronIds, buffersize, readonly)
+
+    @classmethod
+    def _writeHeader(cls, handle, neuronIds):
+        info = pickle.dumps({'neuronIds': list(neuronIds), 'dtype': cls.dtype.str}, 2)
+        size = len(cls.magic) + 8 + len(info)
+        padding = -size % 8  # rows start at a multiple of 8 bytes
+        handle.write(cls.magic + struct.pack('<II', cls.version, len(info) + padding) + info + b'\0' * padding)
+        return size + padding
+
+    @classmethod
+    def _readHeader(cls, file):
+        with open(file, 'rb') as f:
+            if not f.read(len(cls.magic)) == cls.magic:
+                raise IOError('(Recorder) Not a trace file: %s' % file)
+            (version, size) = struct.unpack('<II', f.read(8))
+            if version > cls.version:
+                raise IOError('(Recorder) %s was written by a newer version' % file)
+            info = pickle.loads(f.read(size))
+        if not np.dtype(info['dtype']) == cls.dtype:
+            raise IOError('(Recorder) Unsupported type in %s: %s' % (file, info['dtype']))
+        return (list(info['neuronIds']), len(cls.magic) + 8 + size)
+
+    @property
+    def shape(self):
+        return (self._rows + self._count, len(self._neuronIds))
+
+    def __getitem__(self, neuronId):
+        return self.array()[:, self._columns[neuronId]]
+
+    def __contains__(self, neuronId):
+        return neuronId in self._columns
+
+    def __iter__(self):
+        return iter(self._neuronIds)
+
+    def __len__(self):
+        return len(self._neuronIds)
+
+    def keys(self):
+        return list(self._neuronIds)
+
+    def values(self):
+        return [self[nid] for nid in self._neuronIds]
+
+    def items(self):
+        return [(nid, self[nid]) for nid in self._neuronIds]
+
+    def array(self):
+        """
+        :return: read only numpy.memmap (steps, recorded neurons) of all values, columns in the order of keys()
+        """
+        self.flush()
+        if not self._rows or not self._rowBytes:
+            return np.zeros((self._rows, len(self._neuronIds)), dtype=self.dtype)
+        if self._map is None or not len(self._map) == self._rows:
+            self._map = np.memmap(self._file, dtype=self.dtype, mode='r', offset=self._offset,
+                                  shape=(self._rows, len(self._neuronIds)))
+        return self._map
+
+    def rows(self, start, stop):
+        """
+        :return: numpy array with the rows (steps) start .. stop - 1 of all neurons, only these are read
+        """
+        return np.array(self.array()[start:stop])
+
+    def reserve(self, rows):
+        pass  # The file grows per block
+
+    def append(self, row):
+        """
+        Adds the values of a step, written when buffersize rows are collected
+        :param row: numpy array with one value per column (positions in keys())
+        """
+        if self._handle is None:
+            raise IOError('(Recorder) %s is opened read only' % self._file)
+        self._pending[self._count] = row
+        self._count += 1
+        if self._count == len(self._pending):
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the collected rows
+        """
+        if self._count:
+            self._handle.write(self._pending[:self._count].tobytes())
+            self._rows += self._count
+            self._count = 0
+
+    def close(self):
+        self.flush()
+        self._map = None
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
 class Recorder(object):
-    def __init__(self, networkId, neuronIds, variables=['Vm'], withTime=False, diskMode=False, toDiskDir='defaultDir', buffersize=128, readonly=False, overwrite=False, dt=None):  # TODO: WithTime
+    # Reductions of the steps between stored values, the same modes as python27Ca2VideoMaker.renderCa2Video
+    modes = ('point', 'mean', 'sum', 'highest', 'lowest')
+
+    def __init__(self, networkId, neuronIds, variables=['Vm'], withTime=False, diskMode=False, toDiskDir='defaultDir', buffersize=128, readonly=False, overwrite=False, dt=None, every=1, windows=None, mode='point'):  # TODO: WithTime
+        """
+        :param diskMode: write the values to toDiskDir, one TraceFile per variable (var_<name>.traces)
+        :param buffersize: disk mode: steps collected in memory before they are written
+        :param every: store a value every `every` steps (at the steps that are a multiple of every)
+        :param windows: list of (start, stop) times in ms, only steps with start <= t < stop are recorded.
+                        None: record everything (e.g. [(100, 1e9)] skips a warm up of 100 ms)
+        :param mode: how the steps since the previous stored value are combined, computed during the run:
+                     'point': the value of the stored step (plain decimation) | 'mean' | 'sum' |
+                     'highest': the maximum | 'lowest': the minimum
+                     Steps outside the windows are not part of a reduction.
+        """
         # Buffer size in items
+        if mode not in self.modes:
+            raise ValueError('(Recorder) Unknown mode: %s' % mode)
+        if every < 1:
+            raise ValueError('(Recorder) every must be at least 1')
         self._networkId = networkId
         self._neuronIds = list(neuronIds)
         self._variables = variables
         self._withTime = withTime
         self._networkStucture = None
         self._toDisk = diskMode
+        self._every = int(every)
+        self._windows = list(windows) if windows is not None else None
+        self._mode = mode
+        self._windowSteps = None # [(first, last)] steps inside the windows, see _prepare
+        self._accumulators = {}  # var -> (value, count) of the running reduction
         if dt is not None:
             self['dt'] = dt
 
@@ -485,17 +1629,29 @@ class Recorder(object):
             elif os.path.isdir(toDiskDir) and not readonly and not overwrite:
                 print('%s opened in append mode!' % toDiskDir)
 
-            self.timeline = dl.DiskList(os.path.join(toDiskDir, 'timeline'), readonly=readonly, overwrite=overwrite)
+            # Only the run segments are stored, see Timeline
+            segments = os.path.join(toDiskDir, 'timeline_segments')
+            if readonly and not os.path.isfile(segments) and os.path.isfile(os.path.join(toDiskDir, 'timeline')):
+                # Written by an older version: every time as a float
+                self.timeline = dl.DiskList(os.path.join(toDiskDir, 'timeline'), readonly=True)
+            else:
+                self.timeline = Timeline(store=dl.DiskList(segments, type=dl.double, readonly=readonly,
+                                                           overwrite=overwrite))
+            # One file per variable, see TraceFile
             for var in variables:
-                self[var] = {}
-                for i in neuronIds:
-                    self[var][i] = dl.DiskList(os.path.join(toDiskDir, 'var_%s_neuron_%s' % (var, i)), readonly=readonly, overwrite=overwrite)
+                file = os.path.join(toDiskDir, 'var_%s.traces' % var)
+                if readonly and not os.path.isfile(file) and self._neuronIds and \
+                        os.path.isfile(os.path.join(toDiskDir, 'var_%s_neuron_%s' % (var, self._neuronIds[0]))):
+                    # Written by an older version: a DiskList per neuron
+                    self[var] = {}
+                    for i in self._neuronIds:
+                        self[var][i] = dl.DiskList(os.path.join(toDiskDir, 'var_%s_neuron_%s' % (var, i)), readonly=True)
+                else:
+                    self[var] = TraceFile(file, self._neuronIds, buffersize, readonly=readonly, overwrite=overwrite)
         else:
-            self.timeline = []
+            self.timeline = Timeline()
             for var in variables:
-                self[var] = {}
-                for i in neuronIds:
-                    self[var][i] = []
+                self[var] = Traces(self._neuronIds)
 
     def __getitem__(self, item):
         return getattr(self, item)
@@ -503,6 +1659,117 @@ class Recorder(object):
     def __setitem__(self, key, value):
         setattr(self, key, value)
 
+    def reserve(self, steps):
+        """
+        Preallocates room for steps more values per neuron (memory mode)
+        """
+        if not self._toDisk:
+            for var in self._variables:
+                self[var].reserve(steps)
+
+    def _prepare(self, first, steps, dt):
+        """
+        Called by Network.simulate before a run: adds the stored steps to the timeline and preallocates them
+        :param first: the first step of the run
+        :param steps: the number of steps
+        """
+        last = first + steps - 1
+        if self._windows is None:
+            ranges = [(first, last)]
+        else:
+            # t = step * dt, start <= t < stop
+            self._windowSteps = [(int(np.ceil(start / dt - 1e-9)), int(np.ceil(stop / dt - 1e-9)) - 1)
+                                 for (start, stop) in self._windows]
+            ranges = []
+            for (a, b) in sorted(self._windowSteps):
+                (a, b) = (max(a, first), min(b, last))
+                if ranges and a <= ranges[-1][1] + 1:
+                    # Overlapping or touching windows, every step is stored once
+                    ranges[-1] = (ranges[-1][0], max(b, ranges[-1][1]))
+                elif b >= a:
+                    ranges.append((a, b))
+        stored = 0
+        k = self._every
+        for (a, b) in ranges:
+            (start, end) = (-(-a // k), b // k)  # the multiples of every in a .. b
+            if end >= start:
+                self.timeline.append(start, end - start + 1, k * dt)
+                stored += end - start + 1
+        self.reserve(stored)
+
+    def flush(self):
+        """
+        Disk mode: writes the collected steps (called by Network.simulate at the end of a run)
+        """
+        if self._toDisk:
+            if isinstance(self.timeline, Timeline):
+                self.timeline.flush()
+            for var in self._variables:
+                if isinstance(self[var], TraceFile):
+                    self[var].flush()
+
+    def window(self, var, start, stop):
+        """
+        The values of the steps with start <= t < stop, in disk mode only these steps are read
+        :param start: time in ms
+        :param stop: time in ms
+        :return: (times, values): numpy arrays, values: (steps, recorded neurons)
+        """
+        times = np.asarray(self.timeline)
+        (first, last) = np.searchsorted(times, [start, stop])
+        if isinstance(self[var], TraceFile):
+            return (times[first:last], self[var].rows(first, last))
+        return (times[first:last], np.array(self[var].array()[first:last]))
+
+    def _sampled(self, step):
+        """
+        :return: None if the step is not recorded, True if a value is stored at this step,
+                 False if it is only part of a reduction
+        """
+        if self._windowSteps is not None and not any(a <= step <= b for (a, b) in self._windowSteps):
+            self._accumulators = {}  # A reduction does not continue in the next window
+            return None
+        store = step % self._every == 0
+        if not store and self._mode == 'point':
+            return None
+        return store
+
+    def _record(self, var, groups, store):
+        """
+        Called by the network every recorded step
+        :param groups: [(columns, values)] values of the existing neurons, columns: positions in the neuron ids
+        :param store: True: store a value, False: only add to the reduction
+        """
+        (row, present) = _gather(groups, len(self._neuronIds))
+        if not self._mode == 'point':
+            (row, present) = self._reduce(var, row, present, store)
+        if not store:
+            return
+        self[var].append(row)
+
+    def _reduce(self, var, row, present, store):
+        # Incremental mean / sum / highest / lowest, only the neurons that exist count
+        if var not in self._accumulators:
+            start = {'highest': -np.inf, 'lowest': np.inf}.get(self._mode, 0.0)
+            self._accumulators[var] = (np.full(len(row), start), np.zeros(len(row), dtype=np.int64))
+        (value, count) = self._accumulators[var]
+        if self._mode in ('mean', 'sum'):
+            value[present] += row[present]
+        elif self._mode == 'highest':
+            value[present] = np.maximum(value[present], row[present])
+        else:
+            value[present] = np.minimum(value[present], row[present])
+        count += present
+        if not store:
+            return (None, None)
+        del self._accumulators[var]
+        present = count > 0
+        result = np.full(len(row), np.nan)
+        result[present] = value[present]
+        if self._mode == 'mean':
+            result[present] /= count[present]
+        return (result, present)
+
     def save(self, file):
         if self._toDisk:
             raise RuntimeError('Function not available in disk mode')
@@ -533,7 +1800,7 @@ class Recorder(object):
             with open(file + "_" + var + ".txt", 'w') as f:
                 writer = csv.writer(f)
                 for (key, value) in self[var].items():
-                    writer.writerow([key]+value)
+                    writer.writerow([key] + list(value))
 
     def setNetworkStructure(self, network, synapseWeightVar='w', storeDict=False):
         """
@@ -574,61 +1841,63 @@ class Recorder(object):
             return pickle.load(fHandle)
 
 
-    def getSpikeEventtimes(self, var='Vm', async=False, neurons=None, file=None):
+    def getSpikeEventtimes(self, var='Vm', parallel=False, neurons=None, file=None, thres=0.1, minDist=100,
+                           **kwargs):
         """
-        Calculates the spike events and returns an array containing the timestamps of the spikes.
-        This is calculated over var for each neuron in neurons. If neurons is None, all neurons are used.
+        Calculates the spike events of var for each neuron in neurons, all neurons at once (ENN_Spikes.peaks,
+        the same peaks as peakutils.indexes). If neurons is None, all neurons are used.
         :param var:
+        :param parallel: not used anymore (was async: one process per neuron), the extraction is vectorized
         :param neurons:
-        :return: Array of spike events per neuron in ms!
+        :param file: also writes the spike times to file + '.txt' (csv, one row per neuron)
+        :param thres: relative threshold, fraction of the range of each neuron
+        :param minDist: minimum distance between two spikes in samples
+        :param kwargs: async, the old name of parallel (a keyword since Python 3.7): deprecated
+        :return: ENN_Spikes.SpikeTrains, dict like: neuron id -> array with the spike times in ms.
+                 It used to be a dict, trains.toDict() gives one
         """
         import csv
-        if async:
-            p = Pool()
-            rets = []
-            if neurons is None:
-                neurons = self._neuronIds
-
-            for nId in neurons:
-                if self._toDisk:
-                    data = self[var][nId].toList()
-                else:
-                    data = self[var][nId]
-                rets.append((nId, p.apply_async(self._calculateSpikeEventtimes, (data, self['dt']))))
-
-            data = {}
-            if file is not None:
-                with open(file+'.txt','w') as f:
-                    writer = csv.writer(f)
-                    for (nId, pId) in rets:
-                        data[nId] = pId.get()
-                        writer.writerow(['id %i' % nId] + list(data[nId]))
-            else:
-                for (nId, pId) in rets:
-                    data[nId] = pId.get()
-
-            p.close()
-            p.join()
+        if 'async' in kwargs:
+            import warnings
+            warnings.warn('(Recorder) getSpikeEventtimes: async is deprecated, use parallel', DeprecationWarning,
+                          stacklevel=2)
+            parallel = kwargs.pop('async')
+        if kwargs:
+            raise TypeError('(Recorder) getSpikeEventtimes got unexpected arguments: %s' % ', '.join(sorted(kwargs)))
+        if neurons is None:
+            neurons = self._neuronIds
+        neurons = list(neurons)
+        traces = self[var]
+        if not isinstance(traces, dict):
+            data = traces.array()
+            times = self._times(len(data))
+            if not neurons == traces.keys():
+                # Only the requested columns, a memmap is still read in chunks
+                positions = dict((nid, k) for (k, nid) in enumerate(traces.keys()))
+                data = spikes.selectColumns(data, [positions[nid] for nid in neurons])
+            data = spikes.peaks(data, thres, minDist, times=times, neuronIds=neurons)
         else:
-            if neurons is None:
-                neurons = self._neuronIds
-
-            data = {}
+            # Written by an older version: one file per neuron, the traces can have different lengths
+            trains = {}
             for nId in neurons:
-                if self._toDisk:
-                    data[nId] = self._calculateSpikeEventtimes(self[var][nId].getList(), self['dt'])
-                else:
-                    data[nId] = self._calculateSpikeEventtimes(self[var][nId], self['dt'])
+                trace = np.asarray(self[var][nId], dtype=np.float64)
+                trains[nId] = spikes.peaks(trace[:, None], thres, minDist, times=self._times(len(trace)))[0]
+            data = spikes.SpikeTrains.fromDict(trains, neurons)
 
-            if file is not None:
-                with open(file + '.txt', 'w') as f:
-                    writer = csv.writer(f)
-                    for nId in data.keys():
-                        writedata = ['id %i' % nId] + list(data[nId])
-                        writer.writerow(writedata)
+        if file is not None:
+            with open(file + '.txt', 'w') as f:
+                writer = csv.writer(f)
+                for nId in neurons:
+                    writer.writerow(['id %s' % (nId,)] + list(data[nId]))
 
         return data
 
+    def _times(self, samples):
+        # The time of each of samples recorded values: the timeline if it covers them, else sample * dt
+        if len(self.timeline) == samples:
+            return np.asarray(self.timeline, dtype=np.float64)
+        return np.arange(samples) * self['dt']
+
     @staticmethod
     def _calculateSpikeEventtimes(data, dt):
         """
@@ -636,12 +1905,142 @@ class Recorder(object):
         :param data:
         :return:
         """
-        #import pylab as pl
         if len(data) < 1:
             return []
-        idxs = pu.indexes(np.array(data), thres=0.1, min_dist=100)
-        timeEvents = idxs * dt
-        return timeEvents
+        trace = np.asarray(data, dtype=np.float64)
+        return spikes.peaks(trace[:, None], thres=0.1, minDist=100, dt=dt)[0]
+
+class SpikeMonitor(object):
+    """
+    Detects spikes during the simulation instead of afterwards from recorded traces:
+    an upward crossing of the threshold by var, at least refractory ms after the previous spike of the neuron.
+    Stores only the (neuron, step) pairs and, with binSize, the number of spikes per time bin (PSTH).
+    Added to the simulation like a Recorder: Simulator.addRecorder(monitor)
+    """
+
+    def __init__(self, networkId, neuronIds, var='Vm', threshold=0.0, refractory=2.0, binSize=None, chunk=1024):
+        """
+        :param networkId: id of the network (Simulator.addNetwork)
+        :param neuronIds: the monitored neuron ids
+        :param var: the variable that spikes, e.g. 'Vm' (Hodgkin & Huxley) or 'v' (Izhikevich)
+        :param threshold: a spike is var going from <= threshold to > threshold. var is read after every step,
+                          models that reset within the step (Izhikevich: v >= 30) need a lower threshold, e.g. 0
+        :param refractory: minimum time between two spikes of a neuron in ms
+        :param binSize: bin width in ms of the online spike counts (psth()), None: no counts
+        :param chunk: minimum number of spikes the buffers grow with
+        """
+        self._networkId = networkId
+        self._neuronIds = list(neuronIds)
+        self._variables = [var]
+        self._withTime = True  # Network.simulate only uses recorders with a timeline
+        self.var = var
+        self.threshold = threshold
+        self.refractory = refractory
+        self.binSize = binSize
+        self.dt = None
+        self._preparedDt = None  # dt of the runs so far, spike steps are converted with it
+        self._chunk = chunk
+        self._columns = np.zeros(chunk, dtype=np.int32)  # position in neuronIds, per spike
+        self._steps = np.zeros(chunk, dtype=np.int64)    # step of the spike
+        self._spikes = 0
+        self._counts = np.zeros(0, dtype=np.int64)       # spikes per bin
+        self._above = np.zeros(len(self._neuronIds), dtype=bool)
+        self._last = np.full(len(self._neuronIds), np.iinfo(np.int64).min // 2, dtype=np.int64)
+        self._refractorySteps = 0
+        self._step = 0
+
+    def __getitem__(self, item):
+        return getattr(self, item)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __getstate__(self):
+        # Spare capacity is not pickled
+        state = self.__dict__.copy()
+        state['_columns'] = self._columns[:self._spikes]
+        state['_steps'] = self._steps[:self._spikes]
+        return state
+
+    def _prepare(self, first, steps, dt):
+        # Called by Network.simulate before a run
+        # Network.simulate sets self.dt before this call, compare with the dt of the previous run.
+        # The spike steps are converted to times with _preparedDt
+        if self._preparedDt is not None and not self._preparedDt == dt:
+            raise ValueError('(SpikeMonitor) The time step of the network changed')
+        self.dt = self._preparedDt = dt
+        self._refractorySteps = int(np.ceil(self.refractory / dt - 1e-9))
+        if self.binSize is not None:
+            bins = int((first + steps - 1) * dt // self.binSize) + 1
+            if bins > len(self._counts):
+                self._counts = np.concatenate((self._counts, np.zeros(bins - len(self._counts), dtype=np.int64)))
+
+    def flush(self):
+        pass  # Nothing is buffered
+
+    def _sampled(self, step):
+        # Every step is checked
+        self._step = step
+        return True
+
+    def _record(self, var, groups, store):
+        # Vectorized over the neurons: upward crossings outside the refractory window
+        (row, present) = _gather(groups, len(self._neuronIds))
+        above = row > self.threshold
+        fired = np.nonzero(above & ~self._above & (self._step - self._last >= self._refractorySteps))[0]
+        self._above = above
+        if not len(fired):
+            return
+        self._last[fired] = self._step
+        end = self._spikes + len(fired)
+        if end > len(self._steps):
+            size = max(end, 2 * len(self._steps), self._chunk)
+            self._columns = np.concatenate((self._columns[:self._spikes], np.zeros(size - self._spikes, np.int32)))
+            self._steps = np.concatenate((self._steps[:self._spikes], np.zeros(size - self._spikes, np.int64)))
+        self._columns[self._spikes:end] = fired
+        self._steps[self._spikes:end] = self._step
+        self._spikes = end
+        if self.binSize is not None:
+            self._counts[int(self._step * self._preparedDt // self.binSize)] += len(fired)
+
+    def __len__(self):
+        return self._spikes
+
+    def spikes(self):
+        """
+        :return: (neuron ids, times in ms) numpy arrays, one element per spike in order of time
+        """
+        columns = self._columns[:self._spikes]
+        return (np.array(self._neuronIds, dtype=object)[columns], self._steps[:self._spikes] * (self._preparedDt or 0.0))
+
+    def spikeTimes(self, neurons=None):
+        """
+        :param neurons: neuron ids, None: all monitored neurons
+        :return: dict neuron id -> numpy array with the spike times in ms, like Recorder.getSpikeEventtimes
+        """
+        columns = self._columns[:self._spikes]
+        order = np.argsort(columns, kind='stable')
+        starts = np.searchsorted(columns[order], np.arange(len(self._neuronIds) + 1))
+        times = self._steps[:self._spikes][order] * (self._preparedDt or 0.0)
+        positions = dict((nid, k) for (k, nid) in enumerate(self._neuronIds))
+        neurons = self._neuronIds if neurons is None else neurons
+        return dict((nid, times[starts[positions[nid]]:starts[positions[nid] + 1]]) for nid in neurons)
+
+    def counts(self):
+        """
+        :return: dict neuron id -> number of spikes
+        """
+        counts = np.bincount(self._columns[:self._spikes], minlength=len(self._neuronIds))
+        return dict(zip(self._neuronIds, counts.tolist()))
+
+    def psth(self):
+        """
+        :return: (bin start times in ms, number of spikes of all monitored neurons per bin)
+        """
+        if self.binSize is None:
+            raise RuntimeError('(SpikeMonitor) No binSize given')
+        return (np.arange(len(self._counts)) * self.binSize, self._counts.copy())
+
 
 def dumpclean(obj):
     if type(obj) == dict:
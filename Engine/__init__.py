@@ -1,4 +1,4 @@
-__all__ = ['ENN_Models', 'ENNet', 'python27Ca2VideoMaker']
+__all__ = ['ENN_Models', 'ENN_Arrays', 'ENN_Noise', 'ENN_Integrators', 'ENN_Equations', 'ENN_Jit', 'ENN_Connectivity', 'ENN_Spikes', 'ENNet', 'python27Ca2VideoMaker']
 
 # Support for older versions:
 #from Engine.ENNet import *
@@ -184,6 +184,8 @@ def renderCa2Video(data, netpos, output='video.avi', recfps=120.0, playfps=24.0,
     Renders a video based on the data and the network structure
     :param data: A dictionary with the data. Keys must correspond to the keys of the networkx (networkStructure)
     :param netpos: The locations of every neurons: dict { neuronID: [x,y] } where x and y are doubles between -1 and 1
+                   or an array with the position of neuron i in row i, e.g. from ENN_Connectivity.positions()
+                   (3D positions are projected on x,y)
     :param output: Name of the output
     :param recfps: Frames per seconds. Please choose a value that results in a rounded answer for frametime/dt where frametime is 1/fps
     :param 24.0: The fps for playback.
@@ -216,7 +218,7 @@ def renderCa2Video(data, netpos, output='video.avi', recfps=120.0, playfps=24.0,
     maxarray = []
     length = len(data[data.keys()[0]])
     for key in data.keys():
-        (x,y) = netpos[key]
+        (x,y) = netpos[key][:2]
         positions.append( (int(np.round(((np.double(x)+1.0)/2.0) * np.double(size[0]))), int(np.round(((np.double(y)+1.0)/2.0) * np.double(size[1])))) )
         dataarray.append(data[key])
         maxarray.append(np.array(data[key]).max())
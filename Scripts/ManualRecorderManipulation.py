@@ -20,14 +20,14 @@ for net in ['Network_Weight_2.00', 'Network_Weight_3.00', 'Network_Weight_4.00',
     pl.title(net)
     t = rec.timeline.getList()
     for j in range(0,N):
-        pl.plot( rec['Vm'][j].getList())
+        pl.plot(t, rec['Vm'][j])
         pl.hold('on')
 
     pl.ylabel('Membrane Voltage (mv)')
 
     pl.subplot(212, sharex=ax)
     for j in range(0,N):
-        pl.plot(rec['I'][j].getList())
+        pl.plot(t, rec['I'][j])
         pl.hold('on')
 
     pl.ylabel('input current (pA)')
@@ -0,0 +1,54 @@
+import pickle
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+
+# findNeurons / findConnections give the same ids in both engines, with and without an index (addIndex),
+# also after values are written through the element dicts (getConnectionByID(i)['wi'] = x).
+
+
+def network(engine):
+    net = enn.Network(models.HodgkinAndHuxleyNeuron, models.default_Hodgkin_Huxley_neuron_dict,
+                      models.HodgkinAndHuxleyAxonSynapseSimple,
+                      models.HodgkinAndHuxleyAxonSynapseSimple_Dictwrapper(we=0.5, sd=0), 0.05, engine=engine)
+    net.addNeurons(20)
+    rng = np.random.RandomState(4)
+    for (a, b) in zip(rng.randint(0, 20, 60).tolist(), rng.randint(0, 20, 60).tolist()):
+        net.connect(a, b, {'wi': float(rng.randint(0, 4))})
+    return net
+
+
+def query(net):
+    return (sorted(net.findConnections(lambda s: s['wi'] > 2).tolist()),
+            sorted(net.findConnections(wi=1.0).tolist()),
+            sorted(net.findNeurons(lambda n: n['Istim'] > 0).tolist()))
+
+
+def testIndexedWrites():
+    results = []
+    for (engine, indexed) in (('dict', False), ('dict', True), ('array', False), ('array', True)):
+        net = network(engine)
+        if indexed:
+            net.addIndex('wi', synapses=True)
+            net.addIndex('Istim')
+        steps = [query(net)]
+        net.getConnectionByID(3)['wi'] = 3.0
+        net.getConnectionByID(5)['wi'] = 1.0
+        net.getNeuronByID(7)['Istim'] = 10
+        steps.append(query(net))
+        net.setConnections([0, 1], 'wi', 3.0)
+        net.connect(2, 4, {'wi': 5.0})
+        net.deleteConnection(5)
+        steps.append(query(net))
+        net._localStep()
+        copy = pickle.loads(pickle.dumps(net))
+        copy.getConnectionByID(8)['wi'] = 4.0
+        steps.append(query(copy))
+        results.append(steps)
+        print('%s, index %s: %s matches' % (engine, indexed, [len(step[0]) for step in steps]))
+    assert all(steps == results[0] for steps in results)
+    assert not results[0][0] == results[0][1]
+
+
+if __name__ == '__main__':
+    testIndexedWrites()
@@ -0,0 +1,173 @@
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+import Engine.ENN_Connectivity as connectivity
+
+# The connectivity generators give the same edges for the same seed, the requested degrees and densities and
+# no self connections unless asked for. Their edge arrays build a network with Network.fromEdges.
+# Spatial connectivity finds the same pairs as comparing every pair of neurons, with both indexes.
+
+izhDict = {'v': -65, 'u': 0, 'a': 0.02, 'b': 0.2, 'c': -65, 'd': 8, 'I': 0}
+synapseDict = {'w': 0.5, 'threshold': 0, 'I': [0.0] * 10, 'i': 0}
+
+
+def same(a, b):
+    return len(a) == len(b) and all(np.array_equal(x, y) for (x, y) in zip(a, b))
+
+
+def pairs(sources, destinations):
+    return set(zip(sources.tolist(), destinations.tolist()))
+
+
+def testSeeds():
+    generators = [lambda rng: connectivity.erdosRenyi(300, 0.05, rng=rng),
+                  lambda rng: connectivity.fixedInDegree(300, 20, rng=rng),
+                  lambda rng: connectivity.fixedOutDegree(300, 20, rng=rng),
+                  lambda rng: connectivity.blocks((200, 100), (0.1, 0.01), rng=rng),
+                  lambda rng: connectivity.excitatoryInhibitory(300, 0.05, rng=rng,
+                                                                excitatoryWeight=lambda r, size: r.random(size))]
+    for generator in generators:
+        assert same(generator(1), generator(1))
+        assert same(generator(1), generator(np.random.default_rng(1)))
+        assert not same(generator(1), generator(2))
+    print('Seeds: %i generators' % len(generators))
+
+
+def testDegrees():
+    n = 400
+    for selfConnections in (False, True):
+        for k in (0, 1, 30, 390):  # 390: most neurons, chosen by leaving out the others
+            (sources, destinations) = connectivity.fixedInDegree(n, k, rng=3, selfConnections=selfConnections)
+            assert np.all(np.bincount(destinations, minlength=n) == k)
+            assert len(pairs(sources, destinations)) == n * k  # No duplicates
+            assert selfConnections or not np.any(sources == destinations)
+            (sources, destinations) = connectivity.fixedOutDegree(n, k, rng=3, selfConnections=selfConnections)
+            assert np.all(np.bincount(sources, minlength=n) == k)
+            assert len(pairs(sources, destinations)) == n * k
+            assert selfConnections or not np.any(sources == destinations)
+    try:
+        connectivity.fixedInDegree(10, 10, rng=1)
+        assert False
+    except ValueError:
+        pass
+    print('Degrees: ok')
+
+
+def testDensity():
+    n = 1000
+    (sources, destinations) = connectivity.erdosRenyi(n, 0.02, rng=4)
+    assert len(pairs(sources, destinations)) == len(sources)
+    assert not np.any(sources == destinations)
+    expected = n * (n - 1) * 0.02
+    assert abs(len(sources) - expected) < 5 * np.sqrt(expected)
+    assert len(connectivity.erdosRenyi(n, 0.0, rng=4)[0]) == 0
+    assert len(connectivity.erdosRenyi(20, 1.0, rng=4)[0]) == 20 * 19
+    assert len(connectivity.erdosRenyi(20, 1.0, rng=4, selfConnections=True)[0]) == 20 * 20
+    # Groups of 600 and 400: dense within, sparse between
+    (sources, destinations) = connectivity.blocks((600, 400), [[0.05, 0.01], [0.0, 0.1]], rng=5)
+    assert not np.any(sources == destinations)
+    first = (sources < 600, destinations < 600)
+    counts = [[np.sum(first[0] & first[1]), np.sum(first[0] & ~first[1])],
+              [np.sum(~first[0] & first[1]), np.sum(~first[0] & ~first[1])]]
+    for (count, expected) in zip(np.ravel(counts), (600 * 599 * 0.05, 600 * 400 * 0.01, 0, 400 * 399 * 0.1)):
+        assert abs(count - expected) <= 5 * np.sqrt(expected)
+    try:
+        connectivity.blocks((10, 10, 10), [[0.1, 0.1], [0.1, 0.1]], rng=1)
+        assert False
+    except ValueError:
+        pass
+    print('Density: %i synapses' % len(sources))
+
+
+def testExcitatoryInhibitory():
+    (sources, destinations, weights, excitatory) = connectivity.excitatoryInhibitory(
+        500, 0.1, fractionExcitatory=0.8, excitatoryWeight=2.0, inhibitoryWeight=lambda rng, size: -rng.random(size),
+        rng=6)
+    assert np.array_equal(excitatory, sources < 400)
+    assert np.all(weights[excitatory] == 2.0)
+    assert np.all((weights[~excitatory] <= 0) & (weights[~excitatory] > -1))
+    assert excitatory.any() and not excitatory.all()
+    # Only excitatory -> inhibitory and inhibitory -> excitatory synapses
+    (sources, destinations, weights, excitatory) = connectivity.excitatoryInhibitory(100, [[0, 0.2], [0.2, 0]],
+                                                                                     rng=6)
+    assert np.all((sources < 80) != (destinations < 80))
+    print('Excitatory/inhibitory: ok')
+
+
+def testNetwork():
+    (sources, destinations, weights, excitatory) = connectivity.excitatoryInhibitory(50, 0.1, excitatoryWeight=0.5,
+                                                                                     inhibitoryWeight=-0.5, rng=7)
+    for engine in ('dict', 'array'):
+        net = enn.Network.fromEdges(sources, destinations, models.neuronIzh, izhDict, models.erwinSynapse,
+                                    synapseDict, 0.1, settings={'w': weights}, neurons=50, engine=engine)
+        edges = sorted((int(s['_source']), int(s['_destin']), float(s['w']))
+                       for s in (net.getConnectionByID(id) for id in net.getConnectionIDs()))
+        assert edges == sorted(zip(sources.tolist(), destinations.tolist(), weights.tolist()))
+    print('Network: %i synapses' % len(sources))
+
+
+def bruteForce(points, cutoff):
+    distances = np.sqrt(((points[:, None, :] - points[None, :, :]) ** 2).sum(axis=2))
+    (i, j) = np.nonzero((distances <= cutoff) & ~np.eye(len(points), dtype=bool))
+    return pairs(i, j)
+
+
+def testSpatial():
+    indexes = ['grid']
+    if connectivity.cKDTree is not None:
+        indexes.append('kdtree')
+    else:
+        print('Warning: scipy not found, the kdtree index is not tested')
+    for dim in (2, 3):
+        points = connectivity.positions(600, dim=dim, rng=8)
+        assert points.shape == (600, dim) and np.all(np.abs(points) <= 1.0)
+        expected = bruteForce(points, 0.2)
+        for index in indexes:
+            (sources, destinations, distances) = connectivity.spatial(points, 1.0, 0.2, rng=9, index=index)
+            assert pairs(sources, destinations) == expected and len(sources) == len(expected)
+            assert np.allclose(distances, np.sqrt(((points[sources] - points[destinations]) ** 2).sum(axis=1)))
+        # The same rng draws the same network with every index
+        networks = [connectivity.spatial(points, connectivity.gaussian(0.5, 0.1), 0.2, rng=9, index=index)
+                    for index in indexes]
+        assert all(same(network, networks[0]) for network in networks)
+        (sources, destinations, distances) = connectivity.spatial(points, 0.5, 0.2, rng=9, selfConnections=True,
+                                                                  index='grid')
+        assert np.any(sources == destinations) and np.all(distances[sources == destinations] == 0)
+    # Far apart clusters: mostly empty grid cells
+    points = np.concatenate((connectivity.positions(100, rng=10, extent=0.01),
+                             connectivity.positions(100, rng=11, extent=0.01) + 1000.0))
+    (sources, destinations, distances) = connectivity.spatial(points, 1.0, 0.05, index='grid')
+    assert pairs(sources, destinations) == bruteForce(points, 0.05)
+    try:
+        connectivity.spatial(points, 1.0, 0.05, index='octree')
+        assert False
+    except ValueError:
+        pass
+    print('Spatial: %s' % ', '.join(indexes))
+
+
+def testProfiles():
+    # The fraction of connected pairs follows the probability kernel
+    points = connectivity.positions(4000, rng=12)
+    candidates = connectivity.spatial(points, 1.0, 0.15, index='grid')[2]
+    for (kernel, name) in ((connectivity.gaussian(0.8, 0.05), 'gaussian'),
+                           (connectivity.exponential(0.8, 0.05), 'exponential')):
+        distances = connectivity.spatial(points, kernel, 0.15, rng=13, index='grid')[2]
+        bins = np.linspace(0, 0.15, 6)
+        (chosen, possible) = (np.histogram(distances, bins)[0], np.histogram(candidates, bins)[0])
+        centre = 0.5 * (bins[1:] + bins[:-1])
+        expected = kernel(centre) * possible
+        assert np.all(np.abs(chosen - expected) < 0.1 * expected + 5 * np.sqrt(expected) + 5), (name, chosen,
+                                                                                               expected)
+        assert kernel(0.0) == 0.8 and chosen[0] / possible[0] > chosen[-1] / possible[-1]
+    print('Profiles: %i candidate pairs' % len(candidates))
+
+
+if __name__ == '__main__':
+    testSeeds()
+    testDegrees()
+    testDensity()
+    testExcitatoryInhibitory()
+    testNetwork()
+    testSpatial()
+    testProfiles()
@@ -0,0 +1,60 @@
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+
+# Synapses deleted between simulate() calls while their values are still on the way (delay lists of the
+# erwin synapses): the dict engine drops them with the synapse dict, the array engine (numpy and numba
+# backend) has to give the same traces.
+
+izhDict = {'v': -65, 'u': 0, 'a': 0.02, 'b': 0.2, 'c': -65, 'd': 8, 'I': 0}
+
+
+def simulate(kind, engine, backend, deletions):
+    if kind == 'izh':
+        # threshold below rest: every neuron fires every step, there are always values on the way
+        net = enn.Network(models.neuronIzh, izhDict, models.erwinSynapse,
+                          {'w': 0.5, 'threshold': -70, 'I': [0.0] * 40, 'i': 0}, 0.1, engine=engine, backend=backend)
+        var = 'v'
+    else:
+        net = enn.Network(models.HodgkinAndHuxleyNeuron, models.default_Hodgkin_Huxley_neuron_dict,
+                          models.erwinHandHsynapse, {'w': 0.05, 'threshold': 0, 'I': [0.0] * 60, 'i': 0, 'i2': 0,
+                                                     'rp': 50}, 0.01, engine=engine, backend=backend)
+        var = 'Vm'
+    N = 12
+    for i in range(N):
+        net.addNeuron()
+    rng = np.random.RandomState(2)
+    synapses = []
+    for i in range(N):
+        for j in rng.choice(N, 4):
+            if kind == 'izh':
+                synapses.append(net.connect(i, int(j), {'I': [0.0] * int(rng.randint(5, 60))}))
+            else:
+                synapses.append(net.connect(i, int(j)))
+    if kind == 'hh':
+        for i in range(0, N, 3):
+            net.getNeuronByID(i)['Istim'] = 10  # first spikes at 1.88 ms
+    sim = enn.Simulator()
+    nid = sim.addNetwork(net)
+    rec = enn.Recorder(nid, range(N), [var], withTime=True)
+    sim.addRecorder(rec)
+    for (duration, deleted) in deletions:
+        sim.simulate(duration)
+        net.deleteConnections([synapses[k] for k in deleted])
+    sim.simulate(5)
+    return rec[var].array()
+
+
+def testDeletedSynapses():
+    for (kind, deletions) in (('izh', [(0.3, [0, 1, 4, 8]), (1.0, [12, 13])]),
+                              ('hh', [(2.0, [0, 4, 8, 20]), (0.07, [24, 30])])):
+        reference = simulate(kind, 'dict', 'numpy', deletions)
+        for backend in ('numpy', 'numba'):
+            traces = simulate(kind, 'array', backend, deletions)
+            difference = np.nanmax(np.abs(traces - reference))
+            print('%s %s: max |dict - array| = %g' % (kind, backend, difference))
+            assert difference < 1e-9
+
+
+if __name__ == '__main__':
+    testDeletedSynapses()
@@ -0,0 +1,90 @@
+import pickle
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+import Engine.ENN_Connectivity as connectivity
+
+# Neurons deleted through the adjacency index (deleteNeuron, deleteNeurons, pruneUnconnected) give the same
+# network and the same traces as deleting the synapses found by a scan over all synapses first, in both
+# engines. The index stays right after pickling.
+
+synapseDict = {'w': 0.5, 'threshold': 20, 'I': [0.0] * 10, 'i': 0, 'rp': 2, 'i2': 0}
+N = 80
+(sources, destinations) = connectivity.erdosRenyi(N, 0.05, rng=1, selfConnections=True)
+
+
+def build(engine):
+    net = enn.Network(models.HodgkinAndHuxleyNeuron, models.default_Hodgkin_Huxley_neuron_dict,
+                      models.erwinHandHsynapse, synapseDict, 0.01, engine=engine, seed=1)
+    net.addNeurons(N)
+    net.connectMany(sources, destinations, {'w': np.linspace(0.5, 2, len(sources))})
+    noise = net.addNeuron(models.neuronGauss, {'Vm': 0, 'mean': 0, 'mu': 1})
+    net.connect(noise, 3, synapseFun=models.directConnect, synapseDict={})
+    for i in range(0, N, 7):
+        net.getNeuronByID(i)['Istim'] = 14
+    return net
+
+
+def scan(net, id):
+    # Synapses of neuron id, the slow way
+    return sorted(k for k in net.getConnectionIDs()
+                  if net.getConnectionByID(k)['_source'] == id or net.getConnectionByID(k)['_destin'] == id)
+
+
+def indexed(net, id):
+    return sorted(set(net.getOutgoing(id)) | set(net.getIncoming(id)))
+
+
+def state(net):
+    return dict((id, float(net.getNeuronByID(id)['Vm'])) for id in net.getNeuronIDs())
+
+
+def testDeleteNeurons():
+    deleted = [3, 10, 11, 40, 41, 42, 79]
+    for engine in ('dict', 'array'):
+        (scanned, bulk, single) = (build(engine), build(engine), build(engine))
+        for net in (scanned, bulk, single):
+            for step in range(50):
+                net._localStep()
+        assert all(indexed(bulk, id) == scan(bulk, id) for id in bulk.getNeuronIDs())
+        for id in deleted:
+            for k in scan(scanned, id):
+                scanned.deleteConnection(k)
+            scanned.deleteNeuron(id)
+            single.deleteNeuron(id)
+        bulk.deleteNeurons(deleted)
+        unconnected = sorted(id for id in scanned.getNeuronIDs() if not scan(scanned, id))
+        assert unconnected
+        for id in unconnected:
+            scanned.deleteNeuron(id)
+        assert sorted(bulk.pruneUnconnected()) == unconnected and sorted(single.pruneUnconnected()) == unconnected
+        for net in (bulk, single):
+            assert sorted(net.getNeuronIDs()) == sorted(scanned.getNeuronIDs())
+            assert sorted(net.getConnectionIDs()) == sorted(scanned.getConnectionIDs())
+            assert all(indexed(net, id) == scan(net, id) for id in net.getNeuronIDs())
+        for net in (scanned, bulk, single):
+            for step in range(100):
+                net._localStep()
+        assert state(bulk) == state(scanned) and state(single) == state(scanned)
+        try:
+            bulk.deleteNeurons([deleted[0]])
+            assert False
+        except KeyError:
+            pass
+        print('%s: %i neurons, %i synapses left' % (engine, len(bulk.getNeuronIDs()), len(bulk.getConnectionIDs())))
+
+
+def testPickle():
+    for engine in ('dict', 'array'):
+        net = pickle.loads(pickle.dumps(build(engine)))
+        assert all(indexed(net, id) == scan(net, id) for id in net.getNeuronIDs())
+        net.deleteNeuron(5)
+        net.deleteConnections(net.getOutgoing(6))
+        assert net.getOutgoing(6) == [] and 5 not in net.getNeuronIDs()
+        assert all(indexed(net, id) == scan(net, id) for id in net.getNeuronIDs())
+    print('Pickle: ok')
+
+
+if __name__ == '__main__':
+    testDeleteNeurons()
+    testPickle()
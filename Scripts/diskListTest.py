@@ -0,0 +1,114 @@
+import os
+import pickle
+import shutil
+import tempfile
+import numpy as np
+import Engine.DiskList as dl
+
+# A DiskList reads through a numpy memmap: indexing gives the values, slices are views of the file, and
+# len, iteration, chunks, getList and numpy.asarray give the items that were appended, also items appended
+# after the file was mapped and after opening the file again.
+# extend writes whole arrays in one call. New files start with a header with the type of the items, which is
+# used when the file is opened again (also with another type or byte order), files without it are still read.
+
+
+def testRead(directory):
+    file = os.path.join(directory, 'read')
+    values = np.random.RandomState(2).rand(1000)
+    disk = dl.DiskList(file, type=dl.double, buffersize=16, chunker=300)
+    for value in values[:600].tolist():
+        disk.append(value)
+    assert len(disk) == 600 and disk.getitemcount() == 600 and disk.getsizebytes() == 4800
+    assert disk[0] == values[0] and disk[-1] == values[599] and isinstance(disk[5], float)
+    view = disk[100:200]
+    assert isinstance(view, np.memmap) and not view.flags.writeable and np.array_equal(view, values[100:200])
+    assert np.array_equal(disk[[3, 1, 599]], values[[3, 1, 599]]) and np.array_equal(disk[::-7], values[599::-7])
+    for value in values[600:].tolist():
+        disk.append(value)  # Mapped again
+    assert len(disk) == 1000 and disk[999] == values[999] and np.array_equal(np.asarray(disk), values)
+    assert list(disk) == values.tolist() and disk.getList() == values.tolist()
+    chunks = list(disk.chunks())
+    assert [len(chunk) for chunk in chunks] == [300, 300, 300, 100]
+    assert np.array_equal(np.concatenate(chunks), values)
+    assert [len(chunk) for chunk in disk.chunks(400)] == [400, 400, 200]
+    disk.flush()
+    opened = dl.DiskList(file, type=dl.double, readonly=True)
+    assert len(opened) == 1000 and np.array_equal(opened[250:750], values[250:750])
+    copy = pickle.loads(pickle.dumps(opened))
+    assert np.array_equal(np.asarray(copy), values)
+    empty = dl.DiskList(os.path.join(directory, 'empty'), type=dl.double)
+    assert len(empty) == 0 and list(empty) == [] and np.asarray(empty).shape == (0,)
+    # The item size comes from numpy, signed_int says 2 bytes
+    ints = dl.DiskList(os.path.join(directory, 'ints'), type=dl.signed_int)
+    for value in (7, -3, 2 ** 20):
+        ints.append(value)
+    assert ints.getList() == [7, -3, 2 ** 20] and ints.getsizebytes() == 12
+    print('Read: ok')
+
+
+def testExtend(directory):
+    disk = dl.DiskList(os.path.join(directory, 'extend'), type=dl.double)
+    disk.extend(np.arange(6).reshape(2, 3))  # Flattened, converted to doubles
+    disk.extend([6, 7.5])
+    disk.extend(np.zeros(0))
+    disk.append([8, 9])  # Two items
+    disk.append(10)
+    expected = [0, 1, 2, 3, 4, 5, 6, 7.5, 8, 9, 10]
+    assert len(disk) == 11 and disk.getList() == expected and disk[:].dtype == np.float64
+    many = np.random.RandomState(3).rand(10 ** 6)
+    disk.extend(many)
+    disk.flush()
+    assert len(disk) == 11 + 10 ** 6 and np.array_equal(disk[11:], many)
+    assert os.path.getsize(os.path.join(directory, 'extend')) == dl.DiskList.headerSize + 8 * len(disk)
+    print('Extend: ok')
+
+
+def testHeader(directory):
+    file = os.path.join(directory, 'header')
+    disk = dl.DiskList(file, type='>i4')
+    disk.extend([1, -2, 70000])
+    disk.flush()
+    with open(file, 'rb') as f:
+        data = f.read()
+    assert data[:8] == dl.DiskList.magic and data[9:12] == b'>i4' and len(data) == 16 + 12
+    assert data[16:] == np.array([1, -2, 70000], dtype='>i4').tobytes()
+    # The type of the header wins over the type argument
+    for readonly in (True, False):
+        opened = dl.DiskList(file, type=dl.double, readonly=readonly)
+        assert opened.getdtype() == np.dtype('>i4') and opened.getList() == [1, -2, 70000]
+    opened.extend(np.array([3.0, 4.0]))
+    opened.flush()
+    assert dl.DiskList(file, readonly=True).getList() == [1, -2, 70000, 3, 4]
+    overwritten = dl.DiskList(file, type=dl.float, overwrite=True)
+    overwritten.append(0.5)
+    overwritten.flush()
+    assert dl.DiskList(file, readonly=True).getdtype() == np.dtype('f4')
+    assert dl.DiskList(file, readonly=True).getList() == [0.5]
+    # Written by an older version: native items, no header
+    old = os.path.join(directory, 'old')
+    np.array([0.25, 0.5, 0.75]).tofile(old)
+    legacy = dl.DiskList(old, type=dl.double)
+    assert legacy.getList() == [0.25, 0.5, 0.75]
+    legacy.append(1.0)
+    legacy.flush()
+    assert os.path.getsize(old) == 32 and dl.DiskList(old, type=dl.double, readonly=True).getList()[-1] == 1.0
+    # Written by a newer version
+    with open(file, 'r+b') as f:
+        f.seek(len(dl.DiskList.magic))
+        f.write(bytes([dl.DiskList.version + 1]))
+    try:
+        dl.DiskList._readHeader(file)
+        assert False
+    except IOError:
+        pass
+    print('Header: ok')
+
+
+if __name__ == '__main__':
+    directory = tempfile.mkdtemp()
+    try:
+        testRead(directory)
+        testExtend(directory)
+        testHeader(directory)
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,106 @@
+import subprocess
+import sys
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+
+try:
+    import numba
+    backends = ('numpy', 'numba')
+except ImportError:
+    print('Warning: numba not found, only the numpy backend is tested')
+    backends = ('numpy',)
+
+# The array engine (vectorized populations and projections) gives the same traces as the dict engine, for the
+# vectorized models (HodgkinAndHuxleyAxonSynapseSimple with per synapse values) and for a synapse function without
+# a vectorized kernel, also after a neuron is deleted between two simulate() calls. Both backends of the array
+# engine (numpy, numba: ENN_Jit) give these traces, and numba is only imported for the numba backend.
+
+izhDict = {'v': -65, 'u': 0, 'a': 0.02, 'b': 0.2, 'c': -65, 'd': 8, 'I': 0}
+
+
+def plainSynapse(synapseDict, source, dest):
+    # No kernel in ENN_Models.vectorizedSynapses: the array engine calls it per synapse
+    dest['I'] += synapseDict['w'] * max(source['v'] + 60, 0)
+    return [synapseDict, source, dest]
+
+
+def izhikevich(engine, **kwargs):
+    net = enn.Network(models.neuronIzh, izhDict, models.erwinSynapse, {'w': 0.5, 'threshold': 20, 'I': [0.0] * 15,
+                                                                        'i': 0}, 0.1, engine=engine, **kwargs)
+    net.addNeurons(30)
+    rng = np.random.RandomState(1)
+    for i in range(30):
+        for j in rng.choice(30, 4):
+            net.connect(i, int(j))
+        net.connect(i, (i + 1) % 30, {'w': 0.05}, synapseFun=plainSynapse, synapseDict={'w': 0.05})
+    net.setNeurons(range(0, 30, 5), 'a', 0.1)
+    net.setNeurons(range(5), 'I', 10)
+    return (net, 'v')
+
+
+def hodgkinAndHuxley(engine, **kwargs):
+    synapse = {'I': [0.0] * 100, 'i': 0, 'i2': 0, 'rp': 20, 'threshold': 10, 'w': 0.5}
+    net = enn.Network(models.HodgkinAndHuxleyNeuron, models.default_Hodgkin_Huxley_neuron_dict,
+                      models.erwinHandHsynapse, synapse, 0.05, engine=engine, **kwargs)
+    net.addNeurons(30)
+    rng = np.random.RandomState(2)
+    for i in range(30):
+        for j in range(30):
+            if rng.rand() < 0.3:
+                net.connect(i, j)
+    net.setNeurons(range(5), 'Istim', 10)
+    return (net, 'Vm')
+
+
+def hodgkinAndHuxleySynapses(engine, **kwargs):
+    # Sparse projections: per synapse overrides of the delay, weights and transfer function
+    net = enn.Network(models.HodgkinAndHuxleyNeuron, models.default_Hodgkin_Huxley_neuron_dict,
+                      models.HodgkinAndHuxleyAxonSynapseSimple,
+                      models.HodgkinAndHuxleyAxonSynapseSimple_Dictwrapper(we=0.5, sd=0, delay=1), 0.05,
+                      engine=engine, **kwargs)
+    net.addNeurons(30)
+    rng = np.random.RandomState(3)
+    for i in range(30):
+        for j in range(30):
+            if rng.rand() < 0.3:
+                settings = {'delay': 0.5, 'wi': 2.0} if rng.rand() < 0.3 else {}
+                if rng.rand() < 0.1:
+                    settings['VmTurn'] = 20
+                net.connect(i, j, settings)
+    net.setNeurons(range(5), 'Istim', 10)
+    return (net, 'Vm')
+
+
+def simulate(build, engine, **kwargs):
+    (net, var) = build(engine, **kwargs)
+    sim = enn.Simulator()
+    nid = sim.addNetwork(net)
+    rec = enn.Recorder(nid, range(30), [var], withTime=True)
+    sim.addRecorder(rec)
+    sim.simulate(25)
+    net.deleteNeuron(3)
+    sim.simulate(25)
+    return rec[var].array()
+
+
+def testEngines():
+    for build in (izhikevich, hodgkinAndHuxley, hodgkinAndHuxleySynapses):
+        reference = simulate(build, 'dict')
+        for backend in backends:
+            traces = simulate(build, 'array', backend=backend)
+            assert np.array_equal(np.isnan(traces), np.isnan(reference))
+            difference = np.nanmax(np.abs(traces - reference))
+            print('%s, %s: max |dict - array| = %g' % (build.__name__, backend, difference))
+            assert difference < 1e-6  # The synaptic currents are summed in another order
+
+
+def testImports():
+    # A new process: this one imported numba above
+    code = 'import sys, Engine.ENNet; sys.exit("numba" in sys.modules)'
+    assert subprocess.call([sys.executable, '-c', code]) == 0
+
+
+if __name__ == '__main__':
+    testEngines()
+    testImports()
@@ -0,0 +1,104 @@
+import os
+import pickle
+import shutil
+import tempfile
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Equations as equations
+import Engine.ENN_Models as models
+from Engine.ENN_Equations import EquationModel
+
+# Equation models give the same traces as the hand written models in both engines, lazy models compile on first
+# use, the compiled code is cached on disk (and works without a writable cache directory), and a model pickles.
+
+izhDict = {'v': -65, 'u': 0, 'a': 0.02, 'b': 0.2, 'c': -65, 'd': 8, 'I': 0}
+
+
+def simulate(neuronFun, neuronDict, engine, var):
+    if var == 'v':
+        (synapseFun, synapseDict) = (models.erwinSynapse, {'w': 0.5, 'threshold': 0, 'I': [0.0] * 10, 'i': 0})
+    else:
+        (synapseFun, synapseDict) = (models.erwinHandHsynapse, {'w': 0.5, 'threshold': 0, 'I': [0.0] * 10, 'i': 0,
+                                                                'i2': 0, 'rp': 20})
+    net = enn.Network(neuronFun, neuronDict, synapseFun, synapseDict, 0.05, engine=engine)
+    net.addNeurons(10)
+    for i in range(10):
+        net.connect(i, (i + 3) % 10)
+    net.setNeurons(range(3), 'Istim' if var == 'Vm' else 'I', 10)
+    sim = enn.Simulator()
+    nid = sim.addNetwork(net)
+    rec = enn.Recorder(nid, range(10), [var], withTime=True)
+    sim.addRecorder(rec)
+    sim.simulate(30)
+    return rec[var].array()
+
+
+def testModels():
+    for (model, function, neuronDict, var) in ((models.izhikevichModel, models.neuronIzh, izhDict, 'v'),
+                                               (models.hodgkinAndHuxleyModel, models.HodgkinAndHuxleyNeuron,
+                                                models.default_Hodgkin_Huxley_neuron_dict, 'Vm')):
+        reference = simulate(function, neuronDict, 'dict', var)
+        for engine in ('dict', 'array'):
+            difference = np.nanmax(np.abs(simulate(model, neuronDict, engine, var) - reference))
+            print('%s, %s engine: max difference %g' % (model.name, engine, difference))
+            assert difference < 1e-9
+
+
+def leaky(lazy):
+    return EquationModel('dV/dt = (El - V) / tau + I', threshold='V > -50', reset='V = -70', clear=['I'],
+                         defaults={'V': -70, 'El': -65, 'tau': 10, 'I': 0}, name='leakyTest', lazy=lazy)
+
+
+def run(model, steps=400):
+    neuron = dict(model.defaults, dt=0.1, I=0)
+    values = []
+    for _ in range(steps):
+        neuron['I'] = 2.0
+        model(neuron)
+        values.append(neuron['V'])
+    return values
+
+
+def expected(steps=400):
+    (V, values) = (-70.0, [])
+    for _ in range(steps):
+        V = V + 0.1 * ((-65 - V) / 10.0 + 2.0)
+        if V > -50:
+            V = -70
+        values.append(V)
+    return values
+
+
+def testCompile():
+    (directory, previous) = (tempfile.mkdtemp(), equations.cacheDirectory)
+    try:
+        equations.cacheDirectory = os.path.join(directory, 'cache')
+        equations._codeCache.clear()
+        model = leaky(lazy=True)
+        assert not os.path.exists(equations.cacheDirectory)  # Nothing compiled yet
+        assert np.allclose(run(model), expected())
+        assert len(os.listdir(equations.cacheDirectory)) == 1
+        equations._codeCache.clear()
+        assert run(leaky(lazy=False)) == run(model)  # From the disk cache
+        assert run(pickle.loads(pickle.dumps(model))) == run(model)
+        # A file as cache directory: compiled in memory only
+        open(os.path.join(directory, 'file'), 'w').close()
+        equations.cacheDirectory = os.path.join(directory, 'file', 'cache')
+        equations._codeCache.clear()
+        assert run(leaky(lazy=False)) == run(model)
+        try:
+            EquationModel('dv/dt = 1 +', defaults={'v': 0})
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('(EquationModel) an invalid equation was accepted')
+        print('compiled, cached and loaded')
+    finally:
+        equations.cacheDirectory = previous
+        equations._codeCache.clear()
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    testModels()
+    testCompile()
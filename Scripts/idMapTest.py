@@ -0,0 +1,86 @@
+import numpy as np
+import pickle
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+from Engine.ENN_Arrays import IdMap
+
+# An IdMap translates external ids to dense indices and back, also after removing ids (the indices are
+# compacted, the ids stay the same). Integer ids go through a lookup table, other ids (strings, tuples,
+# sparse integers) through the dict: both give the same indices. Networks with such ids give the same
+# traces in both engines.
+
+izhDict = {'v': -65, 'u': 0, 'a': 0.02, 'b': 0.2, 'c': -65, 'd': 8, 'I': 0}
+synapseDict = {'w': 0.5, 'threshold': 0, 'I': [0.0] * 10, 'i': 0}
+
+
+def check(ids):
+    index = IdMap()
+    assert list(index.add(ids)) == list(range(len(ids)))
+    assert all(index[id] == i for (i, id) in enumerate(ids)) and len(index) == len(ids)
+    removed = ids[1::3]
+    keep = index.remove(removed)
+    assert keep.sum() == len(ids) - len(removed) and not keep[1]
+    left = [id for id in ids if id not in removed]
+    assert list(index) == left and all(id not in index for id in removed)
+    query = left[::-1] + left[:2]
+    found = index.indices(query)
+    assert list(found) == [left.index(id) for id in query]
+    assert list(index.externalIds(found)) == query
+    assert list(index.indices(query + [removed[0]], missing=-7))[-1] == -7
+    try:
+        index.indices([removed[0]])
+        assert False
+    except KeyError:
+        pass
+    # After pickling the table is made again
+    copy = pickle.loads(pickle.dumps(index))
+    assert list(copy) == left and list(copy.indices(query)) == list(found)
+    assert list(index.add(removed[:1])) == [len(left)]
+    assert index.indices(removed[:1])[0] == len(left)
+    return index
+
+
+def testIdMap():
+    check(list(range(50)))
+    assert check(list(range(50)))._table is not False
+    check(np.arange(100, 150).tolist())
+    assert check([10 ** 9 + i * 10 ** 6 for i in range(20)])._table is False  # Too sparse for a table
+    check(['n%i' % i for i in range(20)])
+    check([(i, i % 3) for i in range(20)])
+    check([0, 'a', (1, 2), 5, 'b', 7])
+    print('IdMap: ok')
+
+
+def simulate(engine, ids):
+    net = enn.Network(models.neuronIzh, izhDict, models.erwinSynapse, synapseDict, 0.1, engine=engine)
+    net.addNeurons(ids=ids)
+    rng = np.random.RandomState(1)
+    for k in range(60):
+        (s, d) = rng.choice(len(ids), 2)
+        net.connect(ids[s], ids[d], {'w': float(rng.rand())})
+    for id in ids[:4]:
+        net.getNeuronByID(id)['I'] = 10
+    sim = enn.Simulator()
+    nid = sim.addNetwork(net)
+    rec = enn.Recorder(nid, ids, ['v'], withTime=True)
+    sim.addRecorder(rec)
+    sim.simulate(10)
+    net.deleteNeuron(ids[5])
+    rest = [id for id in ids if not id == ids[5]]
+    values = [float(net.getNeuronByID(id)['v']) for id in rest]
+    sim.simulate(10)
+    return (rec['v'].array()[:, :5], values, [float(net.getNeuronByID(id)['v']) for id in rest])
+
+
+def testNetworks():
+    for ids in ([3 * i for i in range(20)], ['n%i' % i for i in range(20)], [(i, 'x') for i in range(20)]):
+        reference = simulate('dict', ids)
+        result = simulate('array', ids)
+        assert np.allclose(result[0], reference[0], atol=1e-9, equal_nan=True)
+        assert np.allclose(result[1:], reference[1:], atol=1e-9)
+    print('Networks: ok')
+
+
+if __name__ == '__main__':
+    testIdMap()
+    testNetworks()
@@ -0,0 +1,66 @@
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+from Engine.ENN_Integrators import IntegratorModel, integrators
+
+# The integrators have their order of accuracy on a small model (a neuron dict of floats and a population state
+# of arrays give the same values), Rush-Larsen solves a gate with constant rates exactly, and every integrator
+# gives the same Hodgkin & Huxley traces in both engines.
+
+# dy/dt = -y, dx/dt = alpha * (1 - x) - beta * x with alpha = 2, beta = 3: y = exp(-t), x = 0.4 - 0.4 * exp(-5 t)
+decay = IntegratorModel(('y', 'x'), lambda d, v: ([-v[0], 2 * (1 - v[1]) - 3 * v[1]], {}),
+                        gates={'x': lambda d, v: (2.0, 3.0)})
+
+
+def integrate(name, dt, d):
+    for _ in range(int(round(1.0 / dt))):
+        integrators[name](decay, d, dt)
+    return d
+
+
+def testOrder():
+    for (name, order) in (('euler', 1), ('rk2', 2), ('rk4', 4)):
+        errors = [abs(integrate(name, dt, {'y': 1.0, 'x': 0.0})['y'] - np.exp(-1)) for dt in (0.02, 0.01)]
+        assert abs(np.log2(errors[0] / errors[1]) - order) < 0.2
+        arrays = integrate(name, 0.02, {'y': np.ones(3), 'x': np.zeros(3)})
+        assert np.all(arrays['y'] == integrate(name, 0.02, {'y': 1.0, 'x': 0.0})['y'])
+        print('%s: error %g at dt 0.01, order %.2f' % (name, errors[1], np.log2(errors[0] / errors[1])))
+    gate = integrate('rushlarsen', 0.25, {'y': 1.0, 'x': 0.0})['x']
+    assert abs(gate - (0.4 - 0.4 * np.exp(-5))) < 1e-12
+
+
+def simulate(engine, integrator, dt):
+    net = enn.Network(models.HodgkinAndHuxleyNeuron, models.default_Hodgkin_Huxley_neuron_dict,
+                      models.HodgkinAndHuxleyAxonSynapseSimple,
+                      models.HodgkinAndHuxleyAxonSynapseSimple_Dictwrapper(we=0.5, sd=0), dt, engine=engine,
+                      integrator=integrator)
+    net.addNeurons(3)
+    net.connect(0, 1)
+    net.connect(1, 2)
+    net.setNeurons([0], 'Istim', 10)
+    sim = enn.Simulator()
+    nid = sim.addNetwork(net)
+    rec = enn.Recorder(nid, range(3), ['Vm'], withTime=True)
+    sim.addRecorder(rec)
+    sim.simulate(50)
+    traces = rec['Vm'].array()
+    spikes = np.nonzero((traces[1:, 0] > 0) & (traces[:-1, 0] <= 0))[0] + 1
+    return (traces, np.asarray(rec.timeline)[spikes])
+
+
+def testNetworks():
+    (_, reference) = simulate('array', 'rk4', 0.001)
+    errors = {}
+    for integrator in ('euler', 'rk2', 'rk4', 'rushlarsen'):
+        (traces, spikes) = simulate('dict', integrator, 0.02)
+        assert np.nanmax(np.abs(traces - simulate('array', integrator, 0.02)[0])) < 1e-9
+        assert len(spikes) == len(reference)
+        errors[integrator] = np.abs(spikes - reference).max()
+        print('%s: engines agree, spike time error %.3f ms at dt 0.02' % (integrator, errors[integrator]))
+    assert errors['rk4'] < 0.05 and errors['rk2'] < 0.05
+    assert errors['rushlarsen'] < errors['euler'] < 1
+
+
+if __name__ == '__main__':
+    testOrder()
+    testNetworks()
@@ -33,8 +33,9 @@ if __name__ == '__main__':
 
     id = simulator.addNetwork(network)
 
-    # Add recorder
-    rec = enn.Recorder(id, network.getNeuronIDs(),variables=['Vm', 'I'], withTime=True, diskMode=True, toDiskDir='TestDir', overwrite=True)
+    # Add recorder, the mean of every ms is enough for the analysis and the video (1/20 of the data)
+    rec = enn.Recorder(id, network.getNeuronIDs(),variables=['Vm', 'I'], withTime=True, diskMode=True, toDiskDir='TestDir', overwrite=True,
+                       every=int(round(1 / dt)), mode='mean')
 
     recID = simulator.addRecorder(rec)
 
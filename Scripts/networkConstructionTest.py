@@ -0,0 +1,76 @@
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+
+# Networks built from edge arrays (fromEdges, connectMany) or an adjacency matrix (fromMatrix) are the same as
+# networks built with connect() one synapse at a time, in both engines. Duplicate entries of a sparse matrix are
+# summed into one synapse.
+
+izhDict = {'v': -65, 'u': 0, 'a': 0.02, 'b': 0.2, 'c': -65, 'd': 8, 'I': 0}
+synapseDict = {'w': 0.5, 'threshold': 0, 'I': [0.0] * 10, 'i': 0}
+
+
+def synapses(net):
+    # (id, source, destination, w) of every synapse
+    return sorted((id, int(s['_source']), int(s['_destin']), float(s['w']))
+                  for (id, s) in ((id, net.getConnectionByID(id)) for id in net.getConnectionIDs()))
+
+
+def traces(net):
+    net.setNeurons(range(5), 'I', 10)
+    sim = enn.Simulator()
+    nid = sim.addNetwork(net)
+    rec = enn.Recorder(nid, net.getNeuronIDs(), ['v'], withTime=True)
+    sim.addRecorder(rec)
+    sim.simulate(20)
+    return rec['v'].array()
+
+
+def testEdges():
+    rng = np.random.RandomState(5)
+    (sources, destinations) = (rng.randint(0, 40, 200), rng.randint(0, 40, 200))
+    weights = rng.rand(200)
+    for engine in ('dict', 'array'):
+        loop = enn.Network(models.neuronIzh, izhDict, models.erwinSynapse, synapseDict, 0.1, engine=engine)
+        loop.addNeurons(42)
+        for (s, d, w) in zip(sources.tolist(), destinations.tolist(), weights.tolist()):
+            loop.connect(s, d, {'w': w})
+        edges = enn.Network.fromEdges(sources, destinations, models.neuronIzh, izhDict, models.erwinSynapse,
+                                      synapseDict, 0.1, settings={'w': weights}, neurons=42, engine=engine)
+        assert synapses(edges) == synapses(loop) and len(edges.getNeuronIDs()) == 42
+        assert np.array_equal(traces(edges), traces(loop))
+        print('%s: %i synapses' % (engine, len(synapses(edges))))
+
+
+def testMatrix():
+    dense = np.zeros((6, 6))
+    (dense[0, 1], dense[2, 1], dense[5, 0], dense[3, 3]) = (1.0, 2.0, 0.5, 1.5)
+    expected = [(0, 0, 1, 1.0), (1, 2, 1, 2.0), (2, 3, 3, 1.5), (3, 5, 0, 0.5)]  # Row major
+    for engine in ('dict', 'array'):
+        net = enn.Network.fromMatrix(dense, models.neuronIzh, izhDict, models.erwinSynapse, synapseDict, 0.1,
+                                     engine=engine)
+        assert synapses(net) == expected
+        try:
+            import scipy.sparse
+        except ImportError:
+            print('Warning: scipy not found, sparse matrices are not tested')
+            continue
+        # (2, 1) twice, (4, 4) sums to 0: no synapse
+        coo = scipy.sparse.coo_matrix(([1.0, 0.5, 1.5, 0.5, 1.5, 2.0, -2.0],
+                                       ([0, 5, 3, 2, 2, 4, 4], [1, 0, 3, 1, 1, 4, 4])), shape=(6, 6))
+        net = enn.Network.fromMatrix(coo, models.neuronIzh, izhDict, models.erwinSynapse, synapseDict, 0.1,
+                                     engine=engine)
+        assert synapses(net) == expected and coo.nnz == 7  # The argument is not changed
+        try:
+            enn.Network.fromMatrix(np.zeros((2, 3)), models.neuronIzh, izhDict, models.erwinSynapse, synapseDict,
+                                   0.1, engine=engine)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('(Network) a non square matrix was accepted')
+    print('matrix: %s' % expected)
+
+
+if __name__ == '__main__':
+    testEdges()
+    testMatrix()
@@ -0,0 +1,68 @@
+import pickle
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+from Engine.ENN_Noise import NoiseSource
+
+# Seeded noise is reproducible: a NoiseSource gives the numbers of its numpy Generator stream in order (scalars and
+# blocks mixed, also after pickling), and a seeded network gives the same noisy traces in every run, serial or in
+# a Pool. Networks of one seeded Simulator get different streams.
+
+
+def testStream():
+    source = NoiseSource(7, blockSize=64)
+    generator = np.random.Generator(np.random.PCG64(np.random.SeedSequence(7)))
+    expected = generator.standard_normal(64 * 10)
+    drawn = []
+    for k in range(60):
+        if k % 3:
+            drawn.append(source.normal(1.0, 2.0))
+        else:
+            drawn.extend(source.normal(1.0, 2.0, size=(2, 3)).ravel())
+    assert np.allclose(drawn, 1.0 + 2.0 * expected[:len(drawn)], rtol=0, atol=1e-12)
+    copy = pickle.loads(pickle.dumps(source))
+    assert [source.normal(0, 1) for _ in range(100)] == [copy.normal(0, 1) for _ in range(100)]
+    source.seed(7)
+    assert source.standardNormal() == expected[0]
+    print('stream: %i values' % len(drawn))
+
+
+def network(engine, seed=None):
+    net = enn.Network(models.HodgkinAndHuxleyNeuron, models.default_Hodgkin_Huxley_neuron_dict,
+                      models.HodgkinAndHuxleyAxonSynapseSimple,
+                      models.HodgkinAndHuxleyAxonSynapseSimple_Dictwrapper(we=0.5, sd=0.4), 0.05, engine=engine,
+                      seed=seed)
+    net.addNeurons(10)
+    gauss = net.addNeuron(models.neuronGauss, {'mean': 5, 'mu': 5, 'Vm': 0, 'I': 0})
+    for i in range(10):
+        net.connect(gauss, i)
+        net.connect(i, (i + 1) % 10)
+    return net
+
+
+def simulate(engine, seeds, simulatorSeed=None, poolSize=None):
+    sim = enn.Simulator(seed=simulatorSeed)
+    recorders = []
+    for seed in seeds:
+        nid = sim.addNetwork(network(engine, seed))
+        recorders.append(enn.Recorder(nid, range(11), ['Vm'], withTime=True))
+        sim.addRecorder(recorders[-1])
+    sim.simulate(10, poolSize=poolSize)
+    return [sim.getRecorder(recorder.id)['Vm'].array() for recorder in recorders]
+
+
+def testNetworks():
+    for engine in ('dict', 'array'):
+        [first] = simulate(engine, [3])
+        assert np.array_equal(first, simulate(engine, [3])[0])
+        assert not np.array_equal(first, simulate(engine, [4])[0])
+        serial = simulate(engine, [None, None], simulatorSeed=42)
+        pooled = simulate(engine, [None, None], simulatorSeed=42, poolSize=2)
+        assert all(np.array_equal(a, b) for (a, b) in zip(serial, pooled))
+        assert not np.array_equal(serial[0], serial[1])
+        print('%s: seeded runs equal, serial == pool' % engine)
+
+
+if __name__ == '__main__':
+    testStream()
+    testNetworks()
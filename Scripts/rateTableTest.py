@@ -0,0 +1,54 @@
+import copy
+import pickle
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+
+# The tabulated alpha / beta rates stay within the error bound of the table (scalars and arrays, also outside the
+# grid), the table is shared (one per setting, also after pickling), and networks with the table give nearly the
+# same Hodgkin & Huxley traces as with the analytic rates, the same in both engines.
+
+
+def testRates():
+    table = models.getRateTable()
+    assert table is models.getRateTable() and pickle.loads(pickle.dumps(table)) is table
+    assert copy.deepcopy(table) is table
+    V = np.linspace(-150, 200, 20001)  # Also outside the grid (-100 .. 150)
+    exact = models._safeRates(V)
+    tabulated = np.array(table.rates(V))
+    assert (np.abs(tabulated - exact) / (1 + np.abs(exact))).max() <= table.error * (1 + 1e-9)
+    for v in (10.0, 25.0, 10.000001, -120.0, 3.3):  # singular points of alpha_n / alpha_m, outside, inside
+        assert np.allclose(table.rates(v), models._safeRates(v), rtol=1e-5, atol=1e-6)
+    print('step %g mV, error %.2g' % (table.step, table.error))
+
+
+def simulate(engine, integrator, rateTable):
+    net = enn.Network(models.HodgkinAndHuxleyNeuron, models.default_Hodgkin_Huxley_neuron_dict,
+                      models.HodgkinAndHuxleyAxonSynapseSimple,
+                      models.HodgkinAndHuxleyAxonSynapseSimple_Dictwrapper(we=0.5, sd=0), 0.01, engine=engine,
+                      integrator=integrator, rateTable=rateTable)
+    net.addNeurons(3)
+    net.connect(0, 1)
+    net.connect(1, 2)
+    net.setNeurons([0], 'Istim', 10)
+    sim = enn.Simulator()
+    nid = sim.addNetwork(net)
+    rec = enn.Recorder(nid, range(3), ['Vm'], withTime=True)
+    sim.addRecorder(rec)
+    sim.simulate(50)
+    return rec['Vm'].array()
+
+
+def testNetworks():
+    for integrator in ('euler', 'rk4', 'rushlarsen'):
+        exact = simulate('dict', integrator, None)
+        tabulated = simulate('dict', integrator, True)
+        assert np.nanmax(np.abs(tabulated - simulate('array', integrator, True))) < 1e-9
+        difference = np.nanmax(np.abs(tabulated - exact))
+        print('%s: max |table - analytic| = %.2g mV' % (integrator, difference))
+        assert difference < 1e-2
+
+
+if __name__ == '__main__':
+    testRates()
+    testNetworks()
@@ -0,0 +1,95 @@
+import os
+import pickle
+import shutil
+import tempfile
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+
+# An in memory Recorder stores every variable in one preallocated array (steps, recorded neurons). The values
+# are the ones the network had after each step, nan for the steps in which a neuron did not exist, in both
+# engines. Recorder.save / load and saveToXML give the same values back.
+
+izhDict = {'v': -65, 'u': 0, 'a': 0.02, 'b': 0.2, 'c': -65, 'd': 8, 'I': 0}
+synapseDict = {'w': 2.0, 'threshold': 0, 'I': [0.0] * 10, 'i': 0}
+
+
+def testTraces():
+    traces = enn.Traces(['a', 7, (1, 2)], chunk=4)
+    rows = [np.array([i, -i, 0.5 * i]) for i in range(11)]
+    traces.reserve(3)
+    assert len(traces._data) == 4
+    for row in rows:
+        traces.append(row)
+    assert len(traces._data) > 11 and traces.array().shape == (11, 3)  # Grown by doubling
+    assert np.array_equal(traces.array(), rows) and np.array_equal(traces[7], [-i for i in range(11)])
+    assert traces.keys() == ['a', 7, (1, 2)] and (1, 2) in traces and len(traces) == 3
+    copy = pickle.loads(pickle.dumps(traces))
+    assert len(copy._data) == 11 and np.array_equal(copy.array(), traces.array())  # No spare rows
+    copy.append(np.array([1.0, 2.0, 3.0]))
+    assert copy.array().shape == (12, 3) and traces.array().shape == (11, 3)
+    # Values that are not numbers
+    traces.append(np.array(['x', 1, None], dtype=object))
+    assert traces.array().dtype == object and traces['a'][-1] == 'x' and traces['a'][3] == 3
+    print('Traces: ok')
+
+
+def simulate(engine):
+    net = enn.Network(models.neuronIzh, izhDict, models.erwinSynapse, synapseDict, 0.1, engine=engine)
+    net.addNeurons(6)
+    for i in range(5):
+        net.connect(i, i + 1)
+    sim = enn.Simulator()
+    nid = sim.addNetwork(net)
+    recorder = enn.Recorder(nid, [0, 2, 5, 9, 3], ['v', 'u'], withTime=True)
+    sim.addRecorder(recorder)
+    expected = {'v': [], 'u': []}
+
+    def run(steps):
+        for step in range(steps):
+            sim.simulate(0.1)
+            for var in ('v', 'u'):
+                expected[var].append([float(net.getNeuronByID(id)[var]) if id in net.getNeuronIDs() else np.nan
+                                      for id in (0, 2, 5, 9, 3)])
+    run(30)
+    net.addNeuron(id=9)
+    net.connect(5, 9)
+    run(20)
+    net.deleteNeuron(2)
+    run(40)
+    sim.simulate(3)  # One run, preallocated
+    for var in ('v', 'u'):
+        array = recorder[var].array()
+        assert array.shape == (120, 5) and len(recorder.timeline) == 120
+        assert np.array_equal(array[:90], expected[var], equal_nan=True)
+        assert np.isnan(array[:30, 3]).all() and not np.isnan(array[30:, 3]).any()
+        assert np.isnan(array[50:, 1]).all() and not np.isnan(array[:50, 1]).any()
+        assert np.array_equal(recorder[var][9], array[:, 3], equal_nan=True)
+    return recorder
+
+
+def testRecorder():
+    directory = tempfile.mkdtemp()
+    try:
+        recorders = [simulate(engine) for engine in ('dict', 'array')]
+        assert np.allclose(recorders[0]['v'].array(), recorders[1]['v'].array(), atol=1e-9, equal_nan=True)
+        file = os.path.join(directory, 'recorder')
+        recorders[1].save(file)
+        loaded = enn.Recorder.load(file)
+        assert loaded.timeline == recorders[1].timeline
+        for var in ('v', 'u'):
+            assert np.array_equal(loaded[var].array(), recorders[1][var].array(), equal_nan=True)
+            assert loaded[var].keys() == [0, 2, 5, 9, 3]
+        recorders[1].saveToXML(file)
+        with open(file + '_v.txt') as f:
+            lines = f.read().split()
+        assert len(lines) == 5 and lines[3].split(',')[0] == '9'
+        assert np.allclose([float(x) for x in lines[3].split(',')[1:]], recorders[1]['v'][9], equal_nan=True)
+    finally:
+        shutil.rmtree(directory)
+    print('Recorder: ok')
+
+
+if __name__ == '__main__':
+    testTraces()
+    testRecorder()
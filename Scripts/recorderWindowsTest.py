@@ -0,0 +1,37 @@
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+
+# Recorder windows that overlap or touch store every step once: the same timeline and values as one window
+# over their union, and the timeline lines up with the stored rows.
+
+
+def record(windows, every, mode):
+    net = enn.Network(models.HodgkinAndHuxleyNeuron, models.default_Hodgkin_Huxley_neuron_dict,
+                      models.HodgkinAndHuxleyAxonSynapseSimple,
+                      models.HodgkinAndHuxleyAxonSynapseSimple_Dictwrapper(we=0.5, sd=0), 0.05, engine='array')
+    net.addNeurons(5)
+    for i in range(4):
+        net.connect(i, i + 1)
+    net.setNeurons([0], 'Istim', 10)
+    sim = enn.Simulator()
+    nid = sim.addNetwork(net)
+    rec = enn.Recorder(nid, range(5), ['Vm'], withTime=True, every=every, windows=windows, mode=mode)
+    sim.addRecorder(rec)
+    sim.simulate(30)
+    sim.simulate(30)
+    return rec
+
+
+def testOverlappingWindows():
+    for (every, mode) in ((1, 'point'), (3, 'mean'), (4, 'highest')):
+        overlapping = record([(10, 30), (20, 40), (40, 45), (25, 28)], every, mode)
+        union = record([(10, 45)], every, mode)
+        assert len(overlapping.timeline) == len(overlapping['Vm'].array())
+        assert overlapping.timeline == union.timeline
+        assert np.array_equal(overlapping['Vm'].array(), union['Vm'].array(), equal_nan=True)
+        print('every %i, %s: %i steps stored' % (every, mode, len(overlapping.timeline)))
+
+
+if __name__ == '__main__':
+    testOverlappingWindows()
@@ -1,6 +1,7 @@
 #python 3.x (pylab needed)
 import Engine.ENNet as enn
 import Engine.ENN_Models as models
+import Engine.ENN_Connectivity as connectivity
 import numpy as np
 import pickle
 import networkx as nx
@@ -19,49 +20,25 @@ dt=0.05
 net = enn.Network(neuronFun=models.HodgkinAndHuxleyNeuron,
                   neuronDict=models.default_Hodgkin_Huxley_neuron_dict,
                   synapseFun=models.HodgkinAndHuxleyAxonSynapseSimple,
-                  synapseDict=models.HodgkinAndHuxleyAxonSynapseSimple_Dictwrapper(dt, delay=syndelay),
+                  synapseDict=models.HodgkinAndHuxleyAxonSynapseSimple_Dictwrapper(dt, delay=syndelay, sd=synapseNoiseSd),
                   dt=dt, verbose=True, etaInterval=10)
 
-# Add neurons
-ext = int(np.floor(float(N) * (float(percentageExt)/100.0)))
-ihb = int(N-ext)
-extid = []
-ihbid = []
-for _ in range(0, ext):
-    extid.append(net.addNeuron())
-
-for __ in range(0, ihb):
-    ihbid.append(net.addNeuron())
-
-chance = float(avgConnPerNeuron) / float(N)
-for i in extid:
-    for j in net.getNeuronIDs():
-        if np.random.rand() <= chance:
-            net.connect(i,j,
-                        settingsDict={
-                            'we':np.abs(np.random.normal(avgWeight, sdWeight)),
-                            'sd':synapseNoiseSd
-                        }
-                        )
-
-for i in ihbid:
-    for j in net.getNeuronIDs():
-        if np.random.rand() <= chance:
-            net.connect(i,j,
-                        settingsDict={
-                            'wi':np.abs(np.random.normal(avgWeight, sdWeight)),
-                            'sd':synapseNoiseSd
-                        }
-                        )
+# Add neurons and wire them: the first 70% is excitatory, the rest inhibitory
+(sources, destinations, weights, excitatory) = connectivity.excitatoryInhibitory(
+    N, float(avgConnPerNeuron) / float(N), float(percentageExt) / 100.0,
+    excitatoryWeight=lambda rng, size: np.abs(rng.normal(avgWeight, sdWeight, size)),
+    inhibitoryWeight=lambda rng, size: np.abs(rng.normal(avgWeight, sdWeight, size)),
+    selfConnections=True)
+net.addNeurons(N)
+net.connectMany(sources, destinations,
+                settings={
+                    'we': np.where(excitatory, weights, 0),
+                    'wi': np.where(excitatory, 0, weights)
+                }
+                )
 
 # Remove all not-connected neurons
-neurons = net.getNeuronIDs()
-for synid in net.getConnectionIDs():
-    conn = net.getConnectionByID(synid)
-    neurons = [x for x in neurons if x != conn['_destin'] and x != conn['_source']]
-
-for i in neurons:
-    net.deleteNeuron(i)
+neurons = net.pruneUnconnected()
 print('Neurons: %i' % (N-len(neurons)))
 print('Connection: %i' % (len(net._synapses)))
 
@@ -97,13 +74,13 @@ nx.draw_networkx(G)
 pl.figure(2)
 for i in rec['Vm'].keys():
     try:
-        pl.plot(net._timeline, rec['Vm'][i].getList())
+        pl.plot(rec.timeline, rec['Vm'][i])
     except:
         pass
 
 #pl.figure(3)
 #for i in rec['Vm'].keys():
-#    pl.plot(net._timeline, rec['I'][i].getList())
+#    pl.plot(rec.timeline, rec['I'][i])
 
 pl.show()
 
@@ -0,0 +1,70 @@
+import copy
+import pickle
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+
+# Model parameters are stored once per template (dict engine: SharedDict, array engine: broadcast columns) but
+# behave like a copy per element: writing a value changes one element, lists the models change are not shared,
+# a changed template is used by the elements made after the change, and a pickled or copied network continues
+# the same way.
+
+izhDict = {'v': -65, 'u': 0, 'a': 0.02, 'b': 0.2, 'c': -65, 'd': 8, 'I': 0}
+synapseDict = {'w': 5.0, 'threshold': 29, 'I': [0.0] * 20, 'i': 0}
+
+
+def build(engine):
+    template = dict(izhDict)
+    net = enn.Network(models.neuronIzh, template, models.erwinSynapse, synapseDict, 0.1, engine=engine, seed=1)
+    net.addNeurons(5)
+    net.addNeuron(settingsDict={'d': 2})
+    template['b'] = 0.25  # Used by the neurons added from now on
+    net.addNeuron()
+    net.getNeuronByID(0)['a'] = 0.1
+    net.setNeurons([1, 2], 'I', 10)
+    for i in range(7):
+        net.connect(i, (i + 1) % 7)
+    return net
+
+
+def values(net, key):
+    return [float(net.getNeuronByID(i)[key]) for i in range(7)]
+
+
+def testCopyOnWrite():
+    for engine in ('dict', 'array'):
+        net = build(engine)
+        assert values(net, 'a') == [0.1] + [0.02] * 6
+        assert values(net, 'd') == [8] * 5 + [2, 8]
+        assert values(net, 'b') == [0.2] * 6 + [0.25]
+        if engine == 'dict':
+            # Every synapse has its own delay list (the array engine kernel does not use it, see _ColumnStore)
+            net.getConnectionByID(0)['I'][3] = 1.0
+            assert net.getConnectionByID(1)['I'][3] == 0.0
+            net.getConnectionByID(0)['I'][3] = 0.0
+        for _ in range(50):
+            net._localStep()
+        copies = (pickle.loads(pickle.dumps(net)), copy.deepcopy(net))
+        for _ in range(50):
+            for other in (net,) + copies:
+                other._localStep()
+        assert all(values(other, 'v') == values(net, 'v') for other in copies)
+        print('%s: v %s' % (engine, np.round(values(net, 'v'), 2)))
+    assert np.allclose(values(build('dict'), 'v'), values(build('array'), 'v'))
+
+
+def testSharedStorage():
+    net = build('dict')
+    neuron = net.getNeuronByID(3)
+    assert isinstance(neuron, enn.SharedDict) and neuron.shared is net.getNeuronByID(4).shared
+    assert 'a' in neuron and neuron == dict(neuron) and dict(neuron)['a'] == 0.02
+    net._localStep()
+    assert 'a' not in pickle.loads(pickle.dumps(neuron))._own()
+    population = list(build('array')._populations.values())[0]
+    # a was written for one neuron: a column of its own, c is still one broadcast value
+    assert population.state['a'].flags.writeable and not population.state['c'].flags.writeable
+
+
+if __name__ == '__main__':
+    testCopyOnWrite()
+    testSharedStorage()
@@ -0,0 +1,70 @@
+import shutil
+import tempfile
+import warnings
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+
+# A recorded neuron that was deleted before the run (or never existed) has a column of nan: it has an empty
+# spike train, in memory and disk mode, and the other neurons have the same trains as without it.
+
+
+def record(neuronIds, diskMode, directory):
+    net = enn.Network(models.HodgkinAndHuxleyNeuron, models.default_Hodgkin_Huxley_neuron_dict,
+                      models.HodgkinAndHuxleyAxonSynapseSimple,
+                      models.HodgkinAndHuxleyAxonSynapseSimple_Dictwrapper(we=0.5, sd=0), 0.05, engine='array')
+    net.addNeurons(5)
+    for i in range(3):
+        net.connect(i, i + 1)
+    net.setNeurons([0], 'Istim', 10)
+    net.deleteNeuron(4)
+    sim = enn.Simulator()
+    nid = sim.addNetwork(net)
+    rec = enn.Recorder(nid, neuronIds, ['Vm'], withTime=True, diskMode=diskMode, toDiskDir=directory,
+                       overwrite=True)
+    sim.addRecorder(rec)
+    sim.simulate(50)
+    return rec
+
+
+def testMissingNeurons():
+    directory = tempfile.mkdtemp()
+    try:
+        for diskMode in (False, True):
+            reference = record([0, 1, 2, 3], diskMode, directory + '/reference').getSpikeEventtimes(minDist=20)
+            rec = record([0, 1, 4, 2, 3, 9], diskMode, directory + '/missing')
+            for neurons in (None, [0, 1, 2, 3], [4, 9, 2]):
+                trains = rec.getSpikeEventtimes(neurons=neurons, minDist=20)
+                assert len(trains[2]) > 0
+                for nId in trains:
+                    expected = reference[nId] if nId in reference else []
+                    assert np.array_equal(trains[nId], expected)
+            print('diskMode %s: %s' % (diskMode, rec.getSpikeEventtimes(minDist=20).counts()))
+    finally:
+        shutil.rmtree(directory)
+
+
+def testAsyncArgument():
+    # async (a keyword since Python 3.7) is the deprecated name of parallel
+    directory = tempfile.mkdtemp()
+    try:
+        rec = record([0, 1, 2, 3], False, directory)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            trains = rec.getSpikeEventtimes(minDist=20, **{'async': True})
+        assert [warning.category for warning in caught] == [DeprecationWarning]
+        assert trains.toDict().keys() == rec.getSpikeEventtimes(minDist=20).toDict().keys()
+        assert all(np.array_equal(trains[nId], rec.getSpikeEventtimes(minDist=20)[nId]) for nId in trains)
+        try:
+            rec.getSpikeEventtimes(asynch=True)
+        except TypeError:
+            pass
+        else:
+            raise AssertionError('(Recorder) an unknown argument was accepted')
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    testMissingNeurons()
+    testAsyncArgument()
@@ -0,0 +1,58 @@
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+
+# A SpikeMonitor gives the same spike times as the spikes found in the recorded traces, also when the simulator
+# runs other networks with another time step, and it refuses a network whose time step changed.
+
+
+def network(dt):
+    net = enn.Network(models.HodgkinAndHuxleyNeuron, models.default_Hodgkin_Huxley_neuron_dict,
+                      models.HodgkinAndHuxleyAxonSynapseSimple,
+                      models.HodgkinAndHuxleyAxonSynapseSimple_Dictwrapper(we=0.5, sd=0), dt, engine='array')
+    net.addNeurons(3)
+    net.connect(0, 1)
+    net.connect(1, 2)
+    net.setNeurons([0], 'Istim', 10)
+    return net
+
+
+def simulate(dts):
+    sim = enn.Simulator()
+    (monitors, recorders) = ([], [])
+    for dt in dts:
+        nid = sim.addNetwork(network(dt))
+        monitors.append(enn.SpikeMonitor(nid, range(3), threshold=0))
+        recorders.append(enn.Recorder(nid, range(3), ['Vm'], withTime=True))
+        sim.addRecorder(monitors[-1])
+        sim.addRecorder(recorders[-1])
+    sim.simulate(20)
+    sim.simulate(20)
+    return (sim, monitors, recorders)
+
+
+def testTimeSteps():
+    (_, [alone], _) = simulate([0.01])
+    (sim, monitors, recorders) = simulate([0.01, 0.05])
+    for (monitor, recorder) in zip(monitors, recorders):
+        traces = recorder['Vm'].array()
+        for (column, nid) in enumerate(range(3)):
+            # Upward crossings of 0 mV in the recorded trace
+            crossings = np.nonzero((traces[1:, column] > 0) & (traces[:-1, column] <= 0))[0] + 1
+            assert np.allclose(monitor.spikeTimes()[nid], np.asarray(recorder.timeline)[crossings])
+        assert recorder['dt'] == monitor['dt']
+    assert np.array_equal(monitors[0].spikes()[1], alone.spikes()[1])
+    assert len(monitors[0]) > 0
+    print('spikes %s, first %s' % ([len(monitor) for monitor in monitors], monitors[0].spikes()[1][:3]))
+
+    sim._networks[1]._dt = 0.02
+    try:
+        sim.simulate(5)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('(SpikeMonitor) a changed time step was not detected')
+
+
+if __name__ == '__main__':
+    testTimeSteps()
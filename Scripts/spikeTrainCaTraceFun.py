@@ -25,9 +25,9 @@ def spiketraintrace(nspikes, frequency, pulsewidth, current, trace_dt=10.0, net_
     # Add to simulator
     netid = sim.addNetwork(net)
 
-    # attach recorder
-    rec = enn.Recorder(netid, [nid], ['Vm', 'Istim'], withTime=True)
-    sim.addRecorder(rec)
+    # attach spike monitor, only the spike times are needed
+    monitor = enn.SpikeMonitor(netid, [nid], 'Vm', threshold=0.0)
+    sim.addRecorder(monitor)
 
     # simulate 100 ms of no activity to ensure rest potential
     sim.simulate(padding)
@@ -46,7 +46,7 @@ def spiketraintrace(nspikes, frequency, pulsewidth, current, trace_dt=10.0, net_
 
     # Convert data to ca2+ trace
 
-    spikeEvents = rec.getSpikeEventtimes()
+    spikeEvents = monitor.spikeTimes()
 
     tauOn = 10
     ampFast = 8
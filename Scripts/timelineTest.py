@@ -0,0 +1,93 @@
+import os
+import pickle
+import shutil
+import tempfile
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+
+# A Timeline keeps run segments (first step, count, dt) but behaves like the list of times: len, indexing,
+# slicing, iteration, numpy.asarray and ==. Runs of the same network that follow each other are one segment.
+# The time of a step is step * dt, so many short runs end at the same time as one long run, and a disk mode
+# recorder opened again has the same timeline.
+
+izhDict = {'v': -65, 'u': 0, 'a': 0.02, 'b': 0.2, 'c': -65, 'd': 8, 'I': 0}
+synapseDict = {'w': 0.5, 'threshold': 0, 'I': [0.0] * 10, 'i': 0}
+
+
+def times(segments):
+    return [step * dt for (start, count, dt) in segments for step in range(start, start + count)]
+
+
+def testList():
+    segments = [(1, 5, 0.1), (6, 3, 0.1), (20, 4, 0.25), (0, 0, 0.5), (3, 2, 0.5)]
+    timeline = enn.Timeline(segments)
+    expected = times(segments)
+    assert timeline.segments == [(1, 8, 0.1), (20, 4, 0.25), (3, 2, 0.5)]  # The first two are one run
+    assert len(timeline) == len(expected) and list(timeline) == expected and timeline == expected
+    assert [timeline[i] for i in range(-len(expected), len(expected))] == expected + expected
+    assert list(timeline[2:11:3]) == expected[2:11:3] and list(timeline[::-1]) == expected[::-1]
+    assert np.array_equal(np.asarray(timeline), expected) and timeline.getList() == expected
+    assert np.array_equal(timeline.steps(), [1, 2, 3, 4, 5, 6, 7, 8, 20, 21, 22, 23, 3, 4])
+    for index in (len(expected), -len(expected) - 1):
+        try:
+            timeline[index]
+            assert False
+        except IndexError:
+            pass
+    timeline.append(5, 2, 0.5)
+    timeline.append(9, 0, 0.5)  # Nothing
+    assert timeline.segments[-1] == (3, 4, 0.5) and timeline == expected + [2.5, 3.0]
+    assert pickle.loads(pickle.dumps(timeline)) == timeline
+    assert enn.Timeline() == [] and len(np.asarray(enn.Timeline())) == 0
+    print('List: %i times in %i segments' % (len(timeline), len(timeline.segments)))
+
+
+def network():
+    net = enn.Network(models.neuronIzh, izhDict, models.erwinSynapse, synapseDict, 0.1)
+    net.addNeurons(3)
+    return net
+
+
+def testRuns():
+    (short, long) = (network(), network())
+    (a, b) = (enn.Simulator(), enn.Simulator())
+    recorders = (enn.Recorder(a.addNetwork(short), range(3), ['v'], withTime=True),
+                 enn.Recorder(b.addNetwork(long), range(3), ['v'], withTime=True))
+    a.addRecorder(recorders[0])
+    b.addRecorder(recorders[1])
+    for run in range(30):
+        a.simulate(0.3)  # 0.3 / 0.1 is not exact
+    b.simulate(9)
+    for (net, recorder) in zip((short, long), recorders):
+        assert net._step == 90 and net._time == 90 * 0.1
+        assert net._timeline.segments == [(1, 90, 0.1)] and recorder.timeline.segments == [(1, 90, 0.1)]
+        assert recorder.timeline == [step * 0.1 for step in range(1, 91)]
+        assert len(recorder['v'].array()) == 90
+    assert len(network().drange(0, 1, 0.1)) == 10 and network().drange(0, 1, 0.1)[-1] == 9 * 0.1
+    assert network().drange(1, 1, 0.1) == [] and network().drange(0, 3, 1) == [0, 1, 2]
+    print('Runs: ok')
+
+
+def testDisk():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'recording')
+        sim = enn.Simulator()
+        nid = sim.addNetwork(network())
+        recorder = enn.Recorder(nid, range(3), ['v'], withTime=True, diskMode=True, toDiskDir=path)
+        sim.addRecorder(recorder)
+        sim.simulate(2)
+        sim.simulate(0.5)
+        opened = enn.Recorder(nid, range(3), ['v'], diskMode=True, toDiskDir=path, readonly=True)
+        assert opened.timeline.segments == [(1, 25, 0.1)]
+        assert opened.timeline == recorder.timeline == [step * 0.1 for step in range(1, 26)]
+    finally:
+        shutil.rmtree(directory)
+    print('Disk: ok')
+
+
+if __name__ == '__main__':
+    testList()
+    testRuns()
+    testDisk()
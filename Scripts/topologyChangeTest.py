@@ -0,0 +1,92 @@
+import pickle
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+
+# Neurons and synapses added and deleted between simulate() calls (also a deleted id added again) give the
+# same traces in the array engine, with both backends, as in the dict engine. Removed elements are only
+# marked until the next step, which compacts the columns. A pickled network is the same.
+
+izhDict = {'v': -65, 'u': 0, 'a': 0.02, 'b': 0.2, 'c': -65, 'd': 8, 'I': 0}
+synapseDict = {'w': 0.5, 'threshold': 20, 'I': [0.0] * 10, 'i': 0, 'rp': 2, 'i2': 0}
+
+
+def edit(net):
+    for i in range(10, 20):
+        net.deleteNeuron(i)
+    for i in range(50, 60):
+        net.addNeuron(id=i)
+        net.connect(i - 1 if i > 50 else 49, i)
+    net.deleteNeuron(55)
+    net.addNeuron(id=55)
+    net.connect(54, 55)
+    net.connect(55, 56)
+    net.deleteConnection(net.getOutgoing(30)[0])
+    net.getNeuronByID(40)['Istim'] = 20
+
+
+def simulate(engine, backend='numpy', pickled=False):
+    net = enn.Network(models.HodgkinAndHuxleyNeuron, models.default_Hodgkin_Huxley_neuron_dict,
+                      models.erwinHandHsynapse, synapseDict, 0.01, engine=engine, backend=backend)
+    for i in range(50):
+        net.addNeuron()
+    for i in range(49):
+        net.connect(i, i + 1)
+    for i in range(0, 50, 5):
+        net.getNeuronByID(i)['Istim'] = 12
+    sim = enn.Simulator()
+    nid = sim.addNetwork(net)
+    rec = enn.Recorder(nid, range(60), ['Vm'], withTime=True)
+    sim.addRecorder(rec)
+    sim.simulate(5)
+    edit(net)
+    sim.simulate(5)
+    if engine == 'array':
+        population = list(net._populations.values())[0]
+        assert not population._dead and len(population) == 50
+    if pickled:
+        copy = pickle.loads(pickle.dumps(net))
+        assert sorted(copy.getNeuronIDs()) == sorted(net.getNeuronIDs())
+        assert all(copy.getNeuronByID(id)['Vm'] == net.getNeuronByID(id)['Vm'] for id in net.getNeuronIDs())
+    return rec['Vm'].array()
+
+
+def testTopologyChanges():
+    reference = simulate('dict')
+    assert np.isnan(reference[-1, 10:20]).all() and not np.isnan(reference[-1, 50:60]).any()
+    backends = ['numpy']
+    try:
+        import numba
+        backends.append('numba')
+    except ImportError:
+        print('Warning: numba not found, the numba backend is not tested')
+    for backend in backends:
+        traces = simulate('array', backend, pickled=True)
+        difference = np.nanmax(np.abs(traces - reference))
+        print('%s: max |dict - array| = %g' % (backend, difference))
+        assert np.array_equal(np.isnan(traces), np.isnan(reference)) and difference < 1e-6
+
+
+def testDeletedIds():
+    for engine in ('dict', 'array'):
+        net = enn.Network(models.neuronIzh, izhDict, models.erwinSynapse,
+                          {'w': 0.5, 'threshold': 0, 'I': [0.0] * 10, 'i': 0}, 0.1, engine=engine)
+        net.addNeurons(10)
+        net.getNeuronByID(2)['v'] = 30
+        net.deleteNeurons([2, 3])
+        if engine == 'array':
+            assert list(net._populations.values())[0]._dead == {2, 3}  # Marked, not compacted yet
+        try:
+            net.getNeuronByID(2)
+            assert False
+        except KeyError:
+            pass
+        net.addNeuron(id=2)
+        assert sorted(net.getNeuronIDs()) == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+        assert net.getNeuronByID(2)['v'] == -65  # A new neuron, not the deleted one
+    print('Deleted ids: ok')
+
+
+if __name__ == '__main__':
+    testTopologyChanges()
+    testDeletedIds()
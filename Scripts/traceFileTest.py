@@ -0,0 +1,111 @@
+import os
+import pickle
+import shutil
+import tempfile
+import numpy as np
+import Engine.ENNet as enn
+import Engine.ENN_Models as models
+
+# A TraceFile (disk mode Recorder, one file per variable) gives back the rows that were appended, also after
+# opening the file again, appending to it or pickling it. A disk mode recorder holds the same values and
+# timeline as an in memory recorder of the same network, in both engines.
+
+izhDict = {'v': -65, 'u': 0, 'a': 0.02, 'b': 0.2, 'c': -65, 'd': 8, 'I': 0}
+synapseDict = {'w': 2.0, 'threshold': 0, 'I': [0.0] * 10, 'i': 0}
+
+
+def raises(error, fun, *args, **kwargs):
+    try:
+        fun(*args, **kwargs)
+    except error:
+        return True
+    return False
+
+
+def testTraceFile(directory):
+    file = os.path.join(directory, 'v.traces')
+    ids = [4, 'b', (1, 2)]
+    rows = np.random.RandomState(1).rand(11, 3)
+    traces = enn.TraceFile(file, ids, buffersize=4)
+    for row in rows[:6]:
+        traces.append(row)
+    assert traces.shape == (6, 3)  # 2 rows still in memory
+    assert np.array_equal(traces.array(), rows[:6]) and np.array_equal(traces[(1, 2)], rows[:6, 2])
+    copy = pickle.loads(pickle.dumps(traces))
+    assert np.array_equal(copy.array(), rows[:6])
+    copy.close()
+    for row in rows[6:]:
+        traces.append(row)
+    traces.close()
+    # Opened again: the neuron ids come from the header
+    opened = enn.TraceFile(file, readonly=True)
+    assert opened.keys() == ids and np.array_equal(opened.array(), rows)
+    assert np.array_equal(opened.rows(3, 7), rows[3:7]) and np.array_equal(opened['b'], rows[:, 1])
+    assert raises(IOError, opened.append, rows[0])
+    opened.close()
+    # Appending to the file, a partly written row is dropped
+    with open(file, 'ab') as f:
+        f.write(b'\1' * 5)
+    appended = enn.TraceFile(file, ids, buffersize=4)
+    assert appended.shape == (11, 3)
+    appended.append(rows[0])
+    appended.close()
+    assert np.array_equal(enn.TraceFile(file, readonly=True).array(), np.vstack((rows, rows[:1])))
+    assert raises(ValueError, enn.TraceFile, file, [4, 'b'])
+    overwritten = enn.TraceFile(file, [4, 'b'], overwrite=True)
+    assert overwritten.shape == (0, 2) and overwritten.array().shape == (0, 2)
+    overwritten.close()
+    with open(os.path.join(directory, 'other'), 'wb') as f:
+        f.write(b'NOTATRACEFILE')
+    assert raises(IOError, enn.TraceFile, os.path.join(directory, 'other'), readonly=True)
+    assert raises(IOError, enn.TraceFile, os.path.join(directory, 'missing'), readonly=True)
+    assert raises(ValueError, enn.TraceFile, os.path.join(directory, 'new'))
+    print('TraceFile: ok')
+
+
+def simulate(engine, **kwargs):
+    net = enn.Network(models.neuronIzh, izhDict, models.erwinSynapse, synapseDict, 0.1, engine=engine)
+    net.addNeurons(6)
+    for i in range(5):
+        net.connect(i, i + 1)
+    sim = enn.Simulator()
+    nid = sim.addNetwork(net)
+    recorder = enn.Recorder(nid, [0, 2, 5, 9], ['v', 'u'], withTime=True, **kwargs)
+    sim.addRecorder(recorder)
+    sim.simulate(2)
+    net.addNeuron(id=9)
+    net.connect(5, 9)
+    sim.simulate(3.3)
+    net.deleteNeuron(2)
+    sim.simulate(1)
+    return recorder
+
+
+def testRecorder(directory):
+    for engine in ('dict', 'array'):
+        for settings in ({}, {'every': 3, 'mode': 'mean', 'windows': [(1, 2.5), (4, 9)]}):
+            path = os.path.join(directory, '%s%i' % (engine, len(settings)))
+            memory = simulate(engine, **settings)
+            disk = simulate(engine, diskMode=True, toDiskDir=path, buffersize=7, **settings)
+            opened = enn.Recorder(0, [0, 2, 5, 9], ['v', 'u'], diskMode=True, toDiskDir=path, readonly=True)
+            for recorder in (disk, opened):
+                assert recorder.timeline == memory.timeline and len(memory.timeline) > 0
+                for var in ('v', 'u'):
+                    assert isinstance(recorder[var], enn.TraceFile) and recorder[var].keys() == [0, 2, 5, 9]
+                    assert np.array_equal(recorder[var].array(), memory[var].array(), equal_nan=True)
+                    assert np.array_equal(recorder[var][9], memory[var][9], equal_nan=True)
+                (times, values) = recorder.window('v', 1.5, 4.5)
+                assert np.array_equal(times, memory.window('v', 1.5, 4.5)[0])
+                assert np.array_equal(values, memory.window('v', 1.5, 4.5)[1], equal_nan=True)
+                for var in ('v', 'u'):
+                    recorder[var].close()
+    print('Recorder: ok')
+
+
+if __name__ == '__main__':
+    directory = tempfile.mkdtemp()
+    try:
+        testTraceFile(directory)
+        testRecorder(directory)
+    finally:
+        shutil.rmtree(directory)